@@ -1,3 +1,5 @@
+import os
+import sys
 import json
 from pathlib import Path
 from fastapi import FastAPI, HTTPException
@@ -15,6 +17,13 @@ app.add_middleware(
 
 STATE_DIR = Path(__file__).parent / "state"
 
+# Optional SQLite tree store (sauce.store), e.g. NEO_STORE=../../.neo/trees.db. Trees found
+# there are served with indexed queries; anything else falls back to the JSON files.
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from sauce.store import TreeStore  # noqa: E402
+
+store = TreeStore(os.environ["NEO_STORE"]) if os.environ.get("NEO_STORE") else None
+
 
 # ── Response models ────────────────────────────────────────────────────────────
 
@@ -35,6 +44,10 @@ class TreeSummary(BaseModel):
 
 # ── Helpers ────────────────────────────────────────────────────────────────────
 
+def in_store(tree_id: str) -> bool:
+    return store is not None and store.has_tree(tree_id)
+
+
 def load_tree(tree_id: str) -> dict:
     path = STATE_DIR / f"{tree_id}.json"
     if not path.exists():
@@ -54,15 +67,40 @@ def summarize_node(node: dict) -> NodeSummary:
     )
 
 
+def find_node(tree_id: str, node_id: str) -> dict:
+    if in_store(tree_id):
+        node = store.get_node(tree_id, node_id)
+        if node is None:
+            raise HTTPException(status_code=404, detail=f"Node '{node_id}' not found in tree '{tree_id}'")
+        return node
+    data = load_tree(tree_id)
+    root = data["root"]
+    all_nodes = {root["node_id"]: root, **data.get("nodes", {})}
+    if node_id not in all_nodes:
+        raise HTTPException(status_code=404, detail=f"Node '{node_id}' not found in tree '{tree_id}'")
+    return all_nodes[node_id]
+
+
 # ── Routes ─────────────────────────────────────────────────────────────────────
 
 @app.get("/tree")
 def list_trees() -> list[str]:
-    return [p.stem for p in STATE_DIR.glob("*.json")]
+    stored = [t["tree_id"] for t in store.list_trees()] if store is not None else []
+    return stored + [p.stem for p in STATE_DIR.glob("*.json") if p.stem not in stored]
 
 
 @app.get("/tree/{tree_id}", response_model=TreeSummary)
 def get_tree(tree_id: str):
+    if in_store(tree_id):
+        root_id = store.root_id(tree_id)
+        if root_id is None:
+            raise HTTPException(status_code=404, detail=f"Tree '{tree_id}' has no nodes yet")
+        nodes = store.find_nodes(tree_id)
+        return TreeSummary(
+            tree_id=tree_id,
+            root_id=root_id,
+            nodes={n["node_id"]: summarize_node(n) for n in nodes},
+        )
     data = load_tree(tree_id)
     root = data["root"]
     all_nodes = {root["node_id"]: root, **data.get("nodes", {})}
@@ -73,14 +111,23 @@ def get_tree(tree_id: str):
     )
 
 
+@app.get("/tree/{tree_id}/nodes", response_model=list[NodeSummary])
+def find_nodes(tree_id: str, state: str | None = None, node_type: str | None = None, parent_id: str | None = None):
+    if in_store(tree_id):
+        return [summarize_node(n) for n in store.find_nodes(tree_id, state, node_type, parent_id)]
+    data = load_tree(tree_id)
+    all_nodes = [data["root"], *data.get("nodes", {}).values()]
+    return [
+        summarize_node(n) for n in all_nodes
+        if (state is None or n["state"] == state)
+        and (node_type is None or n["node_type"] == node_type)
+        and (parent_id is None or n.get("parent_id") == parent_id)
+    ]
+
+
 @app.get("/tree/{tree_id}/{node_id}")
 def get_node(tree_id: str, node_id: str):
-    data = load_tree(tree_id)
-    root = data["root"]
-    all_nodes = {root["node_id"]: root, **data.get("nodes", {})}
-    if node_id not in all_nodes:
-        raise HTTPException(status_code=404, detail=f"Node '{node_id}' not found in tree '{tree_id}'")
-    return all_nodes[node_id]
+    return find_node(tree_id, node_id)
 
 
 SPECIFIC_DIR = STATE_DIR / "specific"
@@ -89,12 +136,8 @@ SPECIFIC_DIR.mkdir(parents=True, exist_ok=True)
 
 @app.post("/tree/{tree_id}/{node_id}/save")
 def save_node(tree_id: str, node_id: str):
-    data = load_tree(tree_id)
-    root = data["root"]
-    all_nodes = {root["node_id"]: root, **data.get("nodes", {})}
-    if node_id not in all_nodes:
-        raise HTTPException(status_code=404, detail=f"Node '{node_id}' not found in tree '{tree_id}'")
+    node = find_node(tree_id, node_id)
     out_path = SPECIFIC_DIR / f"{node_id}.json"
     with open(out_path, "w") as f:
-        json.dump(all_nodes[node_id], f, indent=2)
+        json.dump(node, f, indent=2)
     return {"saved": str(out_path)}
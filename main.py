@@ -2,20 +2,79 @@
 Main entry point for Neo with live visualization.
 Run with: uv run python main.py
 """
+import argparse
 import asyncio
+import os
+import time
 import signal
 import sys
 
-from sauce import DecompositionTree, Neo, run_with_live_visualization
+import sauce.llm as llm
+import sauce.journal as journal
+import sauce.metrics as metrics
+import sauce.ratelimit as ratelimit
+import sauce.snapshot as snapshot
+import sauce.store as store
+from sauce import DecompositionTree, Neo, NodeState, run_with_live_visualization
+from sauce.cache import CacheMode, ResponseCache
 
 STATE_PATH = "dashboard/backend/state/tree.json"
+CACHE_DIR = ".neo/llm-cache"
+JOURNAL_DIR = ".neo/journal"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run Neo with live visualization.")
+    parser.add_argument("--cache-mode", choices=[m.value for m in CacheMode], default=CacheMode.PASSTHROUGH.value,
+                        help="record: reuse identical LLM calls and store new ones; replay: offline, cache only")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="Directory of the LLM response cache")
+    parser.add_argument("--journal-dir", default=JOURNAL_DIR,
+                        help="Directory for the crash-safe journal of tree mutations")
+    parser.add_argument("--resume", metavar="STATE",
+                        help="Continue an interrupted run from a journal directory, a binary snapshot or a saved tree JSON file")
+    parser.add_argument("--store", metavar="DB",
+                        help="Also keep the tree in this SQLite store (shared across runs, read by the dashboard)")
+    parser.add_argument("--rate-limits", metavar="JSON", default=os.environ.get("NEO_RATE_LIMITS"),
+                        help="Per-model API limits as JSON or a JSON file, e.g. "
+                             "'{\"claude-sonnet-4-6\": {\"input_tokens_per_minute\": 400000}}' (default: $NEO_RATE_LIMITS)")
+    return parser.parse_args()
+
+
+def load_tree(state: str) -> DecompositionTree:
+    if os.path.isdir(state):
+        return DecompositionTree.load_state(journal.load(state))
+    if snapshot.is_snapshot(state):
+        return snapshot.load(state)
+    return DecompositionTree.load_state(state)
 
-async def main():
 
+def final_message(tree: DecompositionTree) -> str:
+    """The root's last text block, or a note on why there is none."""
+    root = tree.root
+    if root is None:
+        return "Nothing was run."
+    if root.state != NodeState.COMPLETED:
+        return f"The run ended with the root agent {root.state.value}; see {STATE_PATH} for its conversation."
+    for message in reversed(root.conversation.messages):
+        if message.role != "assistant":
+            continue
+        if isinstance(message.content, str):
+            return message.content
+        for block in reversed(message.content):
+            if block.get("type") == "text":
+                return block["text"]
+    return "The root agent finished without a final message."
+
+
+async def main():
+    args = parse_args()
     env_dir = "./sandbox"
+    if args.cache_mode != CacheMode.PASSTHROUGH.value:
+        llm.response_cache = ResponseCache(args.cache_dir, CacheMode(args.cache_mode), env_directory=env_dir)
 
-    tree = DecompositionTree()
-    neo = Neo(tree, max_concurrent_tasks=10, env_directory=env_dir)
+    tree = load_tree(args.resume) if args.resume else DecompositionTree()
+    rate_limits = ratelimit.load_limits(args.rate_limits) if args.rate_limits else None
+    neo = Neo(tree, max_concurrent_tasks=10, env_directory=env_dir, rate_limits=rate_limits)
 
     def handle_sigint(sig, frame):
         print("\nInterrupted — saving tree state...")
@@ -26,10 +85,25 @@ async def main():
 
     signal.signal(signal.SIGINT, handle_sigint)
 
-    task = input("What do you want to build? ").strip()
-    if not task:
-        print("No task provided. Exiting.")
-        return
+    if args.resume:
+        task = None
+        neo.resume(tree)
+        print(f"Resuming {len(tree.nodes)} nodes from {args.resume}")
+    else:
+        task = input("What do you want to build? ").strip()
+        if not task:
+            print("No task provided. Exiting.")
+            return
+
+    # Only now touch the journal: starting over it must never cost an earlier run its state.
+    resuming_journal = args.resume and os.path.realpath(args.resume) == os.path.realpath(args.journal_dir)
+    kept = None if resuming_journal else journal.set_aside(args.journal_dir)
+    if kept:
+        print(f"Moved the previous run's journal to {kept}; continue it with --resume {kept}")
+    journal.Journal(args.journal_dir).attach(tree)
+    if args.store:
+        tree_id = time.strftime("run-%Y%m%d-%H%M%S")
+        store.TreeStore(args.store).recorder(tree_id).attach(tree)
 
     try:
         await run_with_live_visualization(
@@ -45,7 +119,9 @@ async def main():
             print(f"Tree state saved to {STATE_PATH}")
         return
 
-    print(tree.root.conversation.messages[-1].content[0]['text'])
+    print(final_message(tree))
+    print()
+    print(metrics.summary(tree))
     tree.dump_state(STATE_PATH)
 
 
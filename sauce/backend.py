@@ -0,0 +1,59 @@
+import itertools
+from typing import Any, AsyncContextManager, Protocol
+
+import anthropic
+
+
+class Backend(Protocol):
+    """Anything that speaks the Messages API for sauce.llm.
+
+    `create` returns an anthropic.types.Message; `stream` returns an async
+    context manager yielding the SDK's message stream (events plus
+    get_final_message()).
+    """
+
+    async def create(self, **kwargs) -> anthropic.types.Message: ...
+
+    def stream(self, **kwargs) -> AsyncContextManager[Any]: ...
+
+    def create_sync(self, **kwargs) -> anthropic.types.Message: ...
+
+
+class AnthropicBackend:
+    """The real API, or any server speaking it (e.g. sauce.fake_anthropic) via `base_url`.
+
+    SDK retries are disabled because sauce.llm retries itself, so the limiter
+    sees every 429/529. Async requests are spread round-robin over `shards`
+    clients: httpx's connection pool rescans every connection on each request,
+    which dominates once a single pool holds a hundred or more in flight.
+    Clients are created on first use.
+    """
+
+    def __init__(self, base_url: str | None = None, api_key: str | None = None, shards: int = 8, **client_kwargs):
+        self.client_kwargs = {"base_url": base_url, "api_key": api_key, "max_retries": 0, **client_kwargs}
+        self.shards = shards
+        self._async_clients = None
+        self._client: anthropic.Anthropic | None = None
+
+    @property
+    def async_client(self) -> anthropic.AsyncAnthropic:
+        if self._async_clients is None:
+            self._async_clients = itertools.cycle(
+                [anthropic.AsyncAnthropic(**self.client_kwargs) for _ in range(self.shards)]
+            )
+        return next(self._async_clients)
+
+    @property
+    def client(self) -> anthropic.Anthropic:
+        if self._client is None:
+            self._client = anthropic.Anthropic(**self.client_kwargs)
+        return self._client
+
+    async def create(self, **kwargs) -> anthropic.types.Message:
+        return await self.async_client.messages.create(**kwargs)
+
+    def stream(self, **kwargs):
+        return self.async_client.messages.stream(**kwargs)
+
+    def create_sync(self, **kwargs) -> anthropic.types.Message:
+        return self.client.messages.create(**kwargs)
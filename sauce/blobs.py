@@ -0,0 +1,153 @@
+"""
+Content-addressed store for large tool payloads held in node state.
+
+File contents passed to write_file, read_file results and shell output end up
+in conversations, tool_calls and active_tool_calls, often many times over:
+sibling agents read the same contracts.md. Strings of at least MIN_CHARS are
+interned by sha256, so node state holds references to one shared copy.
+
+The shared copy is an ordinary str, so to_dict() and LLM requests see the full
+text with no extra work. Serialized forms that want to store each payload once
+(snapshots) use pack() and unpack() to swap payloads for {"$blob": digest} refs.
+
+The store must not outlive what it shares: collect() drops copies that no
+tracked tree holds any more, e.g. tool output that compaction replaced with a
+stub, or a finished tree's payloads. Trees register with track() (weakly, so a
+dropped tree stops counting) and list their payload-holding state in
+blob_values(); collect() marks the copies found there and sweeps the rest. It
+runs whenever messages are replaced and, via maybe_collect(), whenever the
+store has doubled since the last collection, so the store holds at most about
+twice the live payloads. Dropping a copy something else still uses loses only
+the sharing, never the text.
+"""
+
+import hashlib
+import weakref
+from typing import Callable
+
+MIN_CHARS = 2048
+REF = "$blob"
+
+
+def digest_of(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+class BlobStore:
+    """Deduplicated payload strings keyed by the sha256 of their UTF-8 bytes."""
+
+    def __init__(self, min_chars: int = MIN_CHARS, collect_after: int = 1024):
+        self.min_chars = min_chars
+        self.collect_after = collect_after  # entries before the first automatic collect()
+        self._next_collect = collect_after
+        self._texts: dict[str, str] = {}   # digest → the shared copy
+        self._digests: dict[int, str] = {}  # id(shared copy) → digest; the store keeps each copy alive
+        self._owners: weakref.WeakSet = weakref.WeakSet()  # trees whose blob_values() are live
+
+    def track(self, owner) -> None:
+        """Counts `owner.blob_values()` as live in collect() for as long as `owner` exists."""
+        self._owners.add(owner)
+
+    def put(self, text: str) -> str:
+        """Stores `text` (if new) and returns its digest."""
+        digest = self._digests.get(id(text))
+        if digest is None:
+            digest = digest_of(text)
+            if digest not in self._texts:
+                self._texts[digest] = text
+                self._digests[id(text)] = digest
+        return digest
+
+    def collect(self) -> int:
+        """Drops shared copies that no tracked tree holds; returns how many."""
+        live: set[str] = set()
+        for owner in list(self._owners):
+            for value in owner.blob_values():
+                self._mark(value, live)
+        dead = [digest for digest in self._texts if digest not in live]
+        for digest in dead:
+            del self._digests[id(self._texts.pop(digest))]
+        self._next_collect = max(self.collect_after, 2 * len(self._texts))
+        return len(dead)
+
+    def maybe_collect(self) -> None:
+        """collect() once the store has grown past its threshold. Call when new payloads are attached, not mid-intern."""
+        if len(self._texts) >= self._next_collect:
+            self.collect()
+
+    def _mark(self, value, live: set[str]) -> None:
+        if isinstance(value, str):
+            if len(value) >= self.min_chars and (digest := self._digests.get(id(value))) is not None:
+                live.add(digest)
+        elif isinstance(value, list):
+            for item in value:
+                self._mark(item, live)
+        elif isinstance(value, dict):
+            for item in value.values():
+                self._mark(item, live)
+
+    def get(self, digest: str) -> str:
+        return self._texts[digest]
+
+    def __contains__(self, digest: str) -> bool:
+        return digest in self._texts
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    @property
+    def chars(self) -> int:
+        return sum(len(text) for text in self._texts.values())
+
+    def intern(self, value):
+        """Swaps large strings inside `value` for their shared copies.
+
+        Lists and dicts are updated in place, so every holder of a shared
+        tool input (tool_use block, tool_calls, active_tool_calls) benefits.
+        Strings that are already shared copies are recognised without hashing.
+        """
+        if isinstance(value, str):
+            if len(value) < self.min_chars:
+                return value
+            return self._texts[self.put(value)]
+        if isinstance(value, list):
+            for i, item in enumerate(value):
+                if isinstance(item, (str, list, dict)):
+                    value[i] = self.intern(item)
+        elif isinstance(value, dict):
+            for key, item in value.items():
+                if isinstance(item, (str, list, dict)):
+                    value[key] = self.intern(item)
+        return value
+
+    def pack(self, value, found: dict[str, str]):
+        """A copy of `value` with large strings replaced by refs; adds each to `found`."""
+        if isinstance(value, str):
+            if len(value) < self.min_chars:
+                return value
+            digest = self.put(value)
+            found[digest] = self._texts[digest]
+            return {REF: digest}
+        if isinstance(value, list):
+            return [self.pack(item, found) for item in value]
+        if isinstance(value, dict):
+            return {key: self.pack(item, found) for key, item in value.items()}
+        return value
+
+    def unpack(self, value, fetch: Callable[[str], str]):
+        """Resolves refs made by pack(), calling `fetch` only for digests not yet stored."""
+        if isinstance(value, list):
+            return [self.unpack(item, fetch) for item in value]
+        if isinstance(value, dict):
+            if len(value) == 1 and REF in value:
+                digest = value[REF]
+                if digest not in self._texts:
+                    self.put(fetch(digest))
+                return self._texts[digest]
+            return {key: self.unpack(item, fetch) for key, item in value.items()}
+        return value
+
+
+# Shared by every tree in the process, so identical payloads are stored once;
+# collect() keeps it down to the payloads some tree still holds.
+default_store = BlobStore()
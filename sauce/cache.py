@@ -0,0 +1,124 @@
+import os
+import re
+import json
+import hashlib
+from enum import Enum
+
+from sauce.models import AgentResponse
+
+
+class CacheMode(Enum):
+    RECORD = "record"            # serve hits, call the API on a miss and store the answer
+    REPLAY = "replay"            # serve hits only; a miss raises CacheMiss (offline, deterministic)
+    PASSTHROUGH = "passthrough"  # cache disabled
+
+
+class CacheMiss(Exception):
+    pass
+
+
+# Run-specific paths and ids that reach the model in tool results and spawn
+# messages, replaced before hashing so the same run recorded in one place
+# replays in another. The environment root is added per cache (env_directory).
+VOLATILE_PATHS: list[tuple[re.Pattern, str]] = [
+    (re.compile(r"(?:[\w.-]*/)*[\w-]+\.(stdout|stderr)\.log"), r"<\1 log>"),  # spilled run_shell output
+    (re.compile(r"(?:[\w.-]*/)*\.neo/overlays/[\w-]+"), "<overlay>"),           # a node's workspace overlay
+    (re.compile(r"[0-9a-f]{8}-(?:[0-9a-f]{4}-){3}[0-9a-f]{12}"), "<node id>"),    # a spawned node's uuid
+]
+
+
+class ResponseCache:
+    """Content-addressed on-disk cache of LLM responses with an LRU size cap.
+
+    The key is a sha256 over the request's model, system prompt, tools and
+    messages, with `env_directory` and VOLATILE_PATHS replaced by placeholders.
+    Entries live at <directory>/<key[:2]>/<key>.json; an entry's mtime doubles
+    as its last-used time, so the LRU order survives restarts.
+    """
+
+    def __init__(self, directory: str, mode: CacheMode = CacheMode.RECORD, max_bytes: int = 512 * 1024 * 1024,
+                 volatile: list[tuple[re.Pattern, str]] | None = None, env_directory: str | None = None):
+        self.directory = directory
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.volatile = VOLATILE_PATHS if volatile is None else volatile
+        if env_directory is not None:
+            # Matched as it appears in the JSON-encoded request, before any pattern can split it.
+            roots = sorted({os.path.abspath(env_directory), os.path.realpath(env_directory)}, key=len, reverse=True)
+            env = re.compile("|".join(re.escape(json.dumps(root)[1:-1]) for root in roots))
+            self.volatile = [(env, "<env>"), *self.volatile]
+        self.hits = 0
+        self.misses = 0
+        self.entries: dict[str, tuple[float, int]] = {}  # key → (last used, size)
+        self.total_bytes = 0
+        os.makedirs(directory, exist_ok=True)
+        for shard in os.scandir(directory):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    self.entries[entry.name[:-5]] = (stat.st_mtime, stat.st_size)
+                    self.total_bytes += stat.st_size
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != CacheMode.PASSTHROUGH
+
+    def key(self, request: dict) -> str:
+        material = {k: request.get(k) for k in ("model", "system", "tools", "messages")}
+        encoded = json.dumps(material, sort_keys=True, separators=(",", ":"), default=str)
+        for pattern, placeholder in self.volatile:
+            encoded = pattern.sub(placeholder, encoded)
+        return hashlib.sha256(encoded.encode()).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> AgentResponse | None:
+        if key not in self.entries:
+            self.misses += 1
+            return None
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                response = AgentResponse.from_dict(json.load(f))
+            os.utime(path)
+        except (OSError, ValueError, KeyError, TypeError):
+            self._forget(key)
+            self.misses += 1
+            return None
+        self.entries[key] = (os.path.getmtime(path), self.entries[key][1])
+        self.hits += 1
+        return response
+
+    def put(self, key: str, response: AgentResponse) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        payload = json.dumps(response.to_dict()).encode()
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(payload)
+        os.replace(tmp, path)
+
+        if key in self.entries:
+            self.total_bytes -= self.entries[key][1]
+        self.entries[key] = (os.path.getmtime(path), len(payload))
+        self.total_bytes += len(payload)
+        self._evict()
+
+    def _evict(self) -> None:
+        if self.total_bytes <= self.max_bytes:
+            return
+        for key, _ in sorted(self.entries.items(), key=lambda item: item[1][0]):
+            if self.total_bytes <= self.max_bytes:
+                break
+            self._forget(key)
+
+    def _forget(self, key: str) -> None:
+        _, size = self.entries.pop(key)
+        self.total_bytes -= size
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,177 @@
+from dataclasses import dataclass
+
+from sauce.models import Conversation, Message, UserMessage
+
+COMPACTED = "[compacted"
+
+
+@dataclass
+class CompactionConfig:
+    token_budget: int = 60_000        # summarise the oldest turns once history exceeds this
+    keep_recent_turns: int = 6        # assistant turns that are never summarised
+    stale_output_turns: int = 3       # shell/listing output older than this many turns is stubbed
+    min_stub_chars: int = 400         # smaller payloads are not worth replacing
+    stub_batch_tokens: int = 8_000    # stub only once this much is stale, so the cached prefix breaks once per batch
+
+
+def estimate_tokens(messages: list[Message]) -> int:
+    return sum(len(str(m.content)) for m in messages) // 4
+
+
+def compact(conversation: Conversation, config: CompactionConfig) -> bool:
+    """Shrinks a conversation in place before it is sent to the model. Returns True if it changed.
+
+    Two passes: stale payloads (superseded file reads, old shell output, old
+    write_file contents) are replaced with short stubs, then, if the history is
+    still over budget, the oldest turns are folded into one summary message.
+    Any edit invalidates the prompt cache from that message on, so stubs are
+    held back until they would save `stub_batch_tokens` (or the history is over
+    budget) and then applied together.
+    Cuts only happen at assistant-turn boundaries where every tool_use before
+    the cut has its tool_result before the cut, so pairing stays valid.
+    """
+    messages = conversation.messages
+    size = estimate_tokens(messages)
+    stubbed = _stub_stale_payloads(messages, config)
+    if stubbed is not messages and size <= config.token_budget and size - estimate_tokens(stubbed) < config.stub_batch_tokens:
+        stubbed = messages
+    if estimate_tokens(stubbed) > config.token_budget:
+        stubbed = _summarise_oldest_turns(stubbed, config)
+    if stubbed is messages:
+        return False
+    conversation.messages = stubbed
+    return True
+
+
+# ── Stale payloads ────────────────────────────────────────────────────────────
+
+def _tool_uses(messages: list[Message]) -> dict[str, tuple[int, int, dict]]:
+    """Maps tool_use id → (message index, assistant turn number, block)."""
+    uses = {}
+    turn = 0
+    for i, m in enumerate(messages):
+        if m.role != "assistant":
+            continue
+        turn += 1
+        if isinstance(m.content, list):
+            for block in m.content:
+                if block.get("type") == "tool_use":
+                    uses[block["id"]] = (i, turn, block)
+    return uses
+
+
+def _stub_stale_payloads(messages: list[Message], config: CompactionConfig) -> list[Message]:
+    uses = _tool_uses(messages)
+    turns = sum(1 for m in messages if m.role == "assistant")
+
+    # The latest turn in which each path was read or written; earlier reads are superseded.
+    latest_touch: dict[str, int] = {}
+    for _, turn, block in uses.values():
+        if block["name"] in ("read_file", "write_file", "edit_file"):
+            path = block["input"].get("path")
+            latest_touch[path] = max(turn, latest_touch.get(path, 0))
+
+    def stub_for_result(tool_use_id: str, content) -> str | None:
+        if not isinstance(content, str) or len(content) < config.min_stub_chars or content.startswith(COMPACTED):
+            return None
+        if tool_use_id not in uses:
+            return None
+        _, turn, block = uses[tool_use_id]
+        name, inp = block["name"], block["input"]
+        if name == "read_file" and latest_touch.get(inp.get("path"), 0) > turn:
+            return f"{COMPACTED}: read_file('{inp.get('path')}') output superseded by a later read or write of the same file]"
+        if name in ("run_shell", "list_directory") and turns - turn >= config.stale_output_turns:
+            return f"{COMPACTED}: {name} output ({len(content)} chars) from {turns - turn} turns ago elided; re-run if needed]"
+        return None
+
+    result = messages
+    for i, m in enumerate(messages):
+        if not isinstance(m.content, list):
+            continue
+        blocks = None
+        for j, block in enumerate(m.content):
+            replacement = None
+            if block.get("type") == "tool_result":
+                stub = stub_for_result(block["tool_use_id"], block.get("content"))
+                if stub is not None:
+                    replacement = {**block, "content": stub}
+            elif block.get("type") == "tool_use" and block["name"] == "write_file":
+                content = block["input"].get("content", "")
+                _, turn, _ = uses[block["id"]]
+                if len(content) >= config.min_stub_chars and turns - turn >= config.keep_recent_turns:
+                    stub = f"{COMPACTED}: {len(content)} chars written]"
+                    replacement = {**block, "input": {**block["input"], "content": stub}}
+            if replacement is not None:
+                if blocks is None:
+                    blocks = list(m.content)
+                blocks[j] = replacement
+        if blocks is not None:
+            if result is messages:
+                result = list(messages)
+            result[i] = Message(role=m.role, content=blocks)
+    return result
+
+
+# ── Summaries ─────────────────────────────────────────────────────────────────
+
+def _cut_index(messages: list[Message], config: CompactionConfig) -> int | None:
+    """Latest assistant index that keeps `keep_recent_turns` turns and splits no tool_use/tool_result pair."""
+    assistant_indices = [i for i, m in enumerate(messages) if m.role == "assistant"]
+    candidates = assistant_indices[: max(0, len(assistant_indices) - config.keep_recent_turns + 1)]
+    uses = _tool_uses(messages)
+
+    result_index: dict[str, int] = {}
+    for i, m in enumerate(messages):
+        if isinstance(m.content, list):
+            for block in m.content:
+                if block.get("type") == "tool_result":
+                    result_index[block["tool_use_id"]] = i
+
+    for cut in reversed(candidates):
+        if cut <= 1:
+            break
+        split = any(
+            (use_index < cut) != (result_index.get(tool_id, use_index) < cut)
+            for tool_id, (use_index, _, _) in uses.items()
+        )
+        if not split:
+            return cut
+    return None
+
+
+def _summarise_oldest_turns(messages: list[Message], config: CompactionConfig) -> list[Message]:
+    cut = _cut_index(messages, config)
+    if cut is None or all(_is_summary(m) for m in messages[1:cut]):
+        return messages
+    summary = UserMessage(_summary_text(messages[1:cut]))
+    return [messages[0], summary, *messages[cut:]]
+
+
+def _is_summary(message: Message) -> bool:
+    return isinstance(message.content, str) and message.content.startswith(COMPACTED)
+
+
+def _summary_text(messages: list[Message]) -> str:
+    lines = [f"{COMPACTED}: summary of earlier turns]"]
+    for m in messages:
+        if _is_summary(m):
+            lines.extend(m.content.split("\n")[1:])  # fold an earlier summary in
+            continue
+        if isinstance(m.content, str):
+            lines.append(f"- {m.role}: {_first_line(m.content)}")
+            continue
+        for block in m.content:
+            kind = block.get("type")
+            if kind == "text":
+                lines.append(f"- {m.role}: {_first_line(block['text'])}")
+            elif kind == "tool_use":
+                arg = next(iter(block["input"].items()), ("", ""))
+                lines.append(f"- called {block['name']}({arg[0]}={_first_line(str(arg[1]), 80)})")
+            elif kind == "tool_result":
+                lines.append(f"  → {_first_line(str(block.get('content', '')), 120)}")
+    return "\n".join(lines)
+
+
+def _first_line(text: str, limit: int = 200) -> str:
+    line = text.strip().split("\n", 1)[0]
+    return line if len(line) <= limit else line[: limit - 3] + "..."
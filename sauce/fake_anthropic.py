@@ -0,0 +1,310 @@
+"""
+Local stand-in for the Anthropic Messages API, for load-testing Neo offline.
+
+Serves POST /v1/messages (plain and streaming) with configurable latency
+distributions, token counts, injected error rates and a scripted tool-call
+tree, so hundreds of concurrent nodes can run on a laptop with no network.
+
+Run standalone with: python -m sauce.fake_anthropic --port 8765
+and point Neo at it with:
+    llm.set_backend(AnthropicBackend(base_url="http://127.0.0.1:8765", api_key="fake"))
+"""
+
+import re
+import json
+import math
+import time
+import uuid
+import random
+import argparse
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable
+
+
+# ── Latency Distributions ─────────────────────────────────────────────────────
+
+def fixed(seconds: float) -> Callable[[random.Random], float]:
+    return lambda rng: seconds
+
+
+def uniform(low: float, high: float) -> Callable[[random.Random], float]:
+    return lambda rng: rng.uniform(low, high)
+
+
+def lognormal(median: float, p99: float) -> Callable[[random.Random], float]:
+    """Heavy-tailed latency with the given median and 99th percentile."""
+    sigma = math.log(p99 / median) / 2.326
+    return lambda rng: rng.lognormvariate(math.log(median), sigma)
+
+
+# ── Scripted Tool-Call Trees ──────────────────────────────────────────────────
+
+_DEPTH = re.compile(r"\[fake depth=(\d+)\]")
+
+
+@dataclass
+class TreeScript:
+    """Decides each response from the node type (read off the system prompt) and its history.
+
+    Thinking agents at depth < `depth` spawn `fanout` children (thinking, or
+    code on the last level) and finish once the results are in. Code and test
+    agents make `tool_calls` cheap workspace calls, code agents optionally
+    spawn `test_fanout` test agents, and then all of them finish.
+    """
+
+    depth: int = 2
+    fanout: int = 3
+    tool_calls: int = 2
+    test_fanout: int = 0
+
+    def respond(self, system: str, messages: list[dict]) -> tuple[list[dict], str]:
+        task = _text(messages[0]["content"]) if messages else ""
+        turns = sum(1 for m in messages if m["role"] == "assistant")
+
+        if "thinking agent" in system:
+            match = _DEPTH.search(task)
+            depth = int(match.group(1)) if match else 0
+            if turns == 0 and depth < self.depth:
+                child = "thinking" if depth + 1 < self.depth else "code"
+                return self._spawn(child, depth + 1, self.fanout), "tool_use"
+            return _finish(f"thinking agent at depth {depth} done"), "end_turn"
+
+        if "code implementation agent" in system or "code verification agent" in system:
+            if turns < self.tool_calls:
+                return [_tool_use(*_WORKSPACE_CALLS[turns % len(_WORKSPACE_CALLS)])], "tool_use"
+            if turns == self.tool_calls and self.test_fanout and "code implementation agent" in system:
+                return self._spawn("test", 0, self.test_fanout), "tool_use"
+            return _finish("implemented and verified"), "end_turn"
+
+        return _finish("done"), "end_turn"
+
+    def _spawn(self, agent_type: str, depth: int, count: int) -> list[dict]:
+        blocks = [{"type": "text", "text": f"Splitting this into {count} {agent_type} tasks."}]
+        for i in range(count):
+            task = f"[fake depth={depth}] subtask {i}"
+            blocks.append(_tool_use("spawn_subagent", {"task": task, "agent_type": agent_type}))
+        return blocks
+
+
+_WORKSPACE_CALLS = [
+    ("list_directory", {"path": "."}),
+    ("run_shell", {"command": "echo fake"}),
+]
+
+
+def _tool_use(name: str, input: dict) -> dict:
+    return {"type": "tool_use", "id": f"toolu_{uuid.uuid4().hex[:24]}", "name": name, "input": input}
+
+
+def _finish(text: str) -> list[dict]:
+    return [{"type": "text", "text": f"<MESSAGE>{text}</MESSAGE>"}]
+
+
+def _text(content) -> str:
+    if isinstance(content, str):
+        return content
+    return "".join(block.get("text", "") for block in content if isinstance(block, dict))
+
+
+# ── Server ────────────────────────────────────────────────────────────────────
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # bursts of hundreds of concurrent connects
+
+
+@dataclass
+class FakeConfig:
+    latency: Callable[[random.Random], float] = field(default_factory=lambda: fixed(0.0))
+    output_tokens: tuple[int, int] = (50, 400)
+    error_rates: dict[int, float] = field(default_factory=dict)  # status → probability, e.g. {529: 0.02}
+    retry_after: float | None = 0.5
+    script: TreeScript = field(default_factory=TreeScript)
+    seed: int | None = None
+
+
+@dataclass
+class FakeStats:
+    requests: int = 0
+    errors: int = 0
+    in_flight: int = 0
+    peak_in_flight: int = 0
+
+
+class FakeAnthropicServer:
+    """Threaded HTTP server speaking the Messages API; use as a context manager or start()/stop()."""
+
+    def __init__(self, config: FakeConfig | None = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or FakeConfig()
+        self.rng = random.Random(self.config.seed)
+        self.stats = FakeStats()
+        self.lock = threading.Lock()
+        self.queued: deque[tuple[int, float]] = deque()
+        self.httpd = _Server((host, port), _handler(self))
+        self.thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def enqueue(self, status: int, latency: float = 0.0) -> None:
+        """Forces the next request's status and latency, ahead of the random model."""
+        with self.lock:
+            self.queued.append((status, latency))
+
+    def start(self) -> "FakeAnthropicServer":
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "FakeAnthropicServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _plan(self) -> tuple[int, float, int]:
+        """Picks (status, latency, output tokens) for one request."""
+        with self.lock:
+            self.stats.requests += 1
+            self.stats.in_flight += 1
+            self.stats.peak_in_flight = max(self.stats.peak_in_flight, self.stats.in_flight)
+            output_tokens = self.rng.randint(*self.config.output_tokens)
+            if self.queued:
+                status, latency = self.queued.popleft()
+                return status, latency, output_tokens
+            status = 200
+            roll = self.rng.random()
+            for code, rate in self.config.error_rates.items():
+                if roll < rate:
+                    status = code
+                    break
+                roll -= rate
+            return status, self.config.latency(self.rng), output_tokens
+
+    def _done(self, status: int) -> None:
+        with self.lock:
+            self.stats.in_flight -= 1
+            if status != 200:
+                self.stats.errors += 1
+
+
+def _handler(server: FakeAnthropicServer) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            try:
+                request = json.loads(self.rfile.read(int(self.headers["content-length"])))
+            except (ValueError, ConnectionError):
+                self.close_connection = True
+                return  # the client hung up mid-request
+            if not self.path.startswith("/v1/messages"):
+                self._json(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+                return
+
+            status, latency, output_tokens = server._plan()
+            try:
+                if status != 200:
+                    time.sleep(latency)
+                    self._json(status, {"type": "error", "error": {"type": "api_error", "message": f"injected {status}"}})
+                    return
+
+                system = _text(request.get("system", ""))
+                content, stop_reason = server.config.script.respond(system, request["messages"])
+                usage = {"input_tokens": len(json.dumps(request)) // 4, "output_tokens": output_tokens}
+                message = {
+                    "id": f"msg_{uuid.uuid4().hex[:24]}", "type": "message", "role": "assistant",
+                    "model": request["model"], "content": content,
+                    "stop_reason": stop_reason, "stop_sequence": None, "usage": usage,
+                }
+                if request.get("stream"):
+                    self._stream(message, latency)
+                else:
+                    time.sleep(latency)
+                    self._json(200, message)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the client gave up (timeout, cancelled hedge)
+            finally:
+                server._done(status)
+
+        def _json(self, status: int, body: dict) -> None:
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("content-type", "application/json")
+            self.send_header("content-length", str(len(payload)))
+            if status in (429, 529) and server.config.retry_after is not None:
+                self.send_header("retry-after", str(server.config.retry_after))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _stream(self, message: dict, latency: float) -> None:
+            """Emits the SSE event sequence, spreading `latency` across the content blocks."""
+            self.send_response(200)
+            self.send_header("content-type", "text/event-stream")
+            self.send_header("connection", "close")
+            self.end_headers()
+            self.close_connection = True
+
+            content = message["content"]
+            start = {**message, "content": [], "stop_reason": None, "usage": {**message["usage"], "output_tokens": 1}}
+            self._event("message_start", {"type": "message_start", "message": start})
+            for i, block in enumerate(content):
+                time.sleep(latency / len(content))
+                if block["type"] == "text":
+                    self._event("content_block_start", {"type": "content_block_start", "index": i, "content_block": {"type": "text", "text": ""}})
+                    delta = {"type": "text_delta", "text": block["text"]}
+                else:
+                    self._event("content_block_start", {"type": "content_block_start", "index": i, "content_block": {**block, "input": {}}})
+                    delta = {"type": "input_json_delta", "partial_json": json.dumps(block["input"])}
+                self._event("content_block_delta", {"type": "content_block_delta", "index": i, "delta": delta})
+                self._event("content_block_stop", {"type": "content_block_stop", "index": i})
+            self._event("message_delta", {
+                "type": "message_delta",
+                "delta": {"stop_reason": message["stop_reason"], "stop_sequence": None},
+                "usage": {"output_tokens": message["usage"]["output_tokens"]},
+            })
+            self._event("message_stop", {"type": "message_stop"})
+
+        def _event(self, name: str, data: dict) -> None:
+            self.wfile.write(f"event: {name}\ndata: {json.dumps(data)}\n\n".encode())
+            self.wfile.flush()
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+# ── CLI ───────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Anthropic Messages API for offline load tests.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--median", type=float, default=1.0, help="median latency, seconds")
+    parser.add_argument("--p99", type=float, default=5.0, help="99th percentile latency, seconds")
+    parser.add_argument("--overloaded-rate", type=float, default=0.0, help="fraction of requests answered with 529")
+    parser.add_argument("--depth", type=int, default=2)
+    parser.add_argument("--fanout", type=int, default=3)
+    args = parser.parse_args()
+
+    config = FakeConfig(
+        latency=lognormal(args.median, args.p99),
+        error_rates={529: args.overloaded_rate} if args.overloaded_rate else {},
+        script=TreeScript(depth=args.depth, fanout=args.fanout),
+    )
+    server = FakeAnthropicServer(config, port=args.port)
+    print(f"Fake Anthropic API listening on {server.url}")
+    server.httpd.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
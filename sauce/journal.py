@@ -0,0 +1,181 @@
+"""
+Write-ahead journal of tree mutations.
+
+Every mutation that goes through DecompositionTree is appended to
+`journal.jsonl` as it happens, so persistence costs O(change) rather than a
+full rewrite, and a killed process loses at most the line being written.
+Once `snapshot_every` records have accumulated, the run loop writes the
+whole tree to `snapshot.json` and the journal starts over. Records carry a sequence number and the
+snapshot stores the last one it includes, so a crash between the two steps
+never applies a record twice.
+
+Attaching starts the directory over, so a new run first moves a journal that
+still holds a tree aside with set_aside(); it stays resumable from there.
+"""
+
+import json
+import os
+import time
+
+SNAPSHOT = "snapshot.json"
+JOURNAL = "journal.jsonl"
+
+
+class Journal:
+    """Appends tree mutations to `directory`; attach() it to a tree to start recording.
+
+    Attaching writes a snapshot of the tree as it stands (empty for a new run,
+    the loaded state when resuming), replacing whatever the directory held;
+    call set_aside() first unless the directory is the run being resumed.
+    `fsync` makes every record durable against power loss, not just process death.
+    """
+
+    def __init__(self, directory: str, snapshot_every: int = 10_000, fsync: bool = False):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        self.tree = None
+        self.file = None
+        self.since_snapshot = 0
+        os.makedirs(directory, exist_ok=True)
+        # Continue the sequence of whatever is on disk so its records stay superseded.
+        state, records = _read(directory)
+        self.seq = max([state.get("seq", 0)] + [r["seq"] for r in records])
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def attach(self, tree) -> None:
+        self.tree = tree
+        tree.recorders.append(self)
+        self.snapshot()
+
+    def append(self, record: dict) -> None:
+        self.seq += 1
+        record["seq"] = self.seq
+        self.file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+        self.since_snapshot += 1
+
+    def checkpoint(self) -> None:
+        """Compacts once enough records have accumulated. Call between mutations, never during one."""
+        if self.since_snapshot >= self.snapshot_every:
+            self.snapshot()
+
+    def snapshot(self) -> None:
+        """Writes the whole tree atomically, then truncates the journal."""
+        state = self.tree.dump_state() if self.tree.root is not None else {}
+        state["seq"] = self.seq
+        tmp = self._path(SNAPSHOT + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(state, f, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._path(SNAPSHOT))
+        if self.file is not None:
+            self.file.close()
+        self.file = open(self._path(JOURNAL), "w")
+        self.since_snapshot = 0
+
+    def close(self) -> None:
+        if self.file is not None:
+            self.file.close()
+
+
+def holds_tree(directory: str) -> bool:
+    """Whether `directory` has a recorded tree that load() could resume."""
+    if not os.path.isdir(directory):
+        return False
+    state, records = _read(directory)
+    return "root" in state or any(r["op"] == "node" for r in records)
+
+
+def set_aside(directory: str) -> str | None:
+    """Moves a journal holding a tree to a sibling directory named for its last write.
+
+    Returns the new path, or None if there was nothing to keep.
+    """
+    if not holds_tree(directory):
+        return None
+    directory = directory.rstrip(os.sep)
+    written = max(os.path.getmtime(p) for name in (SNAPSHOT, JOURNAL)
+                  if os.path.exists(p := os.path.join(directory, name)))
+    target = base = f"{directory}-{time.strftime('%Y%m%d-%H%M%S', time.localtime(written))}"
+    n = 1
+    while os.path.exists(target):
+        n += 1
+        target = f"{base}-{n}"
+    os.rename(directory, target)
+    return target
+
+
+# ── Replay ────────────────────────────────────────────────────────────────────
+
+def load(directory: str) -> dict:
+    """Rebuilds the dump_state() dict from the latest snapshot plus the journal after it."""
+    state, records = _read(directory)
+    nodes: dict[str, dict] = {}
+    root_id = None
+    if "root" in state:
+        root_id = state["root"]["node_id"]
+        nodes[root_id] = state["root"]
+        nodes.update(state["nodes"])
+
+    for record in records:
+        op = record["op"]
+        if op == "node":
+            data = record["node"]
+            nodes[data["node_id"]] = data
+            if data.get("parent_id") is None:
+                root_id = data["node_id"]
+            continue
+        node = nodes[record["id"]]
+        if op == "set":
+            node.update(record["fields"])
+        elif op == "extend":
+            for name, values in record["fields"].items():
+                node[name] = [*node.get(name, []), *values]
+        elif op == "discard":
+            node["active_children"] = [c for c in node["active_children"] if c != record["child"]]
+        elif op == "message":
+            messages = node["conversation"]["messages"]
+            if "index" in record:
+                messages[record["index"]] = record["message"]
+            else:
+                messages.append(record["message"])
+        elif op == "block":
+            node["conversation"]["messages"][record["index"]]["content"].append(record["block"])
+        elif op == "messages":
+            node["conversation"]["messages"] = record["messages"]
+
+    if root_id is None:
+        raise ValueError(f"no tree recorded in {directory}")
+    return {
+        "root": nodes[root_id],
+        "nodes": {node_id: data for node_id, data in nodes.items() if node_id != root_id},
+    }
+
+
+def _read(directory: str) -> tuple[dict, list[dict]]:
+    """The snapshot (or {}) and the journal records newer than it."""
+    state = {}
+    snapshot_path = os.path.join(directory, SNAPSHOT)
+    if os.path.exists(snapshot_path):
+        with open(snapshot_path) as f:
+            state = json.load(f)
+    after = state.get("seq", 0)
+
+    records = []
+    journal_path = os.path.join(directory, JOURNAL)
+    if os.path.exists(journal_path):
+        with open(journal_path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break  # torn final write from a crash
+                if record["seq"] > after:
+                    records.append(record)
+    return state, records
@@ -1,28 +1,106 @@
+import asyncio
+from typing import Callable
+
 import anthropic
 
-from sauce.models import AgentResponse, Message, Tool
+import sauce.retry as retry
+import sauce.ratelimit as ratelimit
+from sauce.backend import AnthropicBackend, Backend
+from sauce.cache import CacheMiss, CacheMode, ResponseCache
+from sauce.metrics import NodeMetrics
+from sauce.models import AgentResponse, Message, Tool, ToolCall
 
-client = anthropic.Anthropic()
-async_client = anthropic.AsyncAnthropic()
+# Where requests go; swap with set_backend() to target a local stand-in.
+backend: Backend = AnthropicBackend()
 
+CACHE_CONTROL = {"type": "ephemeral"}
 
-def call_llm(
+# Optional record/replay cache consulted before any request is sent.
+response_cache: ResponseCache | None = None
+
+# Successful-call latencies per model, used to pick the hedging threshold.
+latency_trackers: dict[str, retry.LatencyTracker] = {}
+
+# Serialized tool lists keyed by the tools' identities, so each NodeType's
+# schema is built once and shared by every request. Holds the tools to keep ids stable.
+_tool_schemas: dict[tuple[int, ...], tuple[list[Tool], list[dict]]] = {}
+
+
+def set_backend(new_backend: Backend) -> None:
+    global backend
+    backend = new_backend
+
+
+def _request_kwargs(
     messages: list[Message],
-    system: str = "",
-    model: str = "claude-sonnet-4-6",
-    tools: list[Tool] | None = None,
-) -> AgentResponse:
+    system: str,
+    model: str,
+    tools: list[Tool] | None,
+) -> dict:
     kwargs = {
         "model": model,
         "max_tokens": 8096,
-        "messages": [m.to_dict() for m in messages],
+        "messages": _with_message_breakpoints([m.to_dict() for m in messages]),
     }
     if system:
-        kwargs["system"] = [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}]
+        kwargs["system"] = [{"type": "text", "text": system, "cache_control": CACHE_CONTROL}]
     if tools:
-        kwargs["tools"] = [t.to_dict() for t in tools]
+        kwargs["tools"] = _serialized_tools(tools)
+    return kwargs
+
+
+def _serialized_tools(tools: list[Tool]) -> list[dict]:
+    key = tuple(id(t) for t in tools)
+    cached = _tool_schemas.get(key)
+    if cached is None:
+        schemas = [t.to_dict() for t in tools]
+        schemas[-1] = {**schemas[-1], "cache_control": CACHE_CONTROL}
+        cached = _tool_schemas[key] = (list(tools), schemas)
+    return cached[1]
+
+
+def _with_message_breakpoints(messages: list[dict]) -> list[dict]:
+    """Marks the end of the conversation and the end of the previous request as cache breakpoints.
+
+    The API allows four breakpoints; tools and system use two, the messages the
+    other two. The latest message writes the prefix this turn; the last user
+    message before the latest assistant turn is where the previous request
+    ended, so its cached prefix is read even when a turn appended many blocks.
+    """
+    if not messages:
+        return messages
+    marks = {len(messages) - 1}
+    last_assistant = next((i for i in range(len(messages) - 1, -1, -1) if messages[i]["role"] == "assistant"), None)
+    if last_assistant is not None:
+        previous_user = next((i for i in range(last_assistant - 1, -1, -1) if messages[i]["role"] == "user"), None)
+        if previous_user is not None:
+            marks.add(previous_user)
 
-    return AgentResponse.from_message(client.messages.create(**kwargs))
+    messages = list(messages)
+    for i in marks:
+        messages[i] = _with_breakpoint(messages[i])
+    return messages
+
+
+def _with_breakpoint(message: dict) -> dict:
+    content = message["content"]
+    if isinstance(content, str):
+        blocks = [{"type": "text", "text": content, "cache_control": CACHE_CONTROL}]
+    elif content:
+        blocks = content[:-1] + [{**content[-1], "cache_control": CACHE_CONTROL}]
+    else:
+        return message
+    return {"role": message["role"], "content": blocks}
+
+
+def call_llm(
+    messages: list[Message],
+    system: str = "",
+    model: str = "claude-sonnet-4-6",
+    tools: list[Tool] | None = None,
+) -> AgentResponse:
+    kwargs = _request_kwargs(messages, system, model, tools)
+    return AgentResponse.from_message(backend.create_sync(**kwargs))
 
 
 async def call_llm_async(
@@ -30,15 +108,116 @@ async def call_llm_async(
     system: str = "",
     model: str = "claude-sonnet-4-6",
     tools: list[Tool] | None = None,
+    limiter: ratelimit.ModelLimiter | None = None,
+    policy: retry.RetryPolicy | None = None,
+    on_tool_use: Callable[[ToolCall], None] | None = None,
+    metrics: NodeMetrics | None = None,
 ) -> AgentResponse:
-    kwargs = {
-        "model": model,
-        "max_tokens": 8096,
-        "messages": [m.to_dict() for m in messages],
-    }
-    if system:
-        kwargs["system"] = [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}]
-    if tools:
-        kwargs["tools"] = [t.to_dict() for t in tools]
+    """Calls the model under the limiter and retry policy.
+
+    With `on_tool_use`, the response is streamed and each tool call is handed to
+    the callback as soon as its content block is complete. Once a tool call has
+    been handed off the request is no longer retried, since its effects may
+    already have started. A stream is only abandoned when it goes quiet for
+    `policy.stream_idle_timeout`, however long it runs; `policy.deadline`
+    bounds its total time. Usage, limiter wait and request time are added to
+    `metrics` when given.
+    """
+    kwargs = _request_kwargs(messages, system, model, tools)
+
+    cache_key = None
+    if response_cache is not None and response_cache.enabled:
+        cache_key = response_cache.key(kwargs)
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            if metrics is not None:
+                metrics.response_cache_hits += 1
+            return cached
+        if response_cache.mode == CacheMode.REPLAY:
+            raise CacheMiss(f"no recorded response for request {cache_key[:12]}")
+
+    limiter = limiter or ratelimit.default_pool.get(model)
+    policy = policy or retry.DEFAULT_POLICY
+    tracker = latency_trackers.setdefault(model, retry.LatencyTracker())
+    estimated = ratelimit.estimate_tokens(kwargs)
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + policy.deadline if policy.deadline is not None else None
+    dispatched = False
+
+    def forward(tool_call: ToolCall) -> None:
+        nonlocal dispatched
+        dispatched = True
+        on_tool_use(tool_call)
+
+    attempt = 0
+    while True:
+        remaining = max(0.0, deadline - loop.time()) if deadline is not None else None
+        timeout = policy.timeout if remaining is None else min(policy.timeout, remaining)
+        hedge_after = None
+        if policy.hedge_percentile is not None:
+            hedge_after = tracker.percentile(policy.hedge_percentile, policy.hedge_min_samples)
+
+        requested = loop.time()
+        try:
+            async with limiter.slot(estimated):
+                started = loop.time()
+                try:
+                    if on_tool_use is None:
+                        message = await retry.hedged(
+                            lambda: backend.create(**kwargs),
+                            hedge_after,
+                            timeout,
+                            make_hedge=lambda: _hedge(limiter, estimated, kwargs),
+                        )
+                    else:
+                        message = await asyncio.wait_for(_stream(kwargs, forward, policy.stream_idle_timeout), remaining)
+                finally:
+                    if metrics is not None:
+                        metrics.queue_wait += started - requested
+                        metrics.llm_latency += loop.time() - started
+                tracker.record(loop.time() - started)
+        except Exception as e:
+            throttled = retry.is_throttle(e)
+            out_of_time = deadline is not None and loop.time() >= deadline
+            retryable = (throttled or retry.is_retryable(e)) and not dispatched
+            if not retryable or attempt >= policy.max_retries or out_of_time:
+                raise
+            if throttled:
+                limiter.on_throttle(ratelimit.retry_after(e), attempt)
+            else:
+                await asyncio.sleep(retry.backoff_delay(policy, attempt))
+            attempt += 1
+            if metrics is not None:
+                metrics.retries += 1
+            continue
+
+        result = AgentResponse.from_message(message)
+        limiter.on_success(estimated, result)
+        if metrics is not None:
+            metrics.record_response(model, result)
+        if cache_key is not None:
+            response_cache.put(cache_key, result)
+        return result
+
+
+def _hedge(limiter: ratelimit.ModelLimiter, estimated: int, kwargs: dict) -> asyncio.Task | None:
+    """A duplicate request holding its own limiter slot, or None if none is free right now."""
+    if not limiter.try_slot(estimated):
+        return None
+    task = asyncio.ensure_future(backend.create(**kwargs))
+    task.add_done_callback(lambda _: limiter.release_nowait())
+    return task
+
 
-    return AgentResponse.from_message(await async_client.messages.create(**kwargs))
+async def _stream(kwargs: dict, on_tool_use: Callable[[ToolCall], None], idle_timeout: float) -> anthropic.types.Message:
+    """Streams one response, raising TimeoutError if no event arrives for `idle_timeout` seconds."""
+    loop = asyncio.get_running_loop()
+    async with asyncio.timeout(idle_timeout) as watchdog:
+        async with backend.stream(**kwargs) as stream:
+            async for event in stream:
+                watchdog.reschedule(loop.time() + idle_timeout)
+                if event.type == "content_block_stop" and event.content_block.type == "tool_use":
+                    block = event.content_block
+                    on_tool_use(ToolCall(id=block.id, name=block.name, input=block.input))
+            return await stream.get_final_message()
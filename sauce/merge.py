@@ -0,0 +1,108 @@
+"""
+Line-level three-way merge.
+
+Each side's changes against the common base are diffed into hunks (a base
+line range and its replacement lines). Hunks from the two sides that touch
+the same base lines are grouped; a group changed by only one side, or
+changed identically by both, merges cleanly. Anything else is a conflict.
+Unlike diff3, edits that merely touch (one ends on the line where the other
+starts) and insertions at a hunk's boundary are not conflicts, since their
+order is unambiguous.
+"""
+
+import difflib
+from dataclasses import dataclass, field
+
+
+@dataclass
+class MergeResult:
+    text: str | None                                               # None when there are conflicts
+    conflicts: list[tuple[int, int]] = field(default_factory=list)  # 1-based base line ranges
+
+    @property
+    def clean(self) -> bool:
+        return not self.conflicts
+
+
+@dataclass(slots=True)
+class _Hunk:
+    start: int          # base lines [start, end) are replaced by `lines`
+    end: int
+    lines: list[str]
+    side: int = 0       # 0 = ours, 1 = theirs
+
+
+def merge3(base: str, ours: str, theirs: str) -> MergeResult:
+    """Merges the changes `ours` and `theirs` each made to `base`."""
+    if ours == theirs or theirs == base:
+        return MergeResult(ours)
+    if ours == base:
+        return MergeResult(theirs)
+
+    base_lines = base.splitlines(keepends=True)
+    hunks = sorted(
+        _hunks(base_lines, ours.splitlines(keepends=True), 0) + _hunks(base_lines, theirs.splitlines(keepends=True), 1),
+        key=lambda h: (h.start, h.end),
+    )
+
+    merged, conflicts, position = [], [], 0
+    for group in _groups(hunks):
+        start, end = min(h.start for h in group), max(h.end for h in group)
+        merged += base_lines[position:start]
+        position = end
+        ours_lines, theirs_lines = (_apply(base_lines, start, end, [h for h in group if h.side == side]) for side in (0, 1))
+        if all(h.side == 0 for h in group) or ours_lines == theirs_lines:
+            merged += ours_lines
+        elif all(h.side == 1 for h in group):
+            merged += theirs_lines
+        else:
+            conflicts.append((start + 1, max(start + 1, end)))
+    merged += base_lines[position:]
+
+    if conflicts:
+        return MergeResult(None, conflicts)
+    return MergeResult("".join(merged))
+
+
+def _hunks(base: list[str], other: list[str], side: int) -> list[_Hunk]:
+    matcher = difflib.SequenceMatcher(None, base, other, autojunk=False)
+    return [
+        _Hunk(i1, i2, other[j1:j2], side)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes()
+        if tag != "equal"
+    ]
+
+
+def _groups(hunks: list[_Hunk]) -> list[list[_Hunk]]:
+    """Hunks sorted by position, grouped so that no hunk overlaps one in another group."""
+    groups: list[list[_Hunk]] = []
+    extent = None
+    for hunk in hunks:
+        if extent is not None and _overlaps(extent, hunk):
+            groups[-1].append(hunk)
+            extent = _Hunk(min(extent.start, hunk.start), max(extent.end, hunk.end), [])
+        else:
+            groups.append([hunk])
+            extent = _Hunk(hunk.start, hunk.end, [])
+    return groups
+
+
+def _overlaps(a: _Hunk, b: _Hunk) -> bool:
+    if a.start == a.end and b.start == b.end:
+        return a.start == b.start              # two insertions at the same point
+    if a.start == a.end:
+        return b.start < a.start < b.end       # an insertion inside a replaced range
+    if b.start == b.end:
+        return a.start < b.start < a.end
+    return a.start < b.end and b.start < a.end
+
+
+def _apply(base: list[str], start: int, end: int, hunks: list[_Hunk]) -> list[str]:
+    """base[start:end] with one side's hunks applied."""
+    out, position = [], start
+    for hunk in hunks:
+        out += base[position:hunk.start]
+        out += hunk.lines
+        position = hunk.end
+    out += base[position:end]
+    return out
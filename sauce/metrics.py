@@ -0,0 +1,118 @@
+from dataclasses import dataclass, fields
+
+from sauce.models import AgentResponse
+
+# USD per million tokens: (input, output, cache write, cache read).
+PRICING: dict[str, tuple[float, float, float, float]] = {
+    "claude-sonnet-4-6": (3.00, 15.00, 3.75, 0.30),
+    "claude-haiku-4-5":  (1.00,  5.00, 1.25, 0.10),
+}
+
+
+@dataclass(slots=True)
+class NodeMetrics:
+    """Usage and timing for one node's LLM calls and tool calls. All times are seconds."""
+
+    model: str = ""
+    llm_calls: int = 0
+    retries: int = 0
+    response_cache_hits: int = 0
+    queue_wait: float = 0.0      # waiting on the model's limiter before each attempt
+    llm_latency: float = 0.0     # request sent → full response received
+    tool_calls: int = 0
+    tool_latency: float = 0.0    # summed per-call run time, excluding waits on conflicting calls
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_input_tokens: int = 0
+    cache_creation_input_tokens: int = 0
+    cost: float = 0.0            # USD, priced per call so mixed-model rollups stay correct
+
+    def record_response(self, model: str, result: AgentResponse) -> None:
+        self.model = model
+        self.llm_calls += 1
+        self.input_tokens += result.input_tokens
+        self.output_tokens += result.output_tokens
+        self.cache_read_input_tokens += result.cache_read_input_tokens
+        self.cache_creation_input_tokens += result.cache_creation_input_tokens
+        self.cost += call_cost(model, result)
+
+    def add(self, other: "NodeMetrics") -> None:
+        """Accumulates `other`'s counters into self (the model is left as is)."""
+        for f in fields(self):
+            if f.name != "model":
+                setattr(self, f.name, getattr(self, f.name) + getattr(other, f.name))
+
+    def to_dict(self) -> dict:
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "NodeMetrics":
+        names = {f.name for f in fields(cls)}
+        return cls(**{k: v for k, v in data.items() if k in names})
+
+
+def call_cost(model: str, result: AgentResponse) -> float:
+    price_in, price_out, price_write, price_read = PRICING.get(model, PRICING["claude-sonnet-4-6"])
+    return (
+        result.input_tokens * price_in
+        + result.output_tokens * price_out
+        + result.cache_creation_input_tokens * price_write
+        + result.cache_read_input_tokens * price_read
+    ) / 1_000_000
+
+
+# ── Rollups ───────────────────────────────────────────────────────────────────
+
+def subtree_metrics(tree) -> dict[str, NodeMetrics]:
+    """Maps every node id to the totals of its subtree (the node plus all descendants)."""
+    totals: dict[str, NodeMetrics] = {}
+    order = [tree.root.node_id] if tree.root else []
+    for node_id in order:
+        order.extend(tree.nodes[node_id].children_ids)
+    for node_id in reversed(order):
+        node = tree.nodes[node_id]
+        total = NodeMetrics()
+        total.add(node.metrics)
+        for child_id in node.children_ids:
+            total.add(totals[child_id])
+        totals[node_id] = total
+    return totals
+
+
+def by_model(tree) -> dict[str, NodeMetrics]:
+    totals: dict[str, NodeMetrics] = {}
+    for node in tree.nodes.values():
+        if node.metrics.model:
+            totals.setdefault(node.metrics.model, NodeMetrics(model=node.metrics.model)).add(node.metrics)
+    return totals
+
+
+def summary(tree, top: int = 5) -> str:
+    """Plain-text report: totals per model and the root's most expensive branches."""
+    models = by_model(tree)
+    lines = ["── Usage ──"]
+    for model, m in sorted(models.items()):
+        lines.append(
+            f"{model:20} {m.llm_calls:5} calls  {m.input_tokens:>9,} in  {m.output_tokens:>8,} out  "
+            f"{m.cache_read_input_tokens:>9,} cached  ${m.cost:8.4f}  "
+            f"llm {m.llm_latency:7.1f}s  queued {m.queue_wait:6.1f}s"
+        )
+    total_cost = sum(m.cost for m in models.values())
+    lines.append(f"{'total':20} ${total_cost:.4f}")
+
+    if tree.root is None:
+        return "\n".join(lines)
+    subtrees = subtree_metrics(tree)
+    branches = [tree.nodes[child_id] for child_id in tree.root.children_ids]
+    branches.sort(key=lambda n: subtrees[n.node_id].cost, reverse=True)
+    if branches:
+        lines.append("── Costliest branches ──")
+    for node in branches[:top]:
+        m = subtrees[node.node_id]
+        task = node.conversation.messages[0].content if node.conversation.messages else ""
+        task = task.split("\n\n", 1)[-1].split("\n", 1)[0][:50] if isinstance(task, str) else ""
+        lines.append(
+            f"{node.node_type.value:8} {task:50}  ${m.cost:7.4f}  {m.llm_calls:4} calls  "
+            f"llm {m.llm_latency:6.1f}s  tools {m.tool_latency:6.1f}s"
+        )
+    return "\n".join(lines)
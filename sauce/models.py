@@ -5,13 +5,21 @@ from typing import Literal
 from dataclasses import dataclass, field
 
 
-@dataclass
+@dataclass(slots=True)
 class Message:
     role: Literal["user", "assistant"]
     content: str | list
+    _dict: dict | None = field(default=None, init=False, repr=False, compare=False)
 
     def to_dict(self) -> dict:
-        return {"role": self.role, "content": self.content}
+        """The API form of the message, built once and reused while role and content are unchanged.
+
+        The dict shares `content`, so blocks appended in place show up without a rebuild.
+        """
+        cached = self._dict
+        if cached is None or cached["content"] is not self.content or cached["role"] != self.role:
+            cached = self._dict = {"role": self.role, "content": self.content}
+        return cached
 
 
 def UserMessage(content: str) -> Message:
@@ -29,7 +37,7 @@ def ToolResultMessage(tool_use_id: str, content: str) -> Message:
     )
 
 
-@dataclass
+@dataclass(slots=True)
 class Conversation:
     """Accumulates the full message history for a single agent session."""
 
@@ -72,9 +80,13 @@ class Conversation:
 class ToolProperty:
     type: str
     description: str
+    items: dict | None = None  # JSON schema of array elements
 
     def to_dict(self) -> dict:
-        return {"type": self.type, "description": self.description}
+        schema = {"type": self.type, "description": self.description}
+        if self.items is not None:
+            schema["items"] = self.items
+        return schema
 
 
 @dataclass
@@ -108,7 +120,7 @@ class ToolType(Enum):
     SPAWN_SUBAGENT = "spawn_subagent"
 
 
-@dataclass
+@dataclass(slots=True)
 class ToolCall:
     id: str
     name: str
@@ -132,6 +144,8 @@ class AgentResponse:
     stop_reason: str
     input_tokens: int
     output_tokens: int
+    cache_read_input_tokens: int = 0
+    cache_creation_input_tokens: int = 0
 
     @property
     def has_tool_calls(self) -> bool:
@@ -154,4 +168,21 @@ class AgentResponse:
             stop_reason=message.stop_reason or "",
             input_tokens=message.usage.input_tokens,
             output_tokens=message.usage.output_tokens,
+            cache_read_input_tokens=getattr(message.usage, "cache_read_input_tokens", None) or 0,
+            cache_creation_input_tokens=getattr(message.usage, "cache_creation_input_tokens", None) or 0,
         )
+
+    def to_dict(self) -> dict:
+        return {
+            "text": self.text,
+            "tool_calls": [{"id": tc.id, "name": tc.name, "input": tc.input} for tc in self.tool_calls],
+            "stop_reason": self.stop_reason,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cache_read_input_tokens": self.cache_read_input_tokens,
+            "cache_creation_input_tokens": self.cache_creation_input_tokens,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "AgentResponse":
+        return cls(**{**data, "tool_calls": [ToolCall(**tc) for tc in data["tool_calls"]]})
@@ -2,20 +2,40 @@ import os
 import re
 import uuid
 import asyncio
+from collections import deque
 
 import sauce.llm as llm
+import sauce.shell as shell
+import sauce.overlay as overlay
+import sauce.compaction as compaction
+import sauce.ratelimit as ratelimit
 import sauce.tools as tool_defs
-from sauce.models import Conversation, Message, ToolCall, UserMessage
+from sauce.models import Conversation, Message, ToolCall, ToolResultMessage, UserMessage
 from sauce.node import Node, NodeType, NodeState, NODE_CONFIG, TOOLS_FOR_NODE
 from sauce.tree import DecompositionTree
 
 
 class Neo:
-    def __init__(self, tree: DecompositionTree, max_concurrent_tasks: int = 10, env_directory: str = "."):
+    def __init__(self, tree: DecompositionTree, max_concurrent_tasks: int = 10, env_directory: str = ".",
+                 rate_limits: dict[str, ratelimit.ModelLimits] | None = None):
         self.tree = tree
-        self.sem = asyncio.Semaphore(max_concurrent_tasks)
+        # One limiter per model, so Haiku nodes never queue behind slow Sonnet calls.
+        self.limiters = ratelimit.LimiterPool(max_concurrency=max_concurrent_tasks, limits=rate_limits)
         self.pending: set[asyncio.Task] = set()
+        self.finished: deque[asyncio.Task] = deque()
         self.env_directory = os.path.abspath(env_directory)
+        self.overlays = overlay.OverlayStore(self.env_directory)
+        # node id → the overlays its paths go through, root first. Fixed while the
+        # node runs: ancestors close only after it, and its own opens before it spawns.
+        self.views: dict[str, tuple[overlay.Overlay, ...]] = {}
+        # Nodes whose turn failed while spawned children were still running:
+        # node id → error, reported once the children are back.
+        self.failing: dict[str, str] = {}
+
+        # Set whenever a node becomes READY or a task finishes; run() waits on this
+        # instead of polling or re-registering on every pending task.
+        self.wakeup = asyncio.Event()
+        self.tree.on_ready = self.wakeup.set
 
     def prompt(self, prompt: str) -> Node:
         prompt_with_context = f"[Working Directory: .]\n\n{prompt}"
@@ -38,90 +58,117 @@ class Neo:
 
         return root
 
+    def resume(self, tree: DecompositionTree) -> Node:
+        """Continues an interrupted run from a loaded tree; only unfinished nodes run again."""
+        self.tree.on_ready = None
+        self.tree = tree
+        self.tree.on_ready = self.wakeup.set
+        self.tree.recover()
+        self.schedule_ready()
+        return tree.root
+
     async def run(self) -> Node:
         self.schedule_ready()
 
         while not self.tree.is_done():
-            if not self.pending:
-                await asyncio.sleep(0.1)
-                continue
-
-            done, self.pending = await asyncio.wait(self.pending, return_when=asyncio.FIRST_COMPLETED)
+            self.wakeup.clear()
+            if not self.finished and not self.tree.ready:
+                await self.wakeup.wait()
 
-            for task in done:
-                node = task.result()
-                self.on_node_complete(node)
+            while self.finished:
+                task = self.finished.popleft()
+                self.pending.discard(task)
+                self.on_node_complete(task.result())
 
             self.schedule_ready()
+            for recorder in self.tree.recorders:
+                recorder.checkpoint()
 
         return self.tree.root if self.tree.root else None
 
     def schedule_ready(self) -> None:
-        for node in self.tree.get_ready_nodes():
-            node.state = NodeState.RUNNING
+        for node in self.tree.pop_ready():
+            self.tree.set_state(node, NodeState.RUNNING)
             t = asyncio.create_task(self.execute_node(node))
+            t.add_done_callback(self._on_task_done)
             self.pending.add(t)
 
+    def _on_task_done(self, task: asyncio.Task) -> None:
+        self.finished.append(task)
+        self.wakeup.set()
+
     def on_node_complete(self, node: Node) -> None:
-        if node.state == NodeState.COMPLETED:
+        if node.state in (NodeState.COMPLETED, NodeState.FAILED):
             self.tree.sync_with_parent(node)
 
     async def execute_node(self, node: Node) -> Node:
-        async with self.sem:
-            node_tools = TOOLS_FOR_NODE[node.node_type] or None
+        self.tree.hold(node)
+        try:
+            await self.execute_turn(node)
+        finally:
+            self.tree.release(node)
+        return node
+
+    async def execute_turn(self, node: Node) -> None:
+        if node.node_id in self.failing:
+            await self.fail(node, self.failing.pop(node.node_id))
+            return
+        config = NODE_CONFIG[node.node_type]
+        if config.compaction is not None and compaction.compact(node.conversation, config.compaction):
+            self.tree.replace_messages(node, node.conversation.messages)
+        if config.overlay and node.parent_id is not None:
+            await self.open_workspace(node)
+
+        dispatcher = TurnDispatcher(self, node)
+        try:
             result = await llm.call_llm_async(
-                system=NODE_CONFIG[node.node_type].system_prompt,
-                model=NODE_CONFIG[node.node_type].model,
-                tools=node_tools,
+                system=config.system_prompt,
+                model=config.model,
+                tools=TOOLS_FOR_NODE[node.node_type] or None,
                 messages=node.conversation.messages,
+                limiter=self.limiters.get(config.model),
+                policy=config.retry,
+                on_tool_use=dispatcher.dispatch if config.stream else None,
+                metrics=node.metrics,
             )
+        except Exception as e:
+            # Retries are exhausted; fail this branch instead of the whole run.
+            if dispatcher.turn is not None:
+                # The stream broke after handing off tool calls. Let them finish and
+                # answer every tool_use; spawned children report back before the node fails.
+                await dispatcher.finish()
+                if node.active_children:
+                    self.failing[node.node_id] = str(e)
+                    return
+            await self.fail(node, str(e))
+            return
 
         content = []
         if result.text:
             content.append({"type": "text", "text": result.text})
         for tc in result.tool_calls:
             content.append({"type": "tool_use", "id": tc.id, "name": tc.name, "input": tc.input})
-        node.conversation.add_message(Message(role="assistant", content=content))
+        dispatcher.close_turn(content)
 
         if result.stop_reason == "end_turn":
             message = self.parse_xml_tag(result.text, NODE_CONFIG[node.node_type].message)
-            self.tree.message_parent(node, message)
-            node.state = NodeState.COMPLETED
+            note = await self.close_workspace(node)
+            self.tree.message_parent(node, f"{message or ''}{note}" if note else message)
+            self.tree.set_state(node, NodeState.COMPLETED)
+            return
 
-        elif result.stop_reason == "tool_use":
-            subagents = self.execute_tools(node, result.tool_calls)
-            if subagents:
-                self.tree.add_children(node, subagents)
-            else:
-                node.state = NodeState.READY
-
-        return node
+        # Anything the stream did not already hand off is dispatched now. The node
+        # becomes READY on release unless it is waiting on spawned children.
+        for tc in result.tool_calls:
+            dispatcher.dispatch(tc)
+        await dispatcher.finish()
 
-    def execute_tools(self, caller: Node, tool_calls: list[ToolCall]) -> list[Node]:
-        subagents = []
-        caller.active_tool_calls.clear()
-
-        for tc in tool_calls:
-            if tc.name == "spawn_subagent":
-                node = self.spawn_subagent(caller, tc)
-                if node:
-                    subagents.append(node)
-            else:
-                caller.tool_calls.append(tc)
-                caller.active_tool_calls.append(tc)
-                absolute_working_dir = os.path.join(self.env_directory, caller.working_directory)
-                result = tool_defs.TOOL_REGISTRY[tc.name](tc.input, self.tree, caller.node_id, absolute_working_dir)
-                caller.conversation.add_tool_result(tc.id, result)
-
-        return subagents
-
-    def spawn_subagent(self, parent: Node, tool_call: ToolCall) -> Node | None:
+    def spawn_subagent(self, parent: Node, tool_call: ToolCall) -> Node | str:
+        """Creates the child node for a spawn_subagent call, or returns an error message."""
         requested = tool_call.input["agent_type"]
         allowed = tool_defs.ALLOWED_SPAWN.get(parent.node_type.value, [])
         if requested not in allowed:
-            error = f"Error: {parent.node_type.value} agents may only spawn {allowed}, not '{requested}'."
-            parent.conversation.add_tool_result(tool_call.id, error)
-            return None
+            return f"Error: {parent.node_type.value} agents may only spawn {allowed}, not '{requested}'."
 
         requested_dir = tool_call.input.get("working_directory")
 
@@ -134,14 +181,12 @@ class Neo:
         else:
             working_dir = os.path.normpath(os.path.join(parent.working_directory, requested_dir))
 
-        # Create the directory with env_directory prepended
-        absolute_dir = os.path.join(self.env_directory, working_dir)
+        # Create the directory where the parent sees it (inside its overlay, if it has one)
+        absolute_dir = self.directory(parent, working_dir)
         try:
             os.makedirs(absolute_dir, exist_ok=True)
         except Exception as e:
-            error = f"Error: Could not create directory '{working_dir}': {e}"
-            parent.conversation.add_tool_result(tool_call.id, error)
-            return None
+            return f"Error: Could not create directory '{working_dir}': {e}"
 
         node_type = NodeType(requested)
         task_with_context = f"[Working Directory: {working_dir}]\n\n{tool_call.input['task']}"
@@ -158,9 +203,125 @@ class Neo:
             working_directory=working_dir,
         )
 
+    def directory(self, node: Node, working_directory: str | None = None) -> str:
+        """Absolute path of `working_directory` (default: the node's own) as `node` sees it.
+
+        Each overlay on the path from the root maps the path into its clone, so
+        a node sees its own and its ancestors' unmerged changes.
+        """
+        path = os.path.normpath(os.path.join(self.env_directory, working_directory or node.working_directory))
+        for view in self._views(node):
+            path = view.path_of(path) or path
+        return path
+
+    def _views(self, node: Node) -> tuple[overlay.Overlay, ...]:
+        views = self.views.get(node.node_id)
+        if views is None:
+            inherited = () if node.parent_id is None else self._views(self.tree.nodes[node.parent_id])
+            own = self.overlays.get(node.node_id)
+            views = self.views[node.node_id] = inherited if own is None else inherited + (own,)
+        return views
+
+    async def fail(self, node: Node, error: str) -> None:
+        note = await self.close_workspace(node, merge=False)
+        self.tree.message_parent(node, f"Error: {node.node_type.value} agent failed: {error}{note}")
+        self.tree.set_state(node, NodeState.FAILED)
+
+    async def open_workspace(self, node: Node) -> None:
+        """Gives the node its overlay, unless it has one or its directory is too large to clone."""
+        if self.overlays.get(node.node_id) is not None or node.node_id in self.overlays.too_large:
+            return
+        try:
+            await asyncio.to_thread(self.overlays.create, node.node_id, self.directory(node))
+        except overlay.OverlayTooLarge:
+            pass  # the node works in the shared directory
+        self.views.pop(node.node_id, None)  # resolved without the new overlay
+
+    async def close_workspace(self, node: Node, merge: bool = True) -> str:
+        """Ends the node's shell session and merges its overlay back (or discards it, for a failed node).
+
+        Returns a note for the parent on conflicts or a merge that could not finish.
+        """
+        await shell.default_sessions.close(node.node_id)
+        self.views.pop(node.node_id, None)
+        view = self.overlays.get(node.node_id)
+        if view is None:
+            return ""
+        if not merge:
+            self.overlays.discard(view)
+            return ""
+        try:
+            report = await asyncio.to_thread(view.merge)
+        except OSError as e:
+            return f"\n\n[Error: could not merge this agent's changes back ({e}). Its versions are in {view.root}]"
+        return "" if report.clean else f"\n\n[{report.summary(view.root)}]"
+
     def generate_id(self) -> str:
         return str(uuid.uuid4())
 
     def parse_xml_tag(self, text: str, tag: str) -> str | None:
         match = re.search(rf"<{tag}>(.*?)</{tag}>", text, re.DOTALL)
         return match.group(1).strip() if match else None
+
+
+class TurnDispatcher:
+    """Dispatches one assistant turn's tool calls, possibly while the turn is still streaming.
+
+    The assistant message is opened on the first dispatch so that results from
+    early-spawned children always land after it. Workspace tool results and
+    spawn errors are appended in tool_use order by finish().
+    """
+
+    def __init__(self, neo: Neo, node: Node):
+        self.neo = neo
+        self.node = node
+        self.turn: Message | None = None
+        self.turn_index = -1
+        self.order: list[str] = []
+        self.errors: dict[str, str] = {}
+        self.spawned = False
+        absolute_working_dir = neo.directory(node)
+        self.batch = tool_defs.ToolBatch(neo.tree, node.node_id, absolute_working_dir, NODE_CONFIG[node.node_type].shell)
+        node.active_tool_calls.clear()
+
+    def open_turn(self) -> Message:
+        if self.turn is None:
+            self.turn = Message(role="assistant", content=[])
+            self.turn_index = self.neo.tree.append_message(self.node, self.turn)
+        return self.turn
+
+    def close_turn(self, content: list) -> None:
+        self.open_turn().content = content
+        self.neo.tree.update_message(self.node, self.turn_index)
+
+    def dispatch(self, tc: ToolCall) -> None:
+        if tc.id in self.order:
+            return
+        self.order.append(tc.id)
+        turn = self.open_turn()
+        if not any(block.get("id") == tc.id for block in turn.content):
+            self.neo.tree.append_block(self.node, self.turn_index, {"type": "tool_use", "id": tc.id, "name": tc.name, "input": tc.input})
+
+        if tc.name != "spawn_subagent":
+            self.neo.tree.add_tool_call(self.node, tc)
+            self.node.active_tool_calls.append(tc)
+            self.batch.submit(tc)
+            return
+
+        child = self.neo.spawn_subagent(self.node, tc)
+        if isinstance(child, str):
+            self.errors[tc.id] = child
+        elif self.spawned:
+            self.neo.tree.extend_children(self.node, [child])
+        else:
+            self.neo.tree.add_children(self.node, [child])
+            self.spawned = True
+
+    async def finish(self) -> None:
+        results = await self.batch.results()
+        self.node.metrics.tool_calls += len(self.batch.elapsed)
+        self.node.metrics.tool_latency += sum(self.batch.elapsed.values())
+        results.update(self.errors)
+        for tool_id in self.order:
+            if tool_id in results:
+                self.neo.tree.append_message(self.node, ToolResultMessage(tool_id, results[tool_id]))
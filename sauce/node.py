@@ -2,8 +2,12 @@ import json
 from enum import Enum
 from dataclasses import dataclass, field
 
+import sauce.blobs as blobs
 import sauce.prompts as prompts
 import sauce.tools as tool_defs
+from sauce.retry import RetryPolicy
+from sauce.metrics import NodeMetrics
+from sauce.compaction import CompactionConfig
 from sauce.models import Conversation, Message, ToolCall, UserMessage
 
 
@@ -26,22 +30,32 @@ class NodeConfig:
     model: str
     system_prompt: str
     message: str
+    retry: RetryPolicy = field(default_factory=RetryPolicy)
+    stream: bool = False  # dispatch tool calls as soon as their content block is complete
+    compaction: CompactionConfig | None = None
+    shell: tool_defs.ShellConfig = field(default_factory=tool_defs.ShellConfig)
+    overlay: bool = False  # work in a private copy-on-write clone of the working directory, merged back on completion
 
 
 NODE_CONFIG: dict[NodeType, NodeConfig] = {
-    NodeType.THINKING:  NodeConfig("claude-sonnet-4-6", prompts.THINKING_PROMPT, "MESSAGE"),
-    NodeType.CODE:      NodeConfig("claude-haiku-4-5",  prompts.CODE_PROMPT,     "MESSAGE"),
-    NodeType.TEST:      NodeConfig("claude-haiku-4-5",  prompts.TEST_PROMPT,     "MESSAGE"),
+    NodeType.THINKING:  NodeConfig("claude-sonnet-4-6", prompts.THINKING_PROMPT, "MESSAGE", stream=True,
+                                   compaction=CompactionConfig(token_budget=80_000, keep_recent_turns=8)),
+    NodeType.CODE:      NodeConfig("claude-haiku-4-5",  prompts.CODE_PROMPT,     "MESSAGE",
+                                   compaction=CompactionConfig(token_budget=40_000, keep_recent_turns=6),
+                                   shell=tool_defs.ShellConfig(persistent=True), overlay=True),
+    NodeType.TEST:      NodeConfig("claude-haiku-4-5",  prompts.TEST_PROMPT,     "MESSAGE",
+                                   compaction=CompactionConfig(token_budget=30_000, keep_recent_turns=4, stale_output_turns=2),
+                                   shell=tool_defs.ShellConfig(timeout=300.0, persistent=True), overlay=True),
 }
 
 TOOLS_FOR_NODE: dict[NodeType, list] = {
-    NodeType.THINKING:  [tool_defs.spawn_subagent, tool_defs.read_file, tool_defs.write_file, tool_defs.list_directory, tool_defs.run_shell],
-    NodeType.CODE:      [tool_defs.read_file, tool_defs.write_file, tool_defs.list_directory, tool_defs.run_shell, tool_defs.spawn_subagent],
-    NodeType.TEST:      [tool_defs.read_file, tool_defs.write_file, tool_defs.run_shell],
+    NodeType.THINKING:  [tool_defs.spawn_subagent, tool_defs.read_file, tool_defs.write_file, tool_defs.edit_file, tool_defs.list_directory, tool_defs.run_shell],
+    NodeType.CODE:      [tool_defs.read_file, tool_defs.write_file, tool_defs.edit_file, tool_defs.list_directory, tool_defs.run_shell, tool_defs.spawn_subagent],
+    NodeType.TEST:      [tool_defs.read_file, tool_defs.write_file, tool_defs.edit_file, tool_defs.run_shell],
 }
 
 
-@dataclass
+@dataclass(slots=True)
 class Node:
     node_id: str
     node_type: NodeType
@@ -65,6 +79,8 @@ class Node:
     # Working directory for this node
     working_directory: str = "."
 
+    metrics: NodeMetrics = field(default_factory=NodeMetrics)
+
     def to_dict(self) -> dict:
         return {
             "node_id": self.node_id,
@@ -76,9 +92,10 @@ class Node:
             "active_children": list(self.active_children),
             "for_vis": self.for_vis,
             "tool_calls": [{"id": tc.id, "name": tc.name, "input": tc.input} for tc in self.tool_calls],
-            "file_versions": self.file_versions,
+            "file_versions": dict(self.file_versions),  # tools update it from worker threads
             "working_directory": self.working_directory,
             "active_tool_calls": [{"id": tc.id, "name": tc.name, "input": tc.input} for tc in self.active_tool_calls],
+            "metrics": self.metrics.to_dict(),
             "conversation": {
                 "system": self.conversation.system,
                 "messages": self.conversation.to_list(),
@@ -86,11 +103,25 @@ class Node:
         }
 
     @classmethod
-    def from_dict(cls, data: dict) -> "Node":
-        conversation = Conversation(
-            system=data["conversation"]["system"],
-            messages=[Message(**m) for m in data["conversation"]["messages"]],
-        )
+    def from_dict(
+        cls,
+        data: dict,
+        conversation: Conversation | None = None,
+        tool_calls: list[ToolCall] | None = None,
+    ) -> "Node":
+        """`conversation` and `tool_calls` replace the ones in `data`, e.g. with lazily loaded ones.
+
+        Large payloads in `data` are interned in the blob store, so a loaded tree
+        shares them like a live one.
+        """
+        store = blobs.default_store
+        if conversation is None:
+            conversation = Conversation(
+                system=data["conversation"]["system"],
+                messages=[Message(m["role"], store.intern(m["content"])) for m in data["conversation"]["messages"]],
+            )
+        if tool_calls is None:
+            tool_calls = [ToolCall(tc["id"], tc["name"], store.intern(tc["input"])) for tc in data.get("tool_calls", [])]
         return cls(
             node_id=data["node_id"],
             node_type=NodeType(data["node_type"]),
@@ -100,9 +131,12 @@ class Node:
             state=NodeState(data["state"]),
             children_ids=data.get("children_ids", []),
             active_children=set(data.get("active_children", [])),
-            active_tool_calls=[ToolCall(**tc) for tc in data.get("active_tool_calls", [])],
+            active_tool_calls=[
+                ToolCall(tc["id"], tc["name"], store.intern(tc["input"])) for tc in data.get("active_tool_calls", [])
+            ],
             for_vis=data.get("for_vis", []),
-            tool_calls=[ToolCall(**tc) for tc in data.get("tool_calls", [])],
+            tool_calls=tool_calls,
             file_versions=data.get("file_versions", {}),
             working_directory=data.get("working_directory", "."),
+            metrics=NodeMetrics.from_dict(data.get("metrics", {})),
         )
@@ -0,0 +1,371 @@
+"""
+Copy-on-write workspace overlays for agents.
+
+An overlay is a private clone of a node's working directory. The node's
+tools and shell run inside it, so sibling agents never see each other's
+half-finished files or collide on writes. When the node finishes, its
+changes are merged back into the directory it was cloned from:
+
+- Files only this node changed are copied over.
+- Files changed on both sides are three-way merged by line (sauce/merge.py).
+- Only overlapping edits are reported as conflicts. A conflicting file is
+  left as the shared version; the node's copy stays in its overlay.
+
+Files are cloned with a reflink where the filesystem supports it (btrfs,
+XFS) and copied otherwise. Dependency and VCS directories (SHARED_DIRS) are
+symlinked rather than copied, so they are shared, not copy-on-write.
+
+Creating an overlay costs a walk of the whole tree plus, per file, a clone,
+a sha256 and a second clone into the object store: on a filesystem without
+reflinks that is about twice the tree's size in disk writes. To bound it,
+directories named in the base's top-level .gitignore (build/, dist/, ...)
+and files over `max_file_bytes` are symlinked like SHARED_DIRS, and a tree
+with more than `max_total_bytes` left to clone raises OverlayTooLarge so the
+node can run in the shared directory instead.
+
+The base version of every cloned file is kept in a content-addressed object
+store, and each overlay's manifest is written to disk, both under
+<env>/.neo. An interrupted run can therefore reattach to its overlays on
+resume.
+"""
+
+import os
+import json
+import fnmatch
+import stat
+import fcntl
+import shutil
+import hashlib
+import tempfile
+from dataclasses import dataclass, field
+
+import sauce.workspace as workspace
+from sauce.merge import merge3
+
+STATE_DIR = ".neo"
+SHARED_DIRS = frozenset({STATE_DIR, ".git", "node_modules", ".venv", "venv", "__pycache__", ".pytest_cache", ".mypy_cache"})
+FICLONE = 0x40049409  # linux/fs.h: _IOW(0x94, 9, int)
+
+
+class OverlayTooLarge(Exception):
+    pass
+
+
+@dataclass
+class MergeReport:
+    copied: list[str] = field(default_factory=list)     # changed only in the overlay
+    merged: list[str] = field(default_factory=list)     # changed on both sides, merged cleanly
+    deleted: list[str] = field(default_factory=list)
+    conflicts: dict[str, str] = field(default_factory=dict)  # path → why it could not be merged
+
+    @property
+    def clean(self) -> bool:
+        return not self.conflicts
+
+    def summary(self, overlay_root: str) -> str:
+        changed = len(self.copied) + len(self.merged) + len(self.deleted)
+        text = f"Merged {changed} changed file(s) back into the shared workspace"
+        if self.merged:
+            text += f" ({len(self.merged)} also changed by other agents, merged by line)"
+        if self.conflicts:
+            details = "; ".join(f"{path}: {why}" for path, why in sorted(self.conflicts.items()))
+            text += (f". CONFLICT: {len(self.conflicts)} file(s) kept the shared version because both sides "
+                     f"changed the same lines ({details}). This agent's versions are in {overlay_root}")
+        return text
+
+
+@dataclass
+class _FileState:
+    digest: str
+    stat_key: tuple[int, int, int]  # mtime_ns, size, inode of the overlay's clone when it was made
+
+
+class Overlay:
+    """One node's private clone of `base_dir` at `root`."""
+
+    def __init__(self, store: "OverlayStore", node_id: str, base_dir: str, root: str, files: dict[str, _FileState],
+                 shared: frozenset[str] = frozenset()):
+        self.store = store
+        self.node_id = node_id
+        self.base_dir = base_dir
+        self.root = root
+        self.files = files
+        self.shared = shared  # large files symlinked to the base instead of cloned
+
+    def path_of(self, base_path: str) -> str | None:
+        """Where `base_path` (a path under base_dir) lives in this overlay, or None if outside it."""
+        relative = os.path.relpath(base_path, self.base_dir)
+        if relative == ".":
+            return self.root
+        if relative.startswith(os.pardir):
+            return None
+        return os.path.join(self.root, relative)
+
+    def merge(self) -> MergeReport:
+        """Merges this overlay's changes into base_dir; the overlay is removed unless something conflicted."""
+        report = MergeReport()
+        seen = set()
+        for relative in _walk(self.root):
+            seen.add(relative)
+            self._merge_file(relative, report)
+        for relative in self.files.keys() - seen:
+            self._merge_deletion(relative, report)
+        if report.clean:
+            self.store.discard(self)
+        return report
+
+    def _merge_file(self, relative: str, report: MergeReport) -> None:
+        ours_path = os.path.join(self.root, relative)
+        base = self.files.get(relative)
+        if base is not None and _stat_key(os.stat(ours_path)) == base.stat_key:
+            return
+        ours = _digest(ours_path)
+        if base is not None and ours == base.digest:
+            return
+
+        target = os.path.join(self.base_dir, relative)
+        with workspace.default_cache.lock(target):
+            if relative in self.shared:
+                # A shared file the node replaced rather than wrote through: last writer wins.
+                _install(ours_path, target)
+                report.copied.append(relative)
+                return
+            theirs = _digest(target) if os.path.isfile(target) else None
+            if theirs == (base.digest if base else None):
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                _install(ours_path, target)
+                report.copied.append(relative)
+            elif theirs == ours:
+                return
+            elif base is None or theirs is None:
+                report.conflicts[relative] = "created by both" if base is None else "deleted by another agent"
+            else:
+                result = _merge_text(self.store.object(base.digest), ours_path, target)
+                if result is None:
+                    report.conflicts[relative] = "not text"
+                elif not result.clean:
+                    report.conflicts[relative] = "lines " + ", ".join(f"{a}-{b}" for a, b in result.conflicts)
+                else:
+                    _write_over(target, result.text.encode())
+                    report.merged.append(relative)
+
+    def _merge_deletion(self, relative: str, report: MergeReport) -> None:
+        target = os.path.join(self.base_dir, relative)
+        with workspace.default_cache.lock(target):
+            if not os.path.isfile(target):
+                return
+            if _digest(target) == self.files[relative].digest:
+                os.unlink(target)
+                report.deleted.append(relative)
+            else:
+                report.conflicts[relative] = "deleted here but changed by another agent"
+
+
+class OverlayStore:
+    """Overlays and base objects for one environment, under <env>/.neo."""
+
+    def __init__(self, env_directory: str, max_file_bytes: int = 16 * 1024 * 1024,
+                 max_total_bytes: int = 1024 * 1024 * 1024):
+        self.state_dir = os.path.join(os.path.abspath(env_directory), STATE_DIR)
+        self.objects_dir = os.path.join(self.state_dir, "objects")
+        self.overlays_dir = os.path.join(self.state_dir, "overlays")
+        self.max_file_bytes = max_file_bytes    # larger files are symlinked, not cloned
+        self.max_total_bytes = max_total_bytes  # larger trees raise OverlayTooLarge
+        self.too_large: set[str] = set()        # nodes that run without an overlay
+        self._open: dict[str, Overlay] = {}
+
+    def get(self, node_id: str) -> Overlay | None:
+        """The node's overlay, reattaching one left on disk by an interrupted run."""
+        overlay = self._open.get(node_id)
+        if overlay is None and os.path.exists(self._manifest(node_id)):
+            with open(self._manifest(node_id)) as f:
+                data = json.load(f)
+            files = {path: _FileState(digest, tuple(key)) for path, (digest, key) in data["files"].items()}
+            overlay = self._open[node_id] = Overlay(self, node_id, data["base_dir"], data["root"], files,
+                                                    frozenset(data.get("shared", ())))
+        return overlay
+
+    def create(self, node_id: str, base_dir: str) -> Overlay:
+        """Clones `base_dir` into a new overlay for `node_id`; raises OverlayTooLarge past max_total_bytes."""
+        root = os.path.join(self.overlays_dir, node_id)
+        if os.path.exists(root):
+            shutil.rmtree(root)
+        try:
+            os.mkdir(root)
+        except FileNotFoundError:
+            os.makedirs(root)
+
+        try:
+            files, shared = self._clone_tree(base_dir, root)
+        except BaseException as e:
+            shutil.rmtree(root, ignore_errors=True)
+            self._collect()
+            if isinstance(e, OverlayTooLarge):
+                self.too_large.add(node_id)
+            raise
+
+        overlay = self._open[node_id] = Overlay(self, node_id, os.path.abspath(base_dir), root, files, frozenset(shared))
+        manifest = {"base_dir": overlay.base_dir, "root": root, "shared": sorted(shared),
+                    "files": {path: [f.digest, list(f.stat_key)] for path, f in files.items()}}
+        _write_over(self._manifest(node_id), json.dumps(manifest).encode())
+        return overlay
+
+    def _clone_tree(self, base_dir: str, root: str) -> tuple[dict[str, _FileState], list[str]]:
+        files, shared, total = {}, [], 0
+        ignored = _ignored_dirs(base_dir)
+        for dirpath, dirnames, filenames in os.walk(base_dir):
+            relative_dir = os.path.relpath(dirpath, base_dir)
+            target_dir = root if relative_dir == "." else os.path.join(root, relative_dir)
+            for name in [d for d in dirnames if _is_shared_dir(dirpath, d, ignored)]:
+                dirnames.remove(name)
+                if name != STATE_DIR:
+                    os.symlink(os.path.join(dirpath, name), os.path.join(target_dir, name))
+            for name in dirnames:
+                os.mkdir(os.path.join(target_dir, name))
+            for name in filenames:
+                source, clone = os.path.join(dirpath, name), os.path.join(target_dir, name)
+                if os.path.islink(source):
+                    os.symlink(os.readlink(source), clone)
+                    continue
+                if not os.path.isfile(source):
+                    continue
+                relative = name if relative_dir == "." else os.path.join(relative_dir, name)
+                size = os.stat(source).st_size
+                if size > self.max_file_bytes:
+                    os.symlink(source, clone)
+                    shared.append(relative)
+                    continue
+                total += size
+                if total > self.max_total_bytes:
+                    raise OverlayTooLarge(f"{base_dir} has more than {self.max_total_bytes} bytes to clone")
+                _clone(source, clone)
+                digest = _digest(clone)
+                self._keep(clone, digest)
+                files[relative] = _FileState(digest, _stat_key(os.stat(clone)))
+        return files, shared
+
+    def discard(self, overlay: Overlay) -> None:
+        self._open.pop(overlay.node_id, None)
+        shutil.rmtree(overlay.root, ignore_errors=True)
+        if os.path.exists(self._manifest(overlay.node_id)):
+            os.unlink(self._manifest(overlay.node_id))
+        self._collect()
+
+    def _collect(self) -> None:
+        if not self._open and not any(name.endswith(".json") for name in os.listdir(self.overlays_dir)):
+            # No overlay can need a base any more.
+            shutil.rmtree(self.objects_dir, ignore_errors=True)
+
+    def object(self, digest: str) -> bytes:
+        with open(self._object(digest), "rb") as f:
+            return f.read()
+
+    def _keep(self, path: str, digest: str) -> None:
+        """Stores `path` as the base object for `digest`, once."""
+        target = self._object(digest)
+        if os.path.exists(target):
+            return
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), suffix=".tmp")
+        os.close(fd)
+        _clone(path, tmp)
+        os.replace(tmp, target)
+
+    def _object(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], digest[2:])
+
+    def _manifest(self, node_id: str) -> str:
+        return os.path.join(self.overlays_dir, f"{node_id}.json")
+
+
+def _ignored_dirs(base_dir: str) -> list[str]:
+    """Directory name patterns from base_dir's .gitignore, e.g. `build/` or `*.egg-info`.
+
+    Only plain name patterns are used; negated and path patterns are skipped.
+    """
+    try:
+        with open(os.path.join(base_dir, ".gitignore")) as f:
+            lines = f.read().splitlines()
+    except (OSError, UnicodeDecodeError):
+        return []
+    patterns = []
+    for line in lines:
+        pattern = line.strip().rstrip("/")
+        if pattern and pattern[0] not in "#!" and "/" not in pattern:
+            patterns.append(pattern)
+    return patterns
+
+
+def _is_shared_dir(dirpath: str, name: str, ignored: list[str]) -> bool:
+    return (name in SHARED_DIRS or os.path.islink(os.path.join(dirpath, name))
+            or any(fnmatch.fnmatch(name, pattern) for pattern in ignored))
+
+
+def _walk(root: str):
+    """Relative paths of the regular files in an overlay, skipping shared (symlinked) directories."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if not os.path.islink(os.path.join(dirpath, d))]
+        relative_dir = os.path.relpath(dirpath, root)
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            if os.path.isfile(path) and not os.path.islink(path):
+                yield name if relative_dir == "." else os.path.join(relative_dir, name)
+
+
+def _merge_text(base: bytes, ours_path: str, target: str):
+    try:
+        with open(ours_path, "rb") as f:
+            ours = f.read().decode()
+        with open(target, "rb") as f:
+            theirs = f.read().decode()
+        return merge3(base.decode(), ours, theirs)
+    except UnicodeDecodeError:
+        return None
+
+
+def _clone(source: str, target: str) -> None:
+    """Copies `source` to `target` (with its mode and times), sharing extents where the filesystem can."""
+    with open(source, "rb") as src, open(target, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError:
+            shutil.copyfileobj(src, dst, 1024 * 1024)
+    shutil.copystat(source, target)
+
+
+def _install(source: str, target: str) -> None:
+    """Replaces `target` with a copy of `source` by atomic rename."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), prefix=f".{os.path.basename(target)}.", suffix=".tmp")
+    os.close(fd)
+    try:
+        _clone(source, tmp)
+        os.replace(tmp, target)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def _write_over(target: str, data: bytes) -> None:
+    """Replaces `target` with `data` by atomic rename, keeping its mode if it exists."""
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(target), prefix=f".{os.path.basename(target)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        if os.path.exists(target):
+            os.chmod(tmp, stat.S_IMODE(os.stat(target).st_mode))
+        os.replace(tmp, target)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def _digest(path: str) -> str:
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def _stat_key(st: os.stat_result) -> tuple[int, int, int]:
+    return st.st_mtime_ns, st.st_size, st.st_ino
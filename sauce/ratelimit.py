@@ -0,0 +1,211 @@
+import os
+import json
+import time
+import asyncio
+import dataclasses
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+from sauce.models import AgentResponse
+
+
+@dataclass
+class ModelLimits:
+    max_concurrency: int
+    requests_per_minute: int
+    input_tokens_per_minute: int   # uncached input plus cache writes; cache reads do not count
+    output_tokens_per_minute: int
+
+
+DEFAULT_LIMITS = ModelLimits(max_concurrency=10, requests_per_minute=50,
+                             input_tokens_per_minute=30_000, output_tokens_per_minute=8_000)
+
+# Defaults for the account tier; override with --rate-limits or NEO_RATE_LIMITS (see load_limits).
+MODEL_LIMITS: dict[str, ModelLimits] = {
+    "claude-sonnet-4-6": ModelLimits(max_concurrency=10, requests_per_minute=50,
+                                     input_tokens_per_minute=30_000, output_tokens_per_minute=8_000),
+    "claude-haiku-4-5":  ModelLimits(max_concurrency=20, requests_per_minute=100,
+                                     input_tokens_per_minute=80_000, output_tokens_per_minute=20_000),
+}
+
+
+def load_limits(spec: str, base: dict[str, ModelLimits] | None = None) -> dict[str, ModelLimits]:
+    """MODEL_LIMITS (or `base`) overridden by `spec`: JSON, or the path of a JSON file.
+
+    The JSON maps model names to the fields to change, e.g.
+    {"claude-sonnet-4-6": {"input_tokens_per_minute": 400000}}. Models not in
+    the base start from DEFAULT_LIMITS.
+    """
+    text = spec
+    if not spec.lstrip().startswith("{"):
+        with open(spec) as f:
+            text = f.read()
+    limits = dict(base if base is not None else MODEL_LIMITS)
+    for model, fields in json.loads(text).items():
+        limits[model] = dataclasses.replace(limits.get(model, DEFAULT_LIMITS), **fields)
+    return limits
+
+
+def limits_from_env() -> dict[str, ModelLimits]:
+    spec = os.environ.get("NEO_RATE_LIMITS")
+    return load_limits(spec) if spec else MODEL_LIMITS
+
+
+class TokenBucket:
+    """Continuously refilling bucket holding at most `per_minute` units."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def take(self, amount: float) -> None:
+        amount = min(amount, self.capacity)
+        self._refill()
+        while self.tokens < amount:
+            await asyncio.sleep((amount - self.tokens) / self.rate)
+            self._refill()
+        self.tokens -= amount
+
+    def has(self, amount: float) -> bool:
+        """Whether take(amount) would return without waiting."""
+        self._refill()
+        return self.tokens >= min(amount, self.capacity)
+
+    def adjust(self, delta: float) -> None:
+        """Charges (positive) or refunds (negative) units after the fact; may go into debt."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens - delta)
+
+
+class ModelLimiter:
+    """Admission control for one model: AIMD concurrency plus request, input and output token budgets.
+
+    Concurrency grows by roughly one slot per window of successful calls and is
+    halved on a 429/529, at most once per second so a burst of in-flight
+    rejections counts as a single congestion signal.
+
+    A request is charged its estimated input and the model's recent average
+    output up front; on_success() settles both against the response's usage.
+    A hedged duplicate is charged the same and holds a slot of its own, so
+    hedging never sends more than the configured concurrency or budgets.
+    """
+
+    def __init__(self, model: str, limits: ModelLimits):
+        self.model = model
+        self.limits = limits
+        self.limit = float(limits.max_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.requests = TokenBucket(limits.requests_per_minute)
+        self.input_tokens = TokenBucket(limits.input_tokens_per_minute)
+        self.output_tokens = TokenBucket(limits.output_tokens_per_minute)
+        self.expected_output = 500.0  # moving average of output tokens per response
+        self._cond = asyncio.Condition()
+
+    @asynccontextmanager
+    async def slot(self, estimated_tokens: int):
+        """Waits for a concurrency slot and budget for `estimated_tokens` of input."""
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < max(1, int(self.limit)))
+            self.in_flight += 1
+        try:
+            while (delay := self.paused_until - time.monotonic()) > 0:
+                await asyncio.sleep(delay)
+            await self.requests.take(1)
+            await self.input_tokens.take(estimated_tokens)
+            await self.output_tokens.take(self.expected_output)
+            yield
+        finally:
+            async with self._cond:
+                self.in_flight -= 1
+                self._cond.notify_all()
+
+    def try_slot(self, estimated_tokens: int) -> bool:
+        """Takes a slot and charges the budgets like slot(), but only if that needs no wait.
+
+        For hedged duplicates, which are not worth queueing for. Pair with release_nowait().
+        """
+        if self.in_flight >= max(1, int(self.limit)) or self.paused_until > time.monotonic():
+            return False
+        if not (self.requests.has(1) and self.input_tokens.has(estimated_tokens)
+                and self.output_tokens.has(self.expected_output)):
+            return False
+        self.in_flight += 1
+        self.requests.adjust(1)
+        self.input_tokens.adjust(estimated_tokens)
+        self.output_tokens.adjust(self.expected_output)
+        return True
+
+    def release_nowait(self) -> None:
+        """Frees a slot taken by try_slot(), e.g. from a done callback."""
+        self.in_flight -= 1
+        asyncio.ensure_future(self._notify())
+
+    async def _notify(self) -> None:
+        async with self._cond:
+            self._cond.notify_all()
+
+    def on_success(self, estimated_tokens: int, result: AgentResponse) -> None:
+        """Settles the charges made by slot() against what the response actually used."""
+        self.input_tokens.adjust(result.input_tokens + result.cache_creation_input_tokens - estimated_tokens)
+        self.output_tokens.adjust(result.output_tokens - self.expected_output)
+        self.expected_output += 0.2 * (result.output_tokens - self.expected_output)
+        self.limit = min(float(self.limits.max_concurrency), self.limit + 1.0 / self.limit)
+
+    def on_throttle(self, retry_after: float | None, attempt: int) -> None:
+        now = time.monotonic()
+        if now - self.last_decrease >= 1.0:
+            self.limit = max(1.0, self.limit / 2)
+            self.last_decrease = now
+        backoff = retry_after if retry_after is not None else min(60.0, 2.0 ** attempt)
+        self.paused_until = max(self.paused_until, now + backoff)
+
+
+class LimiterPool:
+    """Lazily creates one ModelLimiter per model, capped at `max_concurrency` each.
+
+    `limits` overrides MODEL_LIMITS, e.g. from load_limits() or to lift budgets
+    when load-testing against a local fake.
+    """
+
+    def __init__(self, max_concurrency: int | None = None, limits: dict[str, ModelLimits] | None = None):
+        self.max_concurrency = max_concurrency
+        self.limits = limits or limits_from_env()
+        self.limiters: dict[str, ModelLimiter] = {}
+
+    def get(self, model: str) -> ModelLimiter:
+        if model not in self.limiters:
+            limits = self.limits.get(model, DEFAULT_LIMITS)
+            if self.max_concurrency is not None:
+                limits = dataclasses.replace(limits, max_concurrency=min(limits.max_concurrency, self.max_concurrency))
+            self.limiters[model] = ModelLimiter(model, limits)
+        return self.limiters[model]
+
+
+default_pool = LimiterPool()
+
+
+def estimate_tokens(request: dict) -> int:
+    """Cheap ~4 chars/token estimate of a request's input size, tool schemas included."""
+    chars = sum(len(str(m["content"])) for m in request["messages"])
+    chars += sum(len(block["text"]) for block in request.get("system", []))
+    chars += sum(len(str(tool)) for tool in request.get("tools", []))
+    return chars // 4
+
+
+def retry_after(error: Exception) -> float | None:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,94 @@
+import random
+import asyncio
+from collections import deque
+from dataclasses import dataclass
+
+import anthropic
+
+
+@dataclass
+class RetryPolicy:
+    timeout: float = 120.0                 # per-attempt deadline for a non-streamed request, seconds
+    stream_idle_timeout: float = 60.0      # streams: longest wait for the first event or between events
+    deadline: float | None = None          # overall deadline across retries, seconds
+    max_retries: int = 5
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    hedge_percentile: float | None = None  # e.g. 0.95: duplicate requests slower than p95
+    hedge_min_samples: int = 20
+
+
+DEFAULT_POLICY = RetryPolicy()
+
+# Server-side failures worth retrying; 429/529 are throttles and go through the limiter.
+RETRYABLE_STATUS_CODES = {408, 409, 500, 502, 503, 504}
+THROTTLE_STATUS_CODES = {429, 529}
+
+
+def is_throttle(error: Exception) -> bool:
+    return isinstance(error, anthropic.APIStatusError) and error.status_code in THROTTLE_STATUS_CODES
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, anthropic.APIConnectionError)):
+        return True
+    return isinstance(error, anthropic.APIStatusError) and error.status_code in RETRYABLE_STATUS_CODES
+
+
+def backoff_delay(policy: RetryPolicy, attempt: int) -> float:
+    """Full-jitter exponential backoff."""
+    return random.uniform(0, min(policy.max_delay, policy.base_delay * 2 ** attempt))
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies for one model."""
+
+    def __init__(self, window: int = 200):
+        self.samples: deque[float] = deque(maxlen=window)
+
+    def record(self, latency: float) -> None:
+        self.samples.append(latency)
+
+    def percentile(self, p: float, min_samples: int) -> float | None:
+        if len(self.samples) < min_samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+async def hedged(make_call, hedge_after: float | None, timeout: float, make_hedge=None):
+    """Awaits make_call(); if it is still running after `hedge_after` seconds, races a duplicate.
+
+    The duplicate comes from make_hedge() (default make_call()), which may
+    return None to skip it, e.g. when the limiter has no slot free. The first
+    successful result wins and the other request is cancelled. Raises
+    asyncio.TimeoutError if nothing succeeds within `timeout`.
+    """
+    loop = asyncio.get_running_loop()
+    end = loop.time() + timeout
+    tasks = {asyncio.ensure_future(make_call())}
+    hedge_at = loop.time() + hedge_after if hedge_after is not None else None
+    error: BaseException | None = None
+
+    try:
+        while tasks:
+            wake = min(end, hedge_at) if hedge_at is not None else end
+            done, tasks = await asyncio.wait(tasks, timeout=max(0.0, wake - loop.time()), return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+
+            if hedge_at is not None and loop.time() >= hedge_at and tasks:
+                hedge_at = None
+                duplicate = (make_hedge or make_call)()
+                if duplicate is not None:
+                    tasks.add(asyncio.ensure_future(duplicate))
+            elif loop.time() >= end:
+                raise asyncio.TimeoutError()
+
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
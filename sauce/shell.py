@@ -0,0 +1,302 @@
+"""
+Shell execution for run_shell: one-shot commands and persistent per-node sessions.
+
+Output is captured through bounded head/tail buffers that spill the full
+stream to a log file, so memory per command is capped however much it prints.
+
+A session is one long-lived shell per node, so `cd`, `export` and activated
+virtualenvs carry over between calls. Each command is sent through `eval`
+with stdin closed, followed by a unique sentinel on stdout (carrying the exit
+status) and on stderr; output up to the sentinels belongs to that command. A
+command that times out kills the session's process group, and the next
+command starts a fresh shell.
+"""
+
+import os
+import uuid
+import shlex
+import signal
+import asyncio
+import tempfile
+import subprocess
+from collections import deque
+from dataclasses import dataclass
+
+SESSION_SHELL = ["/bin/bash", "--noprofile", "--norc"] if os.path.exists("/bin/bash") else ["/bin/sh"]
+
+
+@dataclass
+class ShellConfig:
+    timeout: float = 30.0                  # seconds before the command's process group is killed
+    head_bytes: int = 8_000                # start of each stream returned to the model
+    tail_bytes: int = 16_000               # end of each stream returned to the model
+    log_dir: str | None = None             # where full logs spill; defaults to <tmp>/neo-shell-logs
+    max_log_bytes: int = 64 * 1024 * 1024  # a spilled log stops growing here; the tail keeps updating
+    persistent: bool = False               # one long-lived shell per node instead of one per command
+
+
+class _Capture:
+    """One output stream, held as a bounded head and tail ring; spills to a log once they overflow.
+
+    Memory per stream is capped at head_bytes + tail_bytes + one read.
+    """
+
+    def __init__(self, name: str, config: ShellConfig, node_id: str | None):
+        self.name = name
+        self.config = config
+        self.node_id = node_id
+        self.head = bytearray()
+        self.tail: deque[bytes] = deque()
+        self.tail_size = 0
+        self.total = 0
+        self.log = None
+        self.log_path: str | None = None
+        self.logged = 0
+
+    async def drain(self, stream: asyncio.StreamReader) -> None:
+        while chunk := await stream.read(65536):
+            self.add(chunk)
+
+    async def drain_until(self, stream: asyncio.StreamReader, sentinel: bytes) -> str | None:
+        """Reads up to `sentinel` and returns the rest of its line, or None if the stream ends first."""
+        pending = b""
+        try:
+            while chunk := await stream.read(65536):
+                pending += chunk
+                found = pending.find(sentinel)
+                if found >= 0:
+                    self.add(pending[:found])
+                    pending, rest = b"", pending[found + len(sentinel):]
+                    while b"\n" not in rest and (chunk := await stream.read(65536)):
+                        rest += chunk
+                    return rest.partition(b"\n")[0].decode(errors="replace").strip()
+                # Hold back enough bytes to match a sentinel split across reads.
+                keep = max(0, len(pending) - len(sentinel) + 1)
+                self.add(pending[:keep])
+                pending = pending[keep:]
+            return None
+        finally:
+            self.add(pending)  # partial output of a command that timed out or ended the shell
+
+    def add(self, chunk: bytes) -> None:
+        if not chunk:
+            return
+        self.total += len(chunk)
+        room = self.config.head_bytes - len(self.head)
+        if room > 0:
+            self.head += chunk[:room]
+            chunk = chunk[room:]
+        if not chunk:
+            return
+        if self.log is None and self.total > self.config.head_bytes + self.config.tail_bytes:
+            self._spill()
+        self._write(chunk)
+        self.tail.append(chunk)
+        self.tail_size += len(chunk)
+        while self.tail_size - len(self.tail[0]) >= self.config.tail_bytes:
+            self.tail_size -= len(self.tail.popleft())
+
+    def _spill(self) -> None:
+        log_dir = self.config.log_dir or os.path.join(tempfile.gettempdir(), "neo-shell-logs")
+        os.makedirs(log_dir, exist_ok=True)
+        fd, self.log_path = tempfile.mkstemp(dir=log_dir, prefix=f"{self.node_id or 'shell'}-", suffix=f".{self.name}.log")
+        self.log = os.fdopen(fd, "wb")
+        self._write(bytes(self.head))
+        for chunk in self.tail:
+            self._write(chunk)
+
+    def _write(self, chunk: bytes) -> None:
+        if self.log is None or self.logged >= self.config.max_log_bytes:
+            return
+        chunk = chunk[:self.config.max_log_bytes - self.logged]
+        self.log.write(chunk)
+        self.logged += len(chunk)
+
+    def close(self) -> None:
+        if self.log is not None:
+            self.log.close()
+
+    def text(self) -> str:
+        tail = b"".join(self.tail)
+        if self.total <= self.config.head_bytes + self.config.tail_bytes:
+            return (bytes(self.head) + tail).decode(errors="replace")
+        tail = tail[-self.config.tail_bytes:]
+        omitted = self.total - len(self.head) - len(tail)
+        where = f"full {self.name} in {self.log_path}"
+        if self.logged < self.total:
+            where += f" (first {self.logged} bytes)"
+        return (
+            f"{bytes(self.head).decode(errors='replace')}\n"
+            f"... [{omitted} bytes omitted of {self.total}; {where}; page through it with read_file offset/limit] ...\n"
+            f"{tail.decode(errors='replace')}"
+        )
+
+
+# ── One-shot commands ─────────────────────────────────────────────────────────
+
+async def run_command(command: str, working_directory: str, config: ShellConfig, node_id: str | None = None) -> str:
+    """Runs `command` in a fresh shell and returns its formatted output."""
+    stdout, stderr = _Capture("stdout", config, node_id), _Capture("stderr", config, node_id)
+    proc = None
+    try:
+        proc = await asyncio.create_subprocess_shell(
+            command,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=working_directory,
+            env=_environment(),
+            start_new_session=True,
+        )
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(stdout.drain(proc.stdout), stderr.drain(proc.stderr), proc.wait()),
+                timeout=config.timeout,
+            )
+        except asyncio.TimeoutError:
+            return f"Error: command timed out after {config.timeout:g} seconds\n{_output(stdout, stderr, None)}"
+        return _output(stdout, stderr, proc.returncode) or "(no output)"
+    except Exception as e:
+        return f"Error: {e}"
+    finally:
+        if proc is not None and proc.returncode is None:
+            _kill_process_group(proc)
+            await proc.wait()
+        stdout.close()
+        stderr.close()
+
+
+# ── Sessions ──────────────────────────────────────────────────────────────────
+
+class ShellSession:
+    """A long-lived shell for one node; commands run one at a time, in order."""
+
+    def __init__(self, node_id: str, working_directory: str, config: ShellConfig):
+        self.node_id = node_id
+        self.working_directory = working_directory
+        self.config = config
+        self.proc: asyncio.subprocess.Process | None = None
+        self.commands = 0
+        self.starts = 0
+        self._lock = asyncio.Lock()
+
+    @property
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.returncode is None
+
+    async def run(self, command: str, timeout: float | None = None) -> str:
+        async with self._lock:
+            try:
+                if not self.alive:
+                    await self._start()
+                return await self._run(command, timeout or self.config.timeout)
+            except Exception as e:
+                await self.close()
+                return f"Error: {e}"
+
+    async def close(self) -> None:
+        if self.proc is not None and self.proc.returncode is None:
+            _kill_process_group(self.proc)
+            await self.proc.wait()
+        self.proc = None
+
+    async def _start(self) -> None:
+        self.proc = await asyncio.create_subprocess_exec(
+            *SESSION_SHELL,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            cwd=self.working_directory,
+            env=_environment(),
+            start_new_session=True,
+        )
+        self.starts += 1
+
+    async def _run(self, command: str, timeout: float) -> str:
+        self.commands += 1
+        sentinel = f"__neo_done_{uuid.uuid4().hex}__"
+        self.proc.stdin.write(
+            f"eval {shlex.quote(command)} </dev/null\n"
+            f"printf '%s %d\\n' {sentinel} $?\n"
+            f"printf '%s\\n' {sentinel} >&2\n".encode()
+        )
+        await self.proc.stdin.drain()
+
+        stdout, stderr = _Capture("stdout", self.config, self.node_id), _Capture("stderr", self.config, self.node_id)
+        try:
+            status, _ = await asyncio.wait_for(
+                asyncio.gather(stdout.drain_until(self.proc.stdout, sentinel.encode()),
+                               stderr.drain_until(self.proc.stderr, sentinel.encode())),
+                timeout=timeout,
+            )
+        except asyncio.TimeoutError:
+            await self.close()
+            return (f"Error: command timed out after {timeout:g} seconds; the shell session was restarted, "
+                    f"so cd/export state is lost\n{_output(stdout, stderr, None)}")
+        finally:
+            stdout.close()
+            stderr.close()
+
+        if status is None:
+            # The command ended the shell itself (e.g. `exit`).
+            returncode = await self.proc.wait()
+            self.proc = None
+            output = _output(stdout, stderr, returncode)
+            return f"{output}\n(shell session exited; the next command starts a new one)".lstrip("\n")
+        return _output(stdout, stderr, int(status)) or "(no output)"
+
+
+class SessionPool:
+    """One ShellSession per node, started on first use and closed when the node finishes."""
+
+    def __init__(self):
+        self._sessions: dict[str, ShellSession] = {}
+
+    def get(self, node_id: str, working_directory: str, config: ShellConfig) -> ShellSession:
+        session = self._sessions.get(node_id)
+        if session is None:
+            session = self._sessions[node_id] = ShellSession(node_id, working_directory, config)
+        return session
+
+    async def close(self, node_id: str) -> None:
+        session = self._sessions.pop(node_id, None)
+        if session is not None:
+            await session.close()
+
+    async def close_all(self) -> None:
+        for node_id in list(self._sessions):
+            await self.close(node_id)
+
+    def __contains__(self, node_id: str) -> bool:
+        return node_id in self._sessions
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+def _environment() -> dict[str, str]:
+    env = os.environ.copy()
+    env["CI"] = "true"
+    env["DEBIAN_FRONTEND"] = "noninteractive"
+    return env
+
+
+def _output(stdout: _Capture, stderr: _Capture, returncode: int | None) -> str:
+    output = stdout.text()
+    if stderr.total:
+        output += f"\nstderr:\n{stderr.text()}"
+    if returncode:
+        output += f"\nreturn code: {returncode}"
+    return output
+
+
+def _kill_process_group(proc: asyncio.subprocess.Process) -> None:
+    # The shell runs in its own session, so this also reaps anything it spawned.
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+# Shared by every node's run_shell calls in the process.
+default_sessions = SessionPool()
@@ -0,0 +1,242 @@
+"""
+Compact binary snapshots of a decomposition tree, loaded lazily.
+
+Layout: MAGIC, a codec id byte, one compressed frame per node holding its
+conversation and tool calls, one frame per large payload (see sauce.blobs),
+an index frame with every node's metadata and the offset and length of each
+frame, then a footer pointing at the index.
+
+Loading decodes only the index, so node metadata is available at once, and
+the file is memory-mapped; a node's conversation and tool calls are decoded
+the first time either is touched. Tool calls whose input is identical to the
+tool_use block in the same conversation (e.g. write_file contents) are stored
+once and share the decoded object. Large payloads are written once per
+snapshot however many nodes hold them, and decoded into the blob store.
+
+msgpack + zstandard are used when installed (pip install 'neo[snapshot]');
+otherwise frames fall back to JSON + zlib. The codec is recorded in the file,
+so a snapshot written with one can only be read where it is available.
+"""
+
+import json
+import mmap
+import zlib
+import struct
+import argparse
+from collections import UserList
+
+import sauce.blobs as blobs
+from sauce.models import Conversation, Message, ToolCall
+from sauce.node import Node
+from sauce.tree import DecompositionTree
+
+try:
+    import msgpack
+    import zstandard
+except ImportError:
+    msgpack = zstandard = None
+
+MAGIC = b"NEOSNAP1"
+FOOTER = struct.Struct("<QQ")  # index offset, index length
+SUFFIX = ".neosnap"
+
+MSGPACK_ZSTD = 1
+JSON_ZLIB = 2
+
+
+class _Codec:
+    def __init__(self, codec_id: int):
+        if codec_id == MSGPACK_ZSTD and msgpack is None:
+            raise RuntimeError("this snapshot needs msgpack and zstandard: pip install 'neo[snapshot]'")
+        self.id = codec_id
+        if codec_id == MSGPACK_ZSTD:
+            self._compressor = zstandard.ZstdCompressor(level=6)
+            self._decompressor = zstandard.ZstdDecompressor()
+
+    def encode(self, value) -> bytes:
+        if self.id == MSGPACK_ZSTD:
+            return self._compressor.compress(msgpack.packb(value, use_bin_type=True))
+        return zlib.compress(json.dumps(value, separators=(",", ":")).encode(), 6)
+
+    def decode(self, data) -> object:
+        if self.id == MSGPACK_ZSTD:
+            return msgpack.unpackb(self._decompressor.decompress(data), raw=False)
+        return json.loads(zlib.decompress(data))
+
+
+def is_snapshot(path: str) -> bool:
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+# ── Writing ───────────────────────────────────────────────────────────────────
+
+def save(tree: DecompositionTree, path: str) -> None:
+    codec = _Codec(MSGPACK_ZSTD if msgpack is not None else JSON_ZLIB)
+    index = {"root_id": tree.root.node_id, "nodes": [], "blobs": {}}
+    payloads: dict[str, str] = {}
+    with open(path, "wb") as f:
+        f.write(MAGIC + bytes([codec.id]))
+        for node in tree.nodes.values():
+            data = node.to_dict()
+            messages = data["conversation"]["messages"]
+            body = {"messages": messages, "tool_calls": _dedupe_tool_calls(data["tool_calls"], messages)}
+            frame = codec.encode(blobs.default_store.pack(body, payloads))
+            offset = f.tell()
+            f.write(frame)
+            meta = {k: v for k, v in data.items() if k not in ("conversation", "tool_calls")}
+            meta["system"] = data["conversation"]["system"]
+            meta["frame"] = [offset, len(frame)]
+            index["nodes"].append(meta)
+        for digest, text in payloads.items():
+            frame = codec.encode(text)
+            index["blobs"][digest] = [f.tell(), len(frame)]
+            f.write(frame)
+        index_frame = codec.encode(index)
+        offset = f.tell()
+        f.write(index_frame)
+        f.write(FOOTER.pack(offset, len(index_frame)))
+
+
+def _dedupe_tool_calls(tool_calls: list[dict], messages: list[dict]) -> list[dict]:
+    blocks = _tool_use_blocks(messages)
+    return [
+        {"id": tc["id"], "name": tc["name"], "same_as_tool_use": True}
+        if tc["id"] in blocks and blocks[tc["id"]]["input"] == tc["input"] else tc
+        for tc in tool_calls
+    ]
+
+
+def _tool_use_blocks(messages: list[dict]) -> dict[str, dict]:
+    return {
+        block["id"]: block
+        for m in messages if isinstance(m["content"], list)
+        for block in m["content"] if block.get("type") == "tool_use"
+    }
+
+
+# ── Lazy loading ──────────────────────────────────────────────────────────────
+
+class _Frame:
+    """One node's conversation and tool calls, decoded on first use."""
+
+    def __init__(self, codec: _Codec, buffer: mmap.mmap, offset: int, length: int, payloads: dict[str, list[int]]):
+        self.codec = codec
+        self.buffer = buffer
+        self.span = (offset, length)
+        self.payloads = payloads
+        self.messages: list[Message] | None = None
+        self.tool_calls: list[ToolCall] | None = None
+
+    def decode(self) -> None:
+        if self.messages is not None:
+            return
+        offset, length = self.span
+        data = blobs.default_store.unpack(self.codec.decode(self.buffer[offset:offset + length]), self._payload)
+        blocks = _tool_use_blocks(data["messages"])
+        self.messages = [Message(**m) for m in data["messages"]]
+        self.tool_calls = [
+            ToolCall(id=tc["id"], name=tc["name"], input=blocks[tc["id"]]["input"] if tc.get("same_as_tool_use") else tc["input"])
+            for tc in data["tool_calls"]
+        ]
+        self.buffer = self.payloads = None
+
+    def _payload(self, digest: str) -> str:
+        offset, length = self.payloads[digest]
+        return self.codec.decode(self.buffer[offset:offset + length])
+
+
+class LazyConversation(Conversation):
+    """A Conversation whose messages are decoded from the snapshot on first access."""
+
+    __slots__ = ("_frame", "_messages")
+
+    def __init__(self, system: str, frame: _Frame):
+        self.system = system
+        self._frame = frame
+        self._messages: list[Message] | None = None
+
+    @property
+    def messages(self) -> list[Message]:
+        if self._messages is None:
+            self._frame.decode()
+            self._messages = self._frame.messages
+        return self._messages
+
+    @messages.setter
+    def messages(self, value: list[Message]) -> None:
+        self._messages = value
+
+    @property
+    def loaded(self) -> bool:
+        return self._messages is not None
+
+
+class LazyToolCalls(UserList):
+    """Node.tool_calls backed by the same frame; behaves as a list once touched."""
+
+    __slots__ = ("_frame", "_data")
+
+    def __init__(self, frame: _Frame):
+        self._frame = frame
+        self._data: list[ToolCall] | None = None
+
+    @property
+    def data(self) -> list[ToolCall]:
+        if self._data is None:
+            self._frame.decode()
+            self._data = self._frame.tool_calls
+        return self._data
+
+    @data.setter
+    def data(self, value: list[ToolCall]) -> None:
+        self._data = value
+
+    @property
+    def loaded(self) -> bool:
+        return self._data is not None
+
+
+def load(path: str) -> DecompositionTree:
+    """Opens a snapshot; node metadata is decoded now, conversations when first read."""
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if buffer[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a Neo snapshot")
+    codec = _Codec(buffer[len(MAGIC)])
+    offset, length = FOOTER.unpack(buffer[-FOOTER.size:])
+    index = codec.decode(buffer[offset:offset + length])
+
+    tree = DecompositionTree()
+    for meta in index["nodes"]:
+        frame = _Frame(codec, buffer, *meta["frame"], index["blobs"])
+        node = Node.from_dict(
+            {**meta, "conversation": {"system": meta["system"], "messages": []}},
+            conversation=LazyConversation(meta["system"], frame),
+            tool_calls=LazyToolCalls(frame),
+        )
+        if node.node_id == index["root_id"]:
+            tree.set_root(node)
+        else:
+            tree.add_node(node)
+    return tree
+
+
+# ── CLI ───────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert a saved tree JSON file to a binary snapshot.")
+    parser.add_argument("source", help="dump_state() JSON file")
+    parser.add_argument("target", nargs="?", help=f"output path (default: source with {SUFFIX})")
+    args = parser.parse_args()
+
+    target = args.target or args.source.rsplit(".", 1)[0] + SUFFIX
+    save(DecompositionTree.load_state(args.source), target)
+    print(f"wrote {target}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+"""
+SQLite store for decomposition trees.
+
+One database holds any number of runs (trees). Nodes, messages, tool calls and
+metrics live in their own tables, indexed for the lookups the dashboard makes
+(by state, parent and type within a tree), so a single node or a filtered
+listing never has to parse a whole tree. WAL mode lets the dashboard read
+while Neo writes.
+
+Write a finished tree in bulk with save_tree(), or keep the store current
+during a run by attaching a recorder: TreeStore(path).recorder(tree_id).attach(tree).
+Import existing JSON state with: python -m sauce.store import tree.json --db neo.db
+"""
+
+import json
+import time
+import sqlite3
+import argparse
+import threading
+from pathlib import Path
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS trees (
+    tree_id     TEXT PRIMARY KEY,
+    root_id     TEXT,
+    created_at  REAL NOT NULL,
+    updated_at  REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS nodes (
+    tree_id           TEXT NOT NULL,
+    node_id           TEXT NOT NULL,
+    parent_id         TEXT,
+    node_type         TEXT NOT NULL,
+    state             TEXT NOT NULL,
+    tool_id           TEXT,
+    working_directory TEXT NOT NULL,
+    system            TEXT NOT NULL,
+    children_ids      TEXT NOT NULL,
+    active_children   TEXT NOT NULL,
+    for_vis           TEXT NOT NULL,
+    active_tool_calls TEXT NOT NULL,
+    file_versions     TEXT NOT NULL,
+    PRIMARY KEY (tree_id, node_id)
+);
+CREATE INDEX IF NOT EXISTS nodes_by_state  ON nodes (tree_id, state);
+CREATE INDEX IF NOT EXISTS nodes_by_parent ON nodes (tree_id, parent_id);
+CREATE INDEX IF NOT EXISTS nodes_by_type   ON nodes (tree_id, node_type);
+CREATE TABLE IF NOT EXISTS messages (
+    tree_id  TEXT NOT NULL,
+    node_id  TEXT NOT NULL,
+    idx      INTEGER NOT NULL,
+    role     TEXT NOT NULL,
+    content  TEXT NOT NULL,
+    PRIMARY KEY (tree_id, node_id, idx)
+);
+CREATE TABLE IF NOT EXISTS tool_calls (
+    tree_id  TEXT NOT NULL,
+    node_id  TEXT NOT NULL,
+    idx      INTEGER NOT NULL,
+    id       TEXT NOT NULL,
+    name     TEXT NOT NULL,
+    input    TEXT NOT NULL,
+    PRIMARY KEY (tree_id, node_id, idx)
+);
+CREATE INDEX IF NOT EXISTS tool_calls_by_name ON tool_calls (tree_id, name);
+CREATE TABLE IF NOT EXISTS metrics (
+    tree_id  TEXT NOT NULL,
+    node_id  TEXT NOT NULL,
+    model    TEXT NOT NULL,
+    data     TEXT NOT NULL,
+    cost     REAL NOT NULL,
+    PRIMARY KEY (tree_id, node_id)
+);
+CREATE INDEX IF NOT EXISTS metrics_by_model ON metrics (tree_id, model);
+"""
+
+NODE_COLUMNS = (
+    "tree_id", "node_id", "parent_id", "node_type", "state", "tool_id", "working_directory", "system",
+    "children_ids", "active_children", "for_vis", "active_tool_calls", "file_versions",
+)
+JSON_COLUMNS = ("children_ids", "active_children", "for_vis", "active_tool_calls", "file_versions")
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, separators=(",", ":"))
+
+
+class TreeStore:
+    def __init__(self, path: str | Path):
+        self.path = str(path)
+        # Recorders flush from the event loop thread; the dashboard may call from worker threads.
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.db.row_factory = sqlite3.Row
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.db.close()
+
+    def recorder(self, tree_id: str) -> "StoreRecorder":
+        return StoreRecorder(self, tree_id)
+
+    # ── Writes ────────────────────────────────────────────────────────────────
+
+    def save_tree(self, tree_id: str, state: dict) -> None:
+        """Replaces `tree_id` with a dump_state() dict in one transaction."""
+        nodes = [state["root"], *state["nodes"].values()]
+        with self.lock, self.db:
+            for table in ("nodes", "messages", "tool_calls", "metrics"):
+                self.db.execute(f"DELETE FROM {table} WHERE tree_id = ?", (tree_id,))
+            self._touch_tree(tree_id, state["root"]["node_id"])
+            self._insert_nodes(tree_id, nodes)
+            self.db.executemany(
+                "INSERT INTO messages VALUES (?, ?, ?, ?, ?)",
+                [
+                    (tree_id, n["node_id"], i, m["role"], _dumps(m["content"]))
+                    for n in nodes for i, m in enumerate(n["conversation"]["messages"])
+                ],
+            )
+            self.db.executemany(
+                "INSERT INTO tool_calls VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (tree_id, n["node_id"], i, tc["id"], tc["name"], _dumps(tc["input"]))
+                    for n in nodes for i, tc in enumerate(n.get("tool_calls", []))
+                ],
+            )
+            self._upsert_metrics(tree_id, nodes)
+
+    def _touch_tree(self, tree_id: str, root_id: str | None) -> None:
+        now = time.time()
+        self.db.execute(
+            "INSERT INTO trees VALUES (?, ?, ?, ?) ON CONFLICT (tree_id) DO UPDATE SET "
+            "root_id = COALESCE(excluded.root_id, trees.root_id), updated_at = excluded.updated_at",
+            (tree_id, root_id, now, now),
+        )
+
+    def _insert_nodes(self, tree_id: str, nodes: list[dict]) -> None:
+        rows = []
+        for n in nodes:
+            row = {**n, "tree_id": tree_id, "system": n["conversation"]["system"]}
+            rows.append(tuple(
+                _dumps(row.get(col, {} if col == "file_versions" else [])) if col in JSON_COLUMNS else row.get(col)
+                for col in NODE_COLUMNS
+            ))
+        placeholders = ", ".join("?" for _ in NODE_COLUMNS)
+        self.db.executemany(f"INSERT OR REPLACE INTO nodes ({', '.join(NODE_COLUMNS)}) VALUES ({placeholders})", rows)
+
+    def _upsert_metrics(self, tree_id: str, nodes: list[dict]) -> None:
+        self.db.executemany(
+            "INSERT OR REPLACE INTO metrics VALUES (?, ?, ?, ?, ?)",
+            [
+                (tree_id, n["node_id"], n["metrics"].get("model", ""), _dumps(n["metrics"]), n["metrics"].get("cost", 0.0))
+                for n in nodes if n.get("metrics")
+            ],
+        )
+
+    # ── Reads ─────────────────────────────────────────────────────────────────
+
+    def list_trees(self) -> list[dict]:
+        with self.lock:
+            rows = self.db.execute("SELECT * FROM trees ORDER BY updated_at DESC").fetchall()
+        return [dict(r) for r in rows]
+
+    def has_tree(self, tree_id: str) -> bool:
+        with self.lock:
+            return self.db.execute("SELECT 1 FROM trees WHERE tree_id = ?", (tree_id,)).fetchone() is not None
+
+    def root_id(self, tree_id: str) -> str | None:
+        """The tree's root node id, or None before its first node is recorded."""
+        with self.lock:
+            row = self.db.execute("SELECT root_id FROM trees WHERE tree_id = ?", (tree_id,)).fetchone()
+        return row[0] if row else None
+
+    def find_nodes(
+        self,
+        tree_id: str,
+        state: str | None = None,
+        node_type: str | None = None,
+        parent_id: str | None = None,
+    ) -> list[dict]:
+        """Node metadata (no conversation) matching every filter given."""
+        query, params = "SELECT * FROM nodes WHERE tree_id = ?", [tree_id]
+        for column, value in (("state", state), ("node_type", node_type), ("parent_id", parent_id)):
+            if value is not None:
+                query += f" AND {column} = ?"
+                params.append(value)
+        with self.lock:
+            rows = self.db.execute(query, params).fetchall()
+        return [_node_row(r) for r in rows]
+
+    def count_by_state(self, tree_id: str) -> dict[str, int]:
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT state, COUNT(*) FROM nodes WHERE tree_id = ? GROUP BY state", (tree_id,)
+            ).fetchall()
+        return {state: count for state, count in rows}
+
+    def get_node(self, tree_id: str, node_id: str) -> dict | None:
+        """One node in Node.to_dict() form, conversation and tool calls included."""
+        with self.lock:
+            row = self.db.execute("SELECT * FROM nodes WHERE tree_id = ? AND node_id = ?", (tree_id, node_id)).fetchone()
+            if row is None:
+                return None
+            messages = self.db.execute(
+                "SELECT role, content FROM messages WHERE tree_id = ? AND node_id = ? ORDER BY idx", (tree_id, node_id)
+            ).fetchall()
+            tool_calls = self.db.execute(
+                "SELECT id, name, input FROM tool_calls WHERE tree_id = ? AND node_id = ? ORDER BY idx", (tree_id, node_id)
+            ).fetchall()
+            metrics = self.db.execute(
+                "SELECT data FROM metrics WHERE tree_id = ? AND node_id = ?", (tree_id, node_id)
+            ).fetchone()
+        return _full_node(row, messages, tool_calls, metrics[0] if metrics else None)
+
+    def load_tree(self, tree_id: str) -> dict | None:
+        """The whole tree as a dump_state() dict, for DecompositionTree.load_state().
+
+        Reads one query per table inside a single read transaction, so a tree
+        being written by another process comes back as one consistent snapshot.
+        """
+        with self.lock:
+            self.db.execute("BEGIN")
+            try:
+                tree = self.db.execute("SELECT root_id FROM trees WHERE tree_id = ?", (tree_id,)).fetchone()
+                if tree is None or tree[0] is None:
+                    return None
+                rows = self.db.execute("SELECT * FROM nodes WHERE tree_id = ?", (tree_id,)).fetchall()
+                messages = self.db.execute(
+                    "SELECT node_id, role, content FROM messages WHERE tree_id = ? ORDER BY node_id, idx", (tree_id,)
+                ).fetchall()
+                tool_calls = self.db.execute(
+                    "SELECT node_id, id, name, input FROM tool_calls WHERE tree_id = ? ORDER BY node_id, idx", (tree_id,)
+                ).fetchall()
+                metrics = self.db.execute("SELECT node_id, data FROM metrics WHERE tree_id = ?", (tree_id,)).fetchall()
+            finally:
+                self.db.rollback()
+
+        by_node: dict[str, tuple[list, list]] = {row["node_id"]: ([], []) for row in rows}
+        for node_id, role, content in messages:
+            if node_id in by_node:
+                by_node[node_id][0].append((role, content))
+        for node_id, *tool_call in tool_calls:
+            if node_id in by_node:
+                by_node[node_id][1].append(tool_call)
+        data = {node_id: d for node_id, d in metrics}
+        nodes = {
+            row["node_id"]: _full_node(row, *by_node[row["node_id"]], data.get(row["node_id"]))
+            for row in rows
+        }
+        root = nodes.pop(tree[0])
+        return {"root": root, "nodes": nodes}
+
+
+def _node_row(row: sqlite3.Row) -> dict:
+    node = dict(row)
+    del node["tree_id"]
+    for col in JSON_COLUMNS:
+        node[col] = json.loads(node[col])
+    return node
+
+
+def _full_node(row: sqlite3.Row, messages: list, tool_calls: list, metrics: str | None) -> dict:
+    """A node in Node.to_dict() form from its row and its (role, content) / (id, name, input) rows."""
+    node = _node_row(row)
+    system = node.pop("system")
+    node["tool_calls"] = [{"id": i, "name": n, "input": json.loads(inp)} for i, n, inp in tool_calls]
+    node["metrics"] = json.loads(metrics) if metrics else {}
+    node["conversation"] = {
+        "system": system,
+        "messages": [{"role": role, "content": json.loads(content)} for role, content in messages],
+    }
+    return node
+
+
+# ── Live recording ────────────────────────────────────────────────────────────
+
+class StoreRecorder:
+    """Keeps one tree's rows current during a run.
+
+    Tree mutations only mark what changed (which node rows, and from which
+    message / tool call index on); checkpoint() then writes all of it from the
+    live tree in one bulk transaction, so a burst of mutations costs one commit.
+    """
+
+    def __init__(self, store: TreeStore, tree_id: str):
+        self.store = store
+        self.tree_id = tree_id
+        self.tree = None
+        self.dirty: set[str] = set()
+        self.messages_from: dict[str, int] = {}
+        self.tool_calls_from: dict[str, int] = {}
+
+    def attach(self, tree) -> None:
+        self.tree = tree
+        tree.recorders.append(self)
+        for node_id, node in tree.nodes.items():
+            self.dirty.add(node_id)
+            self.messages_from[node_id] = 0
+            self.tool_calls_from[node_id] = 0
+        self.checkpoint()
+
+    def append(self, record: dict) -> None:
+        op = record["op"]
+        node_id = record["node"]["node_id"] if op == "node" else record["id"]
+        self.dirty.add(node_id)
+        node = self.tree.nodes.get(node_id)
+        if op == "node":
+            self._mark(self.messages_from, node_id, 0)
+            self._mark(self.tool_calls_from, node_id, 0)
+        elif op == "message":
+            self._mark(self.messages_from, node_id, record.get("index", len(node.conversation.messages) - 1))
+        elif op == "block":
+            self._mark(self.messages_from, node_id, record["index"])
+        elif op == "messages":
+            self._mark(self.messages_from, node_id, 0)
+        elif op == "extend" and "tool_calls" in record["fields"]:
+            self._mark(self.tool_calls_from, node_id, len(node.tool_calls) - len(record["fields"]["tool_calls"]))
+
+    @staticmethod
+    def _mark(marks: dict[str, int], node_id: str, index: int) -> None:
+        marks[node_id] = min(index, marks.get(node_id, index))
+
+    def checkpoint(self) -> None:
+        if not self.dirty:
+            return
+        data = [_metadata(self.tree.nodes[node_id]) for node_id in self.dirty]
+        db = self.store.db
+        with self.store.lock, db:
+            self.store._touch_tree(self.tree_id, self.tree.root.node_id if self.tree.root else None)
+            self.store._insert_nodes(self.tree_id, data)
+            self.store._upsert_metrics(self.tree_id, data)
+            for node_id, start in self.messages_from.items():
+                messages = self.tree.nodes[node_id].conversation.messages
+                db.execute("DELETE FROM messages WHERE tree_id = ? AND node_id = ? AND idx >= ?", (self.tree_id, node_id, start))
+                db.executemany(
+                    "INSERT INTO messages VALUES (?, ?, ?, ?, ?)",
+                    [(self.tree_id, node_id, i, m.role, _dumps(m.content)) for i, m in enumerate(messages[start:], start)],
+                )
+            for node_id, start in self.tool_calls_from.items():
+                tool_calls = self.tree.nodes[node_id].tool_calls
+                db.execute("DELETE FROM tool_calls WHERE tree_id = ? AND node_id = ? AND idx >= ?", (self.tree_id, node_id, start))
+                db.executemany(
+                    "INSERT INTO tool_calls VALUES (?, ?, ?, ?, ?, ?)",
+                    [(self.tree_id, node_id, i, tc.id, tc.name, _dumps(tc.input)) for i, tc in enumerate(tool_calls[start:], start)],
+                )
+        self.dirty.clear()
+        self.messages_from.clear()
+        self.tool_calls_from.clear()
+
+    def close(self) -> None:
+        self.checkpoint()
+
+
+def _metadata(node) -> dict:
+    """The parts of Node.to_dict() that live in the nodes and metrics tables."""
+    return {
+        "node_id": node.node_id,
+        "parent_id": node.parent_id,
+        "node_type": node.node_type.value,
+        "state": node.state.value,
+        "tool_id": node.tool_id,
+        "working_directory": node.working_directory,
+        "conversation": {"system": node.conversation.system},
+        "children_ids": node.children_ids,
+        "active_children": list(node.active_children),
+        "for_vis": node.for_vis,
+        "active_tool_calls": [{"id": tc.id, "name": tc.name, "input": tc.input} for tc in node.active_tool_calls],
+        "file_versions": dict(node.file_versions),
+        "metrics": node.metrics.to_dict(),
+    }
+
+
+# ── CLI ───────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description="Import saved tree JSON into a SQLite tree store.")
+    parser.add_argument("command", choices=["import"])
+    parser.add_argument("paths", nargs="+", help="dump_state() JSON files; the file stem becomes the tree id")
+    parser.add_argument("--db", default=".neo/trees.db")
+    args = parser.parse_args()
+
+    Path(args.db).parent.mkdir(parents=True, exist_ok=True)
+    store = TreeStore(args.db)
+    for path in args.paths:
+        with open(path) as f:
+            state = json.load(f)
+        store.save_tree(Path(path).stem, state)
+        print(f"imported {path} ({1 + len(state['nodes'])} nodes)")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Tests for concurrent tool dispatch within one turn.
+
+Checks the TOOL_ACCESS conflict rules, that a read submitted after a write
+to the same path, or after a shell command, waits for it (and sees its
+output), that independent calls
+overlap, that results come back in tool_use order even when later calls
+finish first, that a failing call becomes that call's error result without
+disturbing the rest, and that blocking file tools run off the event loop.
+
+Run with: python -m sauce.tests.batch
+"""
+
+import time
+import asyncio
+import tempfile
+from unittest.mock import patch
+
+import sauce.tools as tools
+from sauce.models import ToolCall
+from sauce.tools import ToolBatch, _conflicts
+
+
+DELAY = 0.2
+
+
+def call(i: int, name: str, **inp) -> ToolCall:
+    return ToolCall(f"toolu_{i}", name, inp)
+
+
+class SlowTools:
+    """Stand-ins for the file tools that take DELAY seconds and record when each ran."""
+
+    def __init__(self):
+        self.spans: dict[str, tuple[float, float]] = {}
+
+    def tool(self, name: str):
+        def run(inp, tree=None, node_id=None, working_directory="."):
+            start = time.perf_counter()
+            time.sleep(inp.get("delay", DELAY))
+            self.spans[inp["path"] + ":" + name] = (start, time.perf_counter())
+            return f"{name} {inp['path']}"
+        return run
+
+    def overlap(self, a: str, b: str) -> bool:
+        (a0, a1), (b0, b1) = self.spans[a], self.spans[b]
+        return a0 < b1 and b0 < a1
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+def test_conflict_rules():
+    wd = "/w"
+    read, write = call(1, "read_file", path="a.py"), call(2, "write_file", path="a.py", content="")
+    assert not _conflicts(read, call(3, "read_file", path="a.py"), wd)
+    assert _conflicts(write, read, wd) and _conflicts(read, write, wd)
+    assert not _conflicts(write, call(4, "write_file", path="b.py", content=""), wd)
+    assert _conflicts(call(5, "write_file", path="src/x.py", content=""), call(6, "list_directory", path="src"), wd)
+    assert not _conflicts(call(7, "edit_file", path="src/x.py", edits=[]), call(8, "read_file", path="src2/x.py"), wd)
+    shell = call(9, "run_shell", command="make gen")
+    assert _conflicts(shell, write, wd) and _conflicts(shell, call(10, "run_shell", command="ls"), wd)
+    assert _conflicts(shell, call(12, "read_file", path="gen.out"), wd) and _conflicts(read, shell, wd)
+    unknown = call(11, "unknown_tool")  # treated as a shell command
+    assert _conflicts(unknown, read, wd) and _conflicts(unknown, write, wd)
+    print("✅ TOOL_ACCESS orders writes against overlapping paths, lets reads overlap, and orders shell commands against everything")
+
+
+async def test_read_waits_for_write(directory: str):
+    batch = ToolBatch(working_directory=directory)
+    batch.submit(call(1, "write_file", path="notes.md", content="x" * 1_000_000))
+    batch.submit(call(2, "read_file", path="notes.md", max_bytes=2_000_000))
+    results = await batch.results()
+    assert results["toolu_1"].startswith("Wrote") and results["toolu_2"] == "x" * 1_000_000, results["toolu_2"][:80]
+    print("✅ a read submitted after a write to the same path waits for it and sees the new content")
+
+
+async def test_read_waits_for_shell(directory: str):
+    batch = ToolBatch(working_directory=directory)
+    batch.submit(call(1, "run_shell", command="sleep 0.1; echo generated > gen.out"))
+    batch.submit(call(2, "read_file", path="gen.out"))
+    results = await batch.results()
+    assert results["toolu_2"] == "generated\n", results["toolu_2"]
+    print("✅ a read submitted after a shell command waits for it and sees the command's output")
+
+
+async def test_independent_calls_overlap(directory: str):
+    slow = SlowTools()
+    registry = {"read_file": slow.tool("read"), "write_file": slow.tool("write")}
+    with patch.dict(tools.TOOL_REGISTRY, registry):
+        batch = ToolBatch(working_directory=directory)
+        start = time.perf_counter()
+        batch.submit(call(1, "write_file", path="a.py", content=""))
+        batch.submit(call(2, "write_file", path="b.py", content=""))
+        batch.submit(call(3, "read_file", path="c.py"))
+        batch.submit(call(4, "read_file", path="a.py"))
+        await batch.results()
+        elapsed = time.perf_counter() - start
+    assert slow.overlap("a.py:write", "b.py:write") and slow.overlap("a.py:write", "c.py:read")
+    assert slow.spans["a.py:read"][0] >= slow.spans["a.py:write"][1]
+    assert elapsed < 2.5 * DELAY, elapsed
+    print(f"✅ independent calls overlap: 4 calls of {DELAY:.1f}s in {elapsed:.2f}s, only a.py's read waited")
+
+
+async def test_results_in_tool_use_order(directory: str):
+    slow = SlowTools()
+    calls = [call(i, "read_file", path=f"f{i}", delay=d) for i, d in enumerate((0.3, 0.0, 0.15))]
+    with patch.dict(tools.TOOL_REGISTRY, {"read_file": slow.tool("read")}):
+        results = await tools.run_tools(calls, working_directory=directory)
+        batch = ToolBatch(working_directory=directory)
+        for tc in calls:
+            batch.submit(tc)
+        by_id = await batch.results()
+    assert results == ["read f0", "read f1", "read f2"]
+    assert list(by_id) == ["toolu_0", "toolu_1", "toolu_2"]
+    assert slow.spans["f1:read"][1] < slow.spans["f0:read"][1]  # f1 finished first
+    print("✅ results come back in tool_use order, not completion order")
+
+
+async def test_failed_calls_become_results(directory: str):
+    calls = [
+        call(1, "no_such_tool"),
+        call(2, "read_file"),                   # no path
+        call(3, "write_file", path="out.txt"),  # no content
+        call(4, "write_file", path="ok.txt", content="fine"),
+        call(5, "read_file", path="ok.txt"),
+    ]
+    results = await tools.run_tools(calls, working_directory=directory)
+    assert results[0] == "Error: unknown tool 'no_such_tool'"
+    assert results[1] == "Error: read_file is missing required input 'path'", results[1]
+    assert results[2] == "Error: write_file is missing required input 'content'", results[2]
+    assert results[3].startswith("Wrote") and results[4] == "fine"
+    print("✅ a call that raises answers its tool_use with the error; the rest of the batch still runs")
+
+
+async def test_file_tools_do_not_block_the_loop(directory: str):
+    slow = SlowTools()
+    gaps, last = [], time.perf_counter()
+
+    async def heartbeat():
+        nonlocal last
+        while True:
+            await asyncio.sleep(0.01)
+            now = time.perf_counter()
+            gaps.append(now - last)
+            last = now
+
+    ticker = asyncio.create_task(heartbeat())
+    with patch.dict(tools.TOOL_REGISTRY, {"read_file": slow.tool("read")}):
+        await tools.run_tool("read_file", {"path": "big.log", "delay": 0.3}, working_directory=directory)
+    ticker.cancel()
+    assert len(gaps) >= 15 and max(gaps) < 0.1, (len(gaps), max(gaps))
+    print(f"✅ a blocking file tool runs on the I/O pool: the loop ticked {len(gaps)}× meanwhile, "
+          f"longest gap {max(gaps) * 1e3:.0f} ms")
+
+
+async def main():
+    test_conflict_rules()
+    with tempfile.TemporaryDirectory() as directory:
+        await test_read_waits_for_write(directory)
+        await test_read_waits_for_shell(directory)
+        await test_independent_calls_overlap(directory)
+        await test_results_in_tool_use_order(directory)
+        await test_failed_calls_become_results(directory)
+        await test_file_tools_do_not_block_the_loop(directory)
+    print("\n✅ All tool batch tests passed!\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
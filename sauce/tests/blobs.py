@@ -0,0 +1,166 @@
+"""
+Tests for the content-addressed blob store.
+
+Builds a tree whose sibling agents all read the same large contracts.md and
+checks the payload is held once in memory and written once to a snapshot,
+while to_dict() and LLM requests still see the full text. Also checks that
+payloads are released once compaction replaces the messages holding them
+(whatever else still references them), and that a long-lived process running
+many trees keeps the store bounded.
+
+Run with: python -m sauce.tests.blobs
+"""
+
+import os
+import json
+import tempfile
+import tracemalloc
+from unittest.mock import patch
+
+import sauce.blobs as blobs
+import sauce.llm as llm
+import sauce.snapshot as snapshot
+from sauce.models import Conversation, Message, ToolCall, ToolResultMessage, UserMessage
+from sauce.node import Node, NodeType
+from sauce.tree import DecompositionTree
+
+
+SIBLINGS = 50
+CONTRACTS = "".join(f"def endpoint_{i}(request: Request) -> Response: ...\n" for i in range(2000))
+
+
+def sibling_tree() -> DecompositionTree:
+    tree = DecompositionTree()
+    tree.set_root(Node("root", NodeType.THINKING, Conversation("", [UserMessage("build it")])))
+    for i in range(SIBLINGS):
+        child = Node(f"child-{i}", NodeType.CODE, Conversation("", [UserMessage(f"part {i}")]), parent_id="root")
+        tree.add_node(child)
+        # Each read returns a fresh string, as read_file does.
+        tree.append_message(child, ToolResultMessage(f"read-{i}", "".join(list(CONTRACTS))))
+    return tree
+
+
+def retained(load) -> tuple[object, int]:
+    tracemalloc.start()
+    result = load()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+def test_siblings_share_one_copy():
+    tree = sibling_tree()
+    payloads = [n.conversation.messages[-1].content[0]["content"] for n in tree.nodes.values() if n.parent_id]
+    assert all(p is payloads[0] for p in payloads)
+    assert tree.nodes["child-7"].to_dict()["conversation"]["messages"][-1]["content"][0]["content"] == CONTRACTS
+
+    request = llm._request_kwargs(tree.nodes["child-7"].conversation.messages, "", "model", None)
+    assert request["messages"][-1]["content"][0]["content"] == CONTRACTS
+    print(f"✅ {SIBLINGS} siblings reading contracts.md share one copy; dicts and requests carry the full text")
+
+
+def test_tool_inputs_are_interned_in_place():
+    tree = sibling_tree()
+    node = tree.nodes["child-0"]
+    content = "".join(list(CONTRACTS))
+    tc = ToolCall("write-1", "write_file", {"path": "contracts.md", "content": content})
+    block = {"type": "tool_use", "id": tc.id, "name": tc.name, "input": tc.input}
+    tree.append_message(node, Message("assistant", [block]))
+    tree.add_tool_call(node, tc)
+
+    assert tc.input["content"] is block["input"]["content"]
+    assert tc.input["content"] is node.conversation.messages[1].content[0]["content"]
+    print("✅ write_file contents are shared by the tool_use block and tool_calls")
+
+
+def test_loading_state_dedupes_payloads():
+    state = json.loads(json.dumps(sibling_tree().dump_state()))
+    with patch.object(blobs, "default_store", blobs.BlobStore(min_chars=10**12)):
+        _, plain = retained(lambda: DecompositionTree.load_state(json.loads(json.dumps(state))))
+    with patch.object(blobs, "default_store", blobs.BlobStore()):
+        tree, interned = retained(lambda: DecompositionTree.load_state(json.loads(json.dumps(state))))
+    print(f"   retained after load: {plain / 1e6:.1f} MB plain → {interned / 1e6:.1f} MB interned")
+    assert interned < plain / 10
+    assert tree.dump_state() == DecompositionTree.load_state(state).dump_state()
+    print("✅ from_dict() interns payloads, so a loaded tree keeps one copy too")
+
+
+def test_snapshot_writes_payload_once(directory: str):
+    tree = sibling_tree()
+    one = DecompositionTree()
+    one.set_root(tree.nodes["child-0"])
+    many_path, one_path = os.path.join(directory, "many.neosnap"), os.path.join(directory, "one.neosnap")
+    snapshot.save(tree, many_path)
+    snapshot.save(one, one_path)
+    assert os.path.getsize(many_path) < 2 * os.path.getsize(one_path) + 20_000
+
+    with patch.object(blobs, "default_store", blobs.BlobStore()):
+        loaded = snapshot.load(many_path)
+        assert loaded.dump_state() == tree.dump_state()
+        assert len(blobs.default_store) == 1
+    print(f"✅ snapshot holds the payload once ({os.path.getsize(many_path) / 1e3:.0f} KB for {SIBLINGS} readers)")
+
+
+def test_replaced_messages_release_payloads():
+    with patch.object(blobs, "default_store", blobs.BlobStore()):
+        tree = sibling_tree()
+        assert len(blobs.default_store) == 1
+        for node in list(tree.nodes.values())[1:]:
+            stubbed = [Message(m.role, [{**m.content[0], "content": "[compacted]"}]) if m.role == "user" and
+                       isinstance(m.content, list) else m for m in node.conversation.messages]
+            tree.replace_messages(node, stubbed)
+        assert len(blobs.default_store) == 0
+    print("✅ compacting away every reader of a payload releases it from the store")
+
+
+def test_liveness_ignores_stray_references():
+    with patch.object(blobs, "default_store", blobs.BlobStore()):
+        tree = sibling_tree()
+        kept = tree.nodes["child-0"].conversation.messages[-1].content[0]["content"]
+        # A debugger, a traceback frame or a cache holding the payload does not keep it
+        # in the store once no node does; the holder still has the full text.
+        for node in list(tree.nodes.values())[1:]:
+            tree.replace_messages(node, node.conversation.messages[:1])
+        assert len(blobs.default_store) == 0 and kept == CONTRACTS
+
+        # A payload a node still holds survives however few other references there are.
+        node = tree.nodes["child-1"]
+        tree.append_message(node, ToolResultMessage("read-again", "".join(list(CONTRACTS))))
+        tree.replace_messages(tree.nodes["child-2"], tree.nodes["child-2"].conversation.messages)
+        assert len(blobs.default_store) == 1
+        assert node.conversation.messages[-1].content[0]["content"] is blobs.default_store.intern("".join(list(CONTRACTS)))
+    print("✅ liveness comes from the trees' own state, not from reference counts")
+
+
+def test_store_stays_bounded_across_trees():
+    with patch.object(blobs, "default_store", blobs.BlobStore(collect_after=64)):
+        peak = 0
+        for run in range(20):
+            tree = DecompositionTree()
+            tree.set_root(Node("root", NodeType.THINKING, Conversation("", [UserMessage("go")])))
+            for i in range(50):
+                tree.append_message(tree.root, ToolResultMessage(f"read-{i}", f"run {run} file {i}\n" + CONTRACTS))
+            peak = max(peak, len(blobs.default_store))
+            del tree
+        assert peak <= 2 * 64 + 50, peak
+        blobs.default_store.collect()
+        assert len(blobs.default_store) == 0
+    print(f"✅ 20 runs × 50 distinct payloads peak at {peak} stored, not 1000")
+
+
+def main():
+    test_siblings_share_one_copy()
+    test_tool_inputs_are_interned_in_place()
+    test_loading_state_dedupes_payloads()
+    test_replaced_messages_release_payloads()
+    test_liveness_ignores_stray_references()
+    test_store_stays_bounded_across_trees()
+    with tempfile.TemporaryDirectory() as directory:
+        test_snapshot_writes_payload_once(directory)
+    print("\n✅ All blob store tests passed!\n")
+
+
+if __name__ == "__main__":
+    main()
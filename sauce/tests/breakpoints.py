@@ -0,0 +1,91 @@
+"""
+Tests for prompt-cache breakpoints on requests.
+
+Checks that a request never carries more than the API's four cache_control
+markers, that they sit on the system prompt, the last tool schema, the
+latest message and the last user message before the latest assistant turn,
+and that marking a request leaves the conversation's own messages untouched.
+
+Run with: python -m sauce.tests.breakpoints
+"""
+
+from sauce.llm import _request_kwargs
+from sauce.models import Message, ToolResultMessage, UserMessage
+from sauce.node import NodeType, TOOLS_FOR_NODE
+
+
+MODEL = "claude-sonnet-4-6"
+TOOLS = TOOLS_FOR_NODE[NodeType.CODE]
+
+
+def marked(value) -> list:
+    """Every dict carrying a cache_control marker, in document order."""
+    if isinstance(value, dict):
+        found = [value] if "cache_control" in value else []
+        return found + [m for v in value.values() for m in marked(v)]
+    if isinstance(value, list):
+        return [m for v in value for m in marked(v)]
+    return []
+
+
+def marked_messages(kwargs: dict) -> list[int]:
+    return [i for i, m in enumerate(kwargs["messages"]) if marked(m)]
+
+
+def tool_turn(*ids: str) -> list[Message]:
+    """An assistant turn calling each id, followed by one result message per call."""
+    blocks = [{"type": "tool_use", "id": i, "name": "read_file", "input": {"path": i}} for i in ids]
+    return [Message("assistant", blocks)] + [ToolResultMessage(i, f"contents of {i}") for i in ids]
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+def test_first_request():
+    kwargs = _request_kwargs([UserMessage("task")], "system", MODEL, TOOLS)
+    assert len(marked(kwargs)) == 3
+    assert "cache_control" in kwargs["system"][-1] and "cache_control" in kwargs["tools"][-1]
+    assert not any("cache_control" in t for t in kwargs["tools"][:-1])
+    assert kwargs["messages"][0]["content"] == [{"type": "text", "text": "task", "cache_control": {"type": "ephemeral"}}]
+    print("✅ first request: system, last tool and the task are marked")
+
+
+def test_later_requests():
+    messages = [UserMessage("task")] + tool_turn("a", "b", "c") + tool_turn("d", "e")
+    kwargs = _request_kwargs(messages, "system", MODEL, TOOLS)
+    assert len(marked(kwargs)) == 4
+    # The last result of the previous turn (index 4) and the latest message.
+    assert marked_messages(kwargs) == [4, len(messages) - 1]
+    assert marked(kwargs["messages"][4]) == [kwargs["messages"][4]["content"][-1]]
+
+    no_system = _request_kwargs(messages, "", MODEL, None)
+    assert len(marked(no_system)) == 2 and marked_messages(no_system) == [4, len(messages) - 1]
+    print("✅ later requests: at most 4 markers, on the latest message and where the previous request ended")
+
+
+def test_assistant_right_after_task():
+    messages = [UserMessage("task")] + tool_turn("a")
+    kwargs = _request_kwargs(messages, "system", MODEL, TOOLS)
+    assert marked_messages(kwargs) == [0, 2] and len(marked(kwargs)) == 4
+    print("✅ with one turn, the task message is the previous request's breakpoint")
+
+
+def test_conversation_not_modified():
+    messages = [UserMessage("task")] + tool_turn("a", "b") + tool_turn("c")
+    before = [m.to_dict() for m in messages]
+    for _ in range(3):
+        _request_kwargs(messages, "system", MODEL, TOOLS)
+    assert not marked([m.to_dict() for m in messages]) and [m.to_dict() for m in messages] == before
+    assert isinstance(messages[0].content, str)
+    print("✅ marking a request copies the marked messages and leaves the conversation unchanged")
+
+
+def main():
+    test_first_request()
+    test_later_requests()
+    test_assistant_right_after_task()
+    test_conversation_not_modified()
+    print("\n✅ All cache breakpoint tests passed!\n")
+
+
+if __name__ == "__main__":
+    main()
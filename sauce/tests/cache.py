@@ -0,0 +1,198 @@
+"""
+Tests for the record/replay LLM response cache.
+
+Runs the local fake Messages API and checks that RECORD serves repeats from
+disk, REPLAY serves hits and raises CacheMiss (without a request) otherwise,
+PASSTHROUGH always calls the API, the size cap evicts the least recently used
+entries (also across restarts), and run-specific paths do not change the
+key. Then records whole runs, one of them showing the model its environment
+root and node ids, and replays them offline in another directory.
+
+Run with: python -m sauce.tests.cache
+"""
+
+import os
+import time
+import asyncio
+import tempfile
+from unittest.mock import patch
+
+import sauce.llm as llm
+from sauce.backend import AnthropicBackend
+from sauce.cache import CacheMiss, CacheMode, ResponseCache
+from sauce.fake_anthropic import FakeAnthropicServer, FakeConfig, TreeScript, _tool_use
+from sauce.models import AgentResponse, UserMessage
+from sauce.neo import Neo
+from sauce.node import NodeState
+from sauce.ratelimit import LimiterPool
+from sauce.tree import DecompositionTree
+
+
+MODEL = "claude-haiku-4-5"
+
+
+async def call(server: FakeAnthropicServer, cache: ResponseCache, text: str = "hi") -> AgentResponse:
+    with patch.object(llm, "backend", AnthropicBackend(base_url=server.url, api_key="test")), \
+            patch.object(llm, "response_cache", cache):
+        return await llm.call_llm_async([UserMessage(text)], model=MODEL, limiter=LimiterPool().get(MODEL))
+
+
+def response(i: int) -> AgentResponse:
+    return AgentResponse(f"answer {i}", [], "end_turn", 10, 5)
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+async def test_record_then_replay(server: FakeAnthropicServer, directory: str):
+    server.stats.requests = 0
+    recorder = ResponseCache(directory, CacheMode.RECORD)
+    first = await call(server, recorder)
+    again = await call(server, recorder)
+    assert server.stats.requests == 1 and recorder.hits == 1 and recorder.misses == 1
+    assert again == first
+
+    replayer = ResponseCache(directory, CacheMode.REPLAY)
+    assert await call(server, replayer) == first
+    try:
+        await call(server, replayer, "something new")
+        raise AssertionError("expected CacheMiss")
+    except CacheMiss:
+        pass
+    assert server.stats.requests == 1
+    print("✅ RECORD serves repeats from disk; REPLAY serves hits and raises CacheMiss without calling the API")
+
+
+async def test_passthrough_always_calls(server: FakeAnthropicServer, directory: str):
+    server.stats.requests = 0
+    cache = ResponseCache(directory, CacheMode.PASSTHROUGH)
+    await call(server, cache)
+    await call(server, cache)
+    assert server.stats.requests == 2 and cache.hits == cache.misses == 0
+    print("✅ PASSTHROUGH never consults the cache")
+
+
+def test_lru_eviction(directory: str):
+    cache = ResponseCache(os.path.join(directory, "lru"))
+    cache.put("a" * 64, response(0))
+    size = cache.total_bytes
+    cache.max_bytes = 3 * size
+    for i, key in enumerate(("b" * 64, "c" * 64), start=1):
+        time.sleep(0.01)
+        cache.put(key, response(i))
+    time.sleep(0.01)
+    assert cache.get("a" * 64) == response(0)  # now the most recently used
+    time.sleep(0.01)
+    cache.put("d" * 64, response(3))
+    assert "b" * 64 not in cache.entries and {"a" * 64, "c" * 64, "d" * 64} <= cache.entries.keys()
+    assert not os.path.exists(cache._path("b" * 64))
+
+    reopened = ResponseCache(cache.directory, max_bytes=2 * size)
+    reopened.put("e" * 64, response(4))
+    assert set(reopened.entries) == {"d" * 64, "e" * 64}, sorted(k[0] for k in reopened.entries)
+    print("✅ the size cap evicts least recently used entries, also after a restart")
+
+
+def test_run_specific_paths_do_not_change_the_key(directory: str):
+    cache = ResponseCache(os.path.join(directory, "keys"))
+
+    def request(log: str, overlay: str) -> dict:
+        result = (f"... [9000 bytes omitted of 30000; full stdout in {log}; page through it with read_file offset/limit] ..."
+                  f"\n\n[Merged 0 changed file(s) back into the shared workspace. This agent's versions are in {overlay}]")
+        return {"model": MODEL, "messages": [{"role": "user", "content": [
+            {"type": "tool_result", "tool_use_id": "toolu_1", "content": result}]}]}
+
+    one = request("/tmp/neo-shell-logs/2b9f1c3e-aa01-4c8e-9b1d-0d5e6f7a8b9c-k3j2h1.stdout.log",
+                  "/tmp/tmpa1b2c3/.neo/overlays/2b9f1c3e-aa01-4c8e-9b1d-0d5e6f7a8b9c")
+    two = request("/var/tmp/logs/77aa0e11-5b2c-4d3e-8f90-123456789abc-q9w8e7.stdout.log",
+                  "/home/me/project/.neo/overlays/77aa0e11-5b2c-4d3e-8f90-123456789abc")
+    assert cache.key(one) == cache.key(two)
+    assert cache.key(one) != cache.key({**one, "model": "claude-sonnet-4-6"})
+
+    def spawned(env: str, node_id: str) -> dict:
+        result = f"Error: [Errno 2] No such file or directory: '{env}/src/missing.py'\n{node_id}"
+        return {"model": MODEL, "messages": [{"role": "user", "content": [
+            {"type": "tool_result", "tool_use_id": "toolu_1", "content": result}]}]}
+
+    here = ResponseCache(os.path.join(directory, "keys"), env_directory="/tmp/tmpa1b2c3")
+    there = ResponseCache(os.path.join(directory, "keys"), env_directory="/home/me/sandbox")
+    assert here.key(spawned("/tmp/tmpa1b2c3", "2b9f1c3e-aa01-4c8e-9b1d-0d5e6f7a8b9c")) == \
+        there.key(spawned("/home/me/sandbox", "77aa0e11-5b2c-4d3e-8f90-123456789abc"))
+    print("✅ shell log, overlay and environment paths and node ids are normalized out of the key")
+
+
+class LookAroundScript(TreeScript):
+    """Code agents look outside their overlay, at the environment root and at every overlay's node id."""
+
+    COMMANDS = ["(cd ../../.. && pwd)", "ls .."]
+
+    def respond(self, system: str, messages: list[dict]) -> tuple[list[dict], str]:
+        turns = sum(1 for m in messages if m["role"] == "assistant")
+        if "code implementation agent" in system and turns < len(self.COMMANDS):
+            return [_tool_use("run_shell", {"command": self.COMMANDS[turns]})], "tool_use"
+        return super().respond(system, messages)
+
+
+async def run_tree(server_url: str | None, cache: ResponseCache, env: str) -> DecompositionTree:
+    backend = AnthropicBackend(base_url=server_url or "http://127.0.0.1:9", api_key="test")
+    with patch.object(llm, "backend", backend), patch.object(llm, "response_cache", cache):
+        tree = DecompositionTree()
+        neo = Neo(tree, env_directory=env)
+        neo.prompt("build it")
+        await asyncio.wait_for(neo.run(), timeout=30)
+    return tree
+
+
+def shape(tree: DecompositionTree) -> list:
+    def walk(node):
+        return [node.node_type.value, node.state.value, len(node.conversation.messages),
+                [walk(tree.nodes[c]) for c in node.children_ids]]
+    return walk(tree.root)
+
+
+async def test_recorded_run_replays_offline(directory: str):
+    # One child per agent, so every conversation is the same from run to run.
+    script = TreeScript(depth=2, fanout=1, tool_calls=2)
+    cache_dir = os.path.join(directory, "run")
+    with FakeAnthropicServer(FakeConfig(script=script, seed=3)) as server, tempfile.TemporaryDirectory() as env:
+        recorded = await run_tree(server.url, ResponseCache(cache_dir, CacheMode.RECORD), env)
+        requests = server.stats.requests
+
+    replayer = ResponseCache(cache_dir, CacheMode.REPLAY)
+    with tempfile.TemporaryDirectory() as env:
+        replayed = await run_tree(None, replayer, env)
+    assert recorded.root.state == NodeState.COMPLETED and shape(replayed) == shape(recorded)
+    assert replayer.hits == requests and replayer.misses == 0
+    print(f"✅ a recorded run ({len(recorded.nodes)} nodes, {requests} requests) replays offline in another directory")
+
+
+async def test_env_and_node_ids_replay_elsewhere(directory: str):
+    script = LookAroundScript(depth=2, fanout=1, tool_calls=0)
+    cache_dir = os.path.join(directory, "look-around")
+    with FakeAnthropicServer(FakeConfig(script=script, seed=5)) as server, tempfile.TemporaryDirectory() as env:
+        recorded = await run_tree(server.url, ResponseCache(cache_dir, CacheMode.RECORD, env_directory=env), env)
+        requests = server.stats.requests
+        code = next(n for n in recorded.nodes.values() if n.node_type.value == "code")
+        seen = "".join(str(m.content) for m in code.conversation.messages)
+        assert env in seen and code.node_id in seen.replace(f".neo/overlays/{code.node_id}", "")
+
+    with tempfile.TemporaryDirectory() as env:
+        replayer = ResponseCache(cache_dir, CacheMode.REPLAY, env_directory=env)
+        replayed = await run_tree(None, replayer, env)
+    assert recorded.root.state == NodeState.COMPLETED and shape(replayed) == shape(recorded)
+    assert replayer.hits == requests and replayer.misses == 0
+    print("✅ a run that shows the model its environment root and node ids replays from another directory")
+
+
+async def main():
+    with FakeAnthropicServer(FakeConfig()) as server, tempfile.TemporaryDirectory() as directory:
+        await test_record_then_replay(server, os.path.join(directory, "record"))
+        await test_passthrough_always_calls(server, os.path.join(directory, "passthrough"))
+        test_lru_eviction(directory)
+        test_run_specific_paths_do_not_change_the_key(directory)
+        await test_recorded_run_replays_offline(directory)
+        await test_env_and_node_ids_replay_elsewhere(directory)
+    print("\n✅ All response cache tests passed!\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,132 @@
+"""
+Tests for conversation compaction.
+
+Checks which payloads are stubbed (superseded reads, old shell output, old
+write_file contents, but not recent or small ones), that stubs are batched so
+the cached prompt prefix changes once per batch rather than every turn, and
+that an over-budget history has its oldest turns folded into one summary
+without splitting a tool_use from its tool_result.
+
+Run with: python -m sauce.tests.compaction
+"""
+
+import dataclasses
+
+from sauce.compaction import COMPACTED, CompactionConfig, compact, estimate_tokens
+from sauce.models import Conversation, Message, ToolResultMessage, UserMessage
+
+
+BIG = "x" * 4000  # ~1000 tokens
+
+
+class Builder:
+    """Builds a conversation one assistant turn (with its tool results) at a time."""
+
+    def __init__(self):
+        self.conversation = Conversation("system", [UserMessage("task")])
+        self.calls = 0
+
+    def turn(self, *calls: tuple[str, dict, str], text: str = "") -> None:
+        blocks = [{"type": "text", "text": text}] if text else []
+        ids = []
+        for name, inp, _ in calls:
+            self.calls += 1
+            ids.append(f"toolu_{self.calls}")
+            blocks.append({"type": "tool_use", "id": ids[-1], "name": name, "input": inp})
+        self.conversation.messages.append(Message("assistant", blocks))
+        for tool_id, (_, _, output) in zip(ids, calls):
+            self.conversation.messages.append(ToolResultMessage(tool_id, output))
+
+
+def results(conversation: Conversation) -> dict[str, str]:
+    return {
+        block["tool_use_id"]: block["content"]
+        for m in conversation.messages if isinstance(m.content, list)
+        for block in m.content if block.get("type") == "tool_result"
+    }
+
+
+def paired(conversation: Conversation) -> bool:
+    uses = {b["id"] for m in conversation.messages if m.role == "assistant" and isinstance(m.content, list)
+            for b in m.content if b.get("type") == "tool_use"}
+    return uses == set(results(conversation))
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+def test_stale_payloads_are_stubbed():
+    b = Builder()
+    b.turn(("read_file", {"path": "a.py"}, BIG))                       # toolu_1: superseded below
+    b.turn(("run_shell", {"command": "pytest"}, BIG))                  # toolu_2: old by the end
+    b.turn(("write_file", {"path": "a.py", "content": BIG}, "Wrote"))  # toolu_3
+    b.turn(("read_file", {"path": "b.py"}, BIG))                       # toolu_4: latest read of b.py
+    b.turn(("run_shell", {"command": "ls"}, "short"))                  # toolu_5: too small
+    b.turn(("run_shell", {"command": "make"}, BIG))                    # toolu_6: old once the turns below run
+    for _ in range(5):
+        b.turn(text="thinking")
+
+    config = CompactionConfig(token_budget=10**6, stub_batch_tokens=0)
+    assert compact(b.conversation, config)
+    out = results(b.conversation)
+    assert out["toolu_1"].startswith(f"{COMPACTED}: read_file('a.py') output superseded")
+    assert out["toolu_2"].startswith(f"{COMPACTED}: run_shell output")
+    assert out["toolu_4"] == BIG and out["toolu_5"] == "short"
+    write = b.conversation.messages[5].content[0]
+    assert write["input"]["content"] == f"{COMPACTED}: {len(BIG)} chars written]"
+    assert out["toolu_6"].startswith(COMPACTED)
+    assert paired(b.conversation) and not compact(b.conversation, config)
+    print("✅ superseded reads, old shell output and old writes are stubbed; small and current ones kept")
+
+
+def test_stubs_are_batched():
+    def run(config: CompactionConfig) -> tuple[int, int]:
+        """Forty turns of shell output; returns (turns that changed history, largest history sent)."""
+        b, changed, peak = Builder(), 0, 0
+        for _ in range(40):
+            b.turn(("run_shell", {"command": "make"}, BIG))
+            changed += compact(b.conversation, config)
+            peak = max(peak, estimate_tokens(b.conversation.messages))
+        return changed, peak
+
+    batched = CompactionConfig(token_budget=10**6, stale_output_turns=3)
+    every_turn, _ = run(dataclasses.replace(batched, stub_batch_tokens=0))
+    changed, peak = run(batched)
+    print(f"   40 turns of shell output: history rewritten {every_turn}× unbatched → {changed}× batched, "
+          f"peak {peak} tokens")
+    assert every_turn >= 35 and changed <= every_turn // 5
+    assert peak < batched.stub_batch_tokens + 6_000  # the pending batch plus the recent turns
+    print("✅ stale output is stubbed in batches, so the cached prefix is not broken every turn")
+
+
+def test_oldest_turns_are_summarised():
+    b = Builder()
+    for i in range(12):
+        b.turn(("read_file", {"path": f"f{i}.py"}, f"contents of f{i}\n" + BIG), text=f"step {i}: read f{i}")
+    config = CompactionConfig(token_budget=5_000, keep_recent_turns=3)
+    assert compact(b.conversation, config)
+
+    messages = b.conversation.messages
+    assert messages[0].content == "task" and messages[1].content.startswith(f"{COMPACTED}: summary of earlier turns]")
+    assert "- assistant: step 0: read f0" in messages[1].content and "- called read_file(path=f0.py)" in messages[1].content
+    assert "  → contents of f0" in messages[1].content
+    assert sum(m.role == "assistant" for m in messages) == 3 and messages[2].role == "assistant"
+    assert paired(b.conversation)
+
+    # A later summary folds the earlier one in rather than nesting it.
+    for i in range(12, 20):
+        b.turn(("read_file", {"path": f"f{i}.py"}, BIG), text=f"step {i}")
+    assert compact(b.conversation, config)
+    summary = b.conversation.messages[1].content
+    assert summary.count(COMPACTED) == 1 and "step 0: read f0" in summary and "step 16" in summary
+    print("✅ over budget, the oldest turns become one summary and recent turns stay intact")
+
+
+def main():
+    test_stale_payloads_are_stubbed()
+    test_stubs_are_batched()
+    test_oldest_turns_are_summarised()
+    print("\n✅ All compaction tests passed!\n")
+
+
+if __name__ == "__main__":
+    main()
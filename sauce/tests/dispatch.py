@@ -0,0 +1,81 @@
+"""
+Tests for tool calls dispatched while a turn is still streaming.
+
+Checks that when the stream breaks after the first tool_use has been handed
+off, the work already started is not orphaned: workspace tools finish and
+every tool_use gets a result, spawned children run to completion and report
+back, and only then does the node fail and tell its parent.
+
+Run with: python -m sauce.tests.dispatch
+"""
+
+import os
+import asyncio
+import tempfile
+from unittest.mock import patch
+
+from sauce.models import AgentResponse, ToolCall
+from sauce.neo import Neo
+from sauce.node import NodeState
+from sauce.tree import DecompositionTree
+
+
+def respond(text: str = "", *calls: ToolCall) -> AgentResponse:
+    return AgentResponse(text, list(calls), "tool_use" if calls else "end_turn", 0, 0)
+
+
+async def broken_stream_llm(messages: list, system: str = "", model: str = "", tools: list | None = None,
+                            on_tool_use=None, **kwargs) -> AgentResponse:
+    """The root spawns a middle agent; its stream hands off a spawn and a shell call, then breaks."""
+    task = messages[0].content.rsplit("\n", 1)[-1]
+    turn = sum(m.role == "assistant" for m in messages)
+    if task == "root" and turn == 0:
+        return respond("", ToolCall("call_mid", "spawn_subagent", {"task": "middle", "agent_type": "thinking"}))
+    if task == "middle" and turn == 0:
+        on_tool_use(ToolCall("call_child", "spawn_subagent", {"task": "child", "agent_type": "code"}))
+        on_tool_use(ToolCall("call_shell", "run_shell", {"command": "sleep 0.1; echo started > started.txt"}))
+        await asyncio.sleep(0)
+        raise ConnectionError("stream dropped")
+    if task == "child":
+        await asyncio.sleep(0.2)
+        return respond("<MESSAGE>child done</MESSAGE>")
+    return respond("<MESSAGE>done</MESSAGE>")
+
+
+async def run(neo: Neo) -> None:
+    with patch("sauce.llm.call_llm_async", new=broken_stream_llm):
+        neo.prompt("root")
+        await asyncio.wait_for(neo.run(), timeout=10)
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+def test_stream_error_after_dispatch():
+    with tempfile.TemporaryDirectory() as env:
+        tree = DecompositionTree()
+        neo = Neo(tree, env_directory=env)
+        asyncio.run(run(neo))
+        assert os.path.exists(os.path.join(env, "started.txt"))
+
+    root = tree.root
+    middle = tree.nodes[root.children_ids[0]]
+    child = tree.nodes[middle.children_ids[0]]
+    assert child.state == NodeState.COMPLETED and middle.state == NodeState.FAILED
+    assert not neo.failing
+
+    turn = middle.conversation.messages[1]
+    assert [block["id"] for block in turn.content] == ["call_child", "call_shell"]
+    results = {m.content[0]["tool_use_id"]: m.content[0]["content"] for m in middle.conversation.messages[2:]}
+    assert results == {"call_shell": "(no output)", "call_child": "child done"}, results
+    # The parent is told once the middle agent has failed.
+    assert root.conversation.messages[2].content[0]["content"] == "Error: thinking agent failed: stream dropped"
+    print("✅ a stream error after dispatch waits for its tools and children, then fails the node")
+
+
+def main():
+    test_stream_error_after_dispatch()
+    print("\n✅ All dispatch tests passed!\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Tests for the edit_file tool.
+
+Checks search/replace hunks apply in order and all-or-nothing, files are
+replaced atomically with their line endings kept, and optimistic concurrency works per hunk: an agent's
+edits survive another agent's change elsewhere in the file but conflict when
+their target text was changed. Also compares the tool input an agent emits
+for a one-line fix against rewriting the file.
+
+Run with: python -m sauce.tests.edit
+"""
+
+import os
+import json
+import stat
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import sauce.tools as tools
+import sauce.workspace as workspace
+from sauce.models import Conversation
+from sauce.node import Node, NodeType, TOOLS_FOR_NODE
+from sauce.tree import DecompositionTree
+from sauce.workspace import FileCache
+
+
+GAME = "".join(f"function step{i}(state) {{\n  return state + {i};\n}}\n\n" for i in range(200))
+
+
+def agents(count: int = 2) -> DecompositionTree:
+    tree = DecompositionTree()
+    tree.set_root(Node("root", NodeType.THINKING, Conversation()))
+    for i in range(count):
+        tree.add_node(Node(f"agent-{i}", NodeType.CODE, Conversation(), parent_id="root"))
+    return tree
+
+
+def edit(old: str, new: str) -> dict:
+    return {"old_string": old, "new_string": new}
+
+
+def read(path: str) -> str:
+    with open(path) as f:
+        return f.read()
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+def test_hunks_apply_in_order(directory: str):
+    path = os.path.join(directory, "game.js")
+    with open(path, "w") as f:
+        f.write(GAME)
+    os.chmod(path, 0o755)
+    inode = os.stat(path).st_ino
+
+    result = tools._edit_file("game.js", [
+        edit("return state + 7;", "return state * 7;"),
+        edit("function step42(state) {\n  return state + 42;", "function step42(state) {\n  return 42;"),
+    ], working_directory=directory)
+    assert result == "Applied 2 edit(s) to game.js", result
+    content = read(path)
+    assert "return state * 7;" in content and "return 42;" in content
+    assert content.count("\n") == GAME.count("\n")
+    assert os.stat(path).st_ino != inode and stat.S_IMODE(os.stat(path).st_mode) == 0o755
+    assert not [name for name in os.listdir(directory) if name.endswith(".tmp")]
+    print("✅ hunks apply in order via an atomic rename that keeps the file mode")
+
+
+def test_bad_hunk_applies_nothing(directory: str):
+    path = os.path.join(directory, "game.js")
+    before = read(path)
+    missing = tools._edit_file("game.js", [edit("return state + 1;", "x"), edit("no such line", "y")],
+                               working_directory=directory)
+    ambiguous = tools._edit_file("game.js", [edit("  return state", "x")], working_directory=directory)
+    assert missing.startswith("Error: edit 2: old_string not found"), missing
+    assert ambiguous.startswith("Error: edit 1: old_string appears"), ambiguous
+    assert tools._edit_file("missing.js", [edit("a", "b")], working_directory=directory).startswith("Error:")
+    assert read(path) == before
+    print("✅ a hunk that is missing or ambiguous rejects the whole edit")
+
+
+def test_crlf_line_endings_are_kept(directory: str):
+    tree = agents()
+    path = os.path.join(directory, "windows.js")
+    with open(path, "wb") as f:
+        f.write(GAME.replace("\n", "\r\n").encode())
+    # The agent reads the file with \n line endings and edits in them.
+    assert "\r" not in tools._read_file("windows.js", tree, "agent-0", directory)
+    result = tools._edit_file("windows.js", [
+        edit("function step5(state) {\n  return state + 5;", "function step5(state) {\n  // five\n  return 5;"),
+    ], tree, "agent-0", directory)
+    assert result == "Applied 1 edit(s) to windows.js", result
+    with open(path, "rb") as f:
+        data = f.read()
+    expected = GAME.replace("  return state + 5;", "  // five\n  return 5;").replace("\n", "\r\n")
+    assert data == expected.encode(), "line endings changed"
+
+    # A second edit from the same agent sees its own version, not a conflict.
+    again = tools._edit_file("windows.js", [edit("return 5;", "return 5 * 1;")], tree, "agent-0", directory)
+    assert again == "Applied 1 edit(s) to windows.js", again
+    print("✅ editing a CRLF file changes only the edited lines and keeps CRLF")
+
+
+def test_concurrency_is_per_hunk(directory: str):
+    tree = agents()
+    with open(os.path.join(directory, "shared.js"), "w") as f:
+        f.write(GAME)
+    tools._read_file("shared.js", tree, "agent-0", directory)
+    tools._read_file("shared.js", tree, "agent-1", directory)
+
+    # agent-1 changes step3; agent-0's edit to step9 still applies on top of it.
+    assert tools._edit_file("shared.js", [edit("state + 3;", "state - 3;")], tree, "agent-1", directory).startswith("Applied")
+    merged = tools._edit_file("shared.js", [edit("state + 9;", "state - 9;")], tree, "agent-0", directory)
+    assert merged.startswith("Applied 1 edit(s)") and "changed since you read it" in merged, merged
+    content = read(os.path.join(directory, "shared.js"))
+    assert "state - 3;" in content and "state - 9;" in content
+
+    # agent-1 now edits text agent-0 changed: that hunk conflicts.
+    conflict = tools._edit_file("shared.js", [edit("state + 9;", "state * 9;")], tree, "agent-1", directory)
+    assert conflict.startswith("CONFLICT: Edit 1"), conflict
+    # Whole-file writes keep the existing check.
+    assert tools._write_file("shared.js", "x", tree, "agent-1", directory).startswith("CONFLICT")
+    print("✅ edits survive changes elsewhere in the file and conflict only on changed hunks")
+
+
+def test_parallel_edits_do_not_lose_updates(directory: str):
+    path = os.path.join(directory, "parallel.js")
+    with open(path, "w") as f:
+        f.write(GAME)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(
+            lambda i: tools._edit_file("parallel.js", [edit(f"state + {i};", f"state - {i};")], working_directory=directory),
+            range(100, 164),
+        ))
+    assert all(r.startswith("Applied") for r in results)
+    content = read(path)
+    assert all(f"state - {i};" in content for i in range(100, 164))
+    print("✅ 64 concurrent edits to one file all land")
+
+
+def test_edit_is_far_smaller_than_rewrite(directory: str):
+    fix = {"path": "game.js", "edits": [edit("return state * 7;", "return state * 7 + 1;")]}
+    rewrite = {"path": "game.js", "content": read(os.path.join(directory, "game.js")).replace("state * 7;", "state * 7 + 1;")}
+    edit_chars, rewrite_chars = len(json.dumps(fix)), len(json.dumps(rewrite))
+    print(f"   one-line fix in a {len(GAME) / 1e3:.0f} KB file: {edit_chars} chars of tool input vs {rewrite_chars} to rewrite it")
+    assert edit_chars * 50 < rewrite_chars
+    assert all(tools.edit_file in TOOLS_FOR_NODE[t] for t in NodeType if t in TOOLS_FOR_NODE)
+    assert tools.edit_file.to_dict()["input_schema"]["properties"]["edits"]["items"]["required"] == ["old_string", "new_string"]
+    print("✅ edit_file is offered to every agent type and needs a fraction of the output")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory, patch.object(workspace, "default_cache", FileCache()):
+        test_hunks_apply_in_order(directory)
+        test_bad_hunk_applies_nothing(directory)
+        test_crlf_line_endings_are_kept(directory)
+        test_concurrency_is_per_hunk(directory)
+        test_parallel_edits_do_not_lose_updates(directory)
+        test_edit_is_far_smaller_than_rewrite(directory)
+    print("\n✅ All edit tests passed!\n")
+
+
+if __name__ == "__main__":
+    main()
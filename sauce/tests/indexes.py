@@ -0,0 +1,120 @@
+"""
+Tests for DecompositionTree's secondary indexes.
+
+Builds a large tree, drives random state transitions through set_state(),
+checks every index query against a full scan, then times the two.
+
+Run with: python -m sauce.tests.indexes
+"""
+
+import time
+import random
+
+from sauce.models import Conversation
+from sauce.node import Node, NodeState, NodeType
+from sauce.tree import DecompositionTree
+
+
+BRANCHES = 100
+LEAVES = 500
+DIRECTORIES = ["backend", "backend/api", "backend/db", "frontend", "frontend/components", "tests"]
+
+
+def build_tree(seed: int = 0) -> DecompositionTree:
+    rng = random.Random(seed)
+    tree = DecompositionTree()
+    tree.set_root(Node("root", NodeType.THINKING, Conversation()))
+    for b in range(BRANCHES):
+        branch = Node(f"b{b}", NodeType.THINKING, Conversation(), parent_id="root",
+                      working_directory=rng.choice(DIRECTORIES[::2]))
+        tree.add_node(branch)
+        for leaf in range(LEAVES):
+            directory = rng.choice([d for d in DIRECTORIES if d.startswith(branch.working_directory)])
+            node_type = rng.choice([NodeType.CODE, NodeType.TEST])
+            tree.add_node(Node(f"b{b}-{leaf}", node_type, Conversation(), parent_id=branch.node_id,
+                               working_directory=directory))
+    for node in rng.sample(list(tree.nodes.values()), len(tree.nodes) // 2):
+        for state in rng.sample(list(NodeState), 2):
+            tree.set_state(node, state)
+    return tree
+
+
+def scan(tree: DecompositionTree, state=None, node_type=None, parent_id=None, working_directory=None) -> list[Node]:
+    return [
+        n for n in tree.nodes.values()
+        if (state is None or n.state == state)
+        and (node_type is None or n.node_type == node_type)
+        and (parent_id is None or n.parent_id == parent_id)
+        and (working_directory is None or n.working_directory == working_directory
+             or n.working_directory.startswith(working_directory + "/"))
+    ]
+
+
+def ids(nodes: list[Node]) -> set[str]:
+    return {n.node_id for n in nodes}
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+def test_counts_match_scan(tree: DecompositionTree):
+    for state in NodeState:
+        assert tree.count(state) == len(scan(tree, state=state))
+    assert sum(tree.state_counts.values()) == len(tree.nodes)
+    assert ids(tree.get_ready_nodes()) == ids(scan(tree, state=NodeState.READY))
+    print(f"✅ per-state counts match a scan of {len(tree.nodes)} nodes after random transitions")
+
+
+def test_queries_match_scan(tree: DecompositionTree):
+    queries = [
+        {"state": NodeState.RUNNING, "node_type": NodeType.CODE},
+        {"parent_id": "b7"},
+        {"parent_id": "b7", "state": NodeState.COMPLETED},
+        {"working_directory": "backend"},
+        {"working_directory": "backend/api", "node_type": NodeType.TEST},
+        {"working_directory": "back"},
+        {"parent_id": "missing"},
+    ]
+    for query in queries:
+        assert ids(tree.find_nodes(**query)) == ids(scan(tree, **query)), query
+    assert len(tree.find_nodes(working_directory=".")) == len(tree.nodes)
+    print("✅ find_nodes() by state, type, parent and directory matches a scan")
+
+
+def test_readding_a_node_reindexes(tree: DecompositionTree):
+    node = tree.nodes["b3-0"]
+    replacement = Node(node.node_id, NodeType.TEST, Conversation(), parent_id="b4",
+                       state=NodeState.FAILED, working_directory="tests")
+    tree.add_node(replacement)
+    assert node.node_id not in tree.by_parent["b3"] and node.node_id in tree.by_parent["b4"]
+    assert ids(tree.find_nodes(state=NodeState.FAILED, working_directory="tests")) >= {node.node_id}
+    assert sum(tree.state_counts.values()) == len(tree.nodes)
+    print("✅ replacing a node moves it between indexes")
+
+
+def test_queries_beat_scans(tree: DecompositionTree):
+    queries = [{"state": NodeState.RUNNING, "node_type": NodeType.CODE, "working_directory": "frontend"}, {"parent_id": "b7"}]
+    for query in queries:
+        start = time.perf_counter()
+        for _ in range(20):
+            scan(tree, **query)
+        scan_time = (time.perf_counter() - start) / 20
+        start = time.perf_counter()
+        for _ in range(20):
+            tree.find_nodes(**query)
+        index_time = (time.perf_counter() - start) / 20
+        print(f"   {query}: {index_time * 1000:.2f}ms indexed vs {scan_time * 1000:.2f}ms scan")
+        assert index_time < scan_time
+    print("✅ indexed queries are faster than scanning the tree")
+
+
+def main():
+    tree = build_tree()
+    test_counts_match_scan(tree)
+    test_queries_match_scan(tree)
+    test_queries_beat_scans(tree)
+    test_readding_a_node_reindexes(tree)
+    print("\n✅ All index tests passed!\n")
+
+
+if __name__ == "__main__":
+    main()
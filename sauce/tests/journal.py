@@ -0,0 +1,122 @@
+"""
+Tests for the write-ahead journal of tree mutations.
+
+Runs a scripted tree against the local fake Messages API with a journal
+attached, then rebuilds the tree from disk and compares it to the live one,
+including across snapshot compaction and a torn final write. Also checks
+that a wide streamed turn is journaled in space linear in its tool calls.
+
+Run with: python -m sauce.tests.journal
+"""
+
+import os
+import json
+import asyncio
+import tempfile
+from unittest.mock import patch
+
+import sauce.llm as llm
+import sauce.journal as journal
+from sauce.backend import AnthropicBackend
+from sauce.fake_anthropic import FakeAnthropicServer, FakeConfig, TreeScript
+from sauce.journal import Journal
+from sauce.neo import Neo
+from sauce.tree import DecompositionTree
+
+
+def comparable(tree: DecompositionTree) -> dict:
+    state = tree.dump_state()
+    return {node_id: data for node_id, data in [(state["root"]["node_id"], state["root"]), *state["nodes"].items()]}
+
+
+async def run_journaled(server: FakeAnthropicServer, directory: str, snapshot_every: int) -> DecompositionTree:
+    with tempfile.TemporaryDirectory() as env_dir, \
+            patch.object(llm, "backend", AnthropicBackend(base_url=server.url, api_key="test")):
+        tree = DecompositionTree()
+        recorder = Journal(directory, snapshot_every=snapshot_every)
+        recorder.attach(tree)
+        neo = Neo(tree, env_directory=env_dir)
+        neo.prompt("journal test")
+        await asyncio.wait_for(neo.run(), timeout=30)
+        recorder.close()
+    return tree
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+async def test_replay_matches_live_tree(server: FakeAnthropicServer):
+    with tempfile.TemporaryDirectory() as directory:
+        tree = await run_journaled(server, directory, snapshot_every=1_000_000)
+        restored = DecompositionTree.load_state(journal.load(directory))
+        assert comparable(restored) == comparable(tree)
+    print(f"✅ journal replay rebuilds all {len(tree.nodes)} nodes exactly")
+
+
+async def test_replay_across_snapshots(server: FakeAnthropicServer):
+    with tempfile.TemporaryDirectory() as directory:
+        tree = await run_journaled(server, directory, snapshot_every=25)
+        state, records = journal._read(directory)
+        assert state["seq"] > 0 and len(records) < state["seq"], (state["seq"], len(records))
+        restored = DecompositionTree.load_state(journal.load(directory))
+        assert comparable(restored) == comparable(tree)
+    print("✅ snapshot compaction keeps the journal short and replay exact")
+
+
+async def test_torn_write_is_ignored(server: FakeAnthropicServer):
+    with tempfile.TemporaryDirectory() as directory:
+        await run_journaled(server, directory, snapshot_every=1_000_000)
+        intact = journal.load(directory)
+        with open(os.path.join(directory, journal.JOURNAL), "a") as f:
+            f.write('{"op":"set","id":"x","fie')
+        assert journal.load(directory) == intact
+    print("✅ a torn final record (kill -9 mid-write) is skipped")
+
+
+async def test_stale_records_not_reapplied(server: FakeAnthropicServer):
+    with tempfile.TemporaryDirectory() as directory:
+        tree = await run_journaled(server, directory, snapshot_every=1_000_000)
+        with open(os.path.join(directory, journal.JOURNAL)) as f:
+            old_records = f.read()
+
+        # Crash after the snapshot replaced but before the journal was truncated.
+        j = Journal(directory)
+        j.tree = tree
+        j.snapshot()
+        j.close()
+        with open(os.path.join(directory, journal.JOURNAL), "w") as f:
+            f.write(old_records)
+
+        restored = DecompositionTree.load_state(journal.load(directory))
+        assert comparable(restored) == comparable(tree)
+    print("✅ records already in the snapshot are not applied twice")
+
+
+async def test_streamed_turn_is_logged_once():
+    config = FakeConfig(script=TreeScript(depth=1, fanout=60, tool_calls=0), seed=1)
+    with FakeAnthropicServer(config) as server, tempfile.TemporaryDirectory() as directory:
+        tree = await run_journaled(server, directory, snapshot_every=1_000_000)
+        _, records = journal._read(directory)
+        root_id = tree.root.node_id
+        turn = json.dumps(tree.root.conversation.messages[1].to_dict())
+        logged = sum(len(json.dumps(r)) for r in records
+                     if r.get("id") == root_id and (r["op"] == "block" or "index" in r))
+        restored = DecompositionTree.load_state(journal.load(directory))
+        assert comparable(restored) == comparable(tree)
+    print(f"   60 streamed spawns: {logged / 1e3:.0f} KB journaled for a {len(turn) / 1e3:.0f} KB turn")
+    assert logged < 3 * len(turn), (logged, len(turn))
+    print("✅ a streamed turn's tool_use blocks are journaled once each, not the whole turn per dispatch")
+
+
+async def main():
+    config = FakeConfig(script=TreeScript(depth=2, fanout=3, tool_calls=2), seed=1)
+    with FakeAnthropicServer(config) as server:
+        await test_replay_matches_live_tree(server)
+        await test_replay_across_snapshots(server)
+        await test_torn_write_is_ignored(server)
+        await test_stale_records_not_reapplied(server)
+    await test_streamed_turn_is_logged_once()
+    print("\n✅ All journal tests passed!\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,73 @@
+"""
+Offline load test: runs Neo against the local fake Messages API.
+
+The fake scripts a thinking tree (root → FANOUT → FANOUT² → code leaves) with
+heavy-tailed latency and a few injected 529s, so the whole stack is exercised:
+streaming early dispatch, limiter, retries, tool dispatch and the scheduler.
+
+Run with: python -m sauce.tests.load
+"""
+
+import time
+import asyncio
+import tempfile
+from unittest.mock import patch
+
+import sauce.llm as llm
+import sauce.metrics as metrics
+from sauce.backend import AnthropicBackend
+from sauce.fake_anthropic import FakeAnthropicServer, FakeConfig, TreeScript, lognormal
+from sauce.neo import Neo
+from sauce.node import NodeState
+from sauce.ratelimit import LimiterPool, ModelLimits
+from sauce.tree import DecompositionTree
+
+
+DEPTH = 3
+FANOUT = 6
+CONCURRENCY = 200
+
+# Budgets high enough that the fake, not the limiter, is the bottleneck.
+LOAD_LIMITS = {
+    model: ModelLimits(max_concurrency=CONCURRENCY, requests_per_minute=1_000_000,
+                       input_tokens_per_minute=1_000_000_000, output_tokens_per_minute=1_000_000_000)
+    for model in ("claude-sonnet-4-6", "claude-haiku-4-5")
+}
+
+
+async def main():
+    config = FakeConfig(
+        latency=lognormal(median=0.2, p99=1.5),
+        error_rates={529: 0.002},
+        retry_after=0.1,
+        script=TreeScript(depth=DEPTH, fanout=FANOUT, tool_calls=2),
+        seed=7,
+    )
+    with FakeAnthropicServer(config) as server, tempfile.TemporaryDirectory() as env_dir:
+        backend = AnthropicBackend(base_url=server.url, api_key="fake")
+        with patch.object(llm, "backend", backend):
+            tree = DecompositionTree()
+            neo = Neo(tree, env_directory=env_dir)
+            neo.limiters = LimiterPool(limits=LOAD_LIMITS)
+
+            start = time.perf_counter()
+            neo.prompt("load test")
+            await neo.run()
+            elapsed = time.perf_counter() - start
+
+        failed = sum(1 for n in tree.nodes.values() if n.state == NodeState.FAILED)
+        stats = server.stats
+        print(f"nodes:            {len(tree.nodes)} ({failed} failed)")
+        print(f"llm requests:     {stats.requests} ({stats.errors} injected errors)")
+        print(f"peak concurrency: {stats.peak_in_flight} requests in flight")
+        print(f"wall time:        {elapsed:.2f}s")
+        print(f"throughput:       {len(tree.nodes) / elapsed:.1f} nodes/s, {stats.requests / elapsed:.1f} requests/s")
+        print()
+        print(metrics.summary(tree))
+
+        recorded = metrics.subtree_metrics(tree)[tree.root.node_id]
+        assert recorded.llm_calls == stats.requests - stats.errors, (recorded.llm_calls, stats.requests, stats.errors)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,119 @@
+"""
+Memory and allocation benchmark for node and message representations.
+
+Builds a 10k-node tree with long conversations, reports resident bytes per
+node and message, then measures what building LLM requests allocates once
+the history has been serialized, against serializing it afresh.
+
+Run with: python -m sauce.tests.memory
+"""
+
+import time
+import tracemalloc
+
+import sauce.llm as llm
+from sauce.models import Conversation, Message, ToolCall, UserMessage
+from sauce.node import Node, NodeType, TOOLS_FOR_NODE
+from sauce.tree import DecompositionTree
+
+
+NODES = 10_000
+TURNS = 20  # each turn is an assistant tool_use message and a user tool_result message
+
+
+def conversation(i: int) -> Conversation:
+    messages = [UserMessage(f"subtask {i}: implement the handler and its tests")]
+    for turn in range(TURNS):
+        tool_id = f"toolu_{i}_{turn}"
+        messages.append(Message("assistant", [
+            {"type": "text", "text": f"Step {turn}: checking the module layout."},
+            {"type": "tool_use", "id": tool_id, "name": "run_shell", "input": {"command": f"pytest -q tests/test_{turn}.py"}},
+        ]))
+        messages.append(Message("user", [
+            {"type": "tool_result", "tool_use_id": tool_id, "content": f"{turn} passed in 0.{turn}s"},
+        ]))
+    return Conversation("", messages)
+
+
+def build_tree() -> DecompositionTree:
+    tree = DecompositionTree()
+    tree.set_root(Node("root", NodeType.THINKING, conversation(0)))
+    for i in range(1, NODES):
+        node = Node(f"node-{i}", NodeType.CODE, conversation(i), parent_id="root")
+        node.tool_calls.append(ToolCall(f"toolu_{i}_0", "run_shell", {"command": "pytest -q"}))
+        tree.add_node(node)
+    return tree
+
+
+def fresh_request(node: Node) -> dict:
+    """What a request cost before: every message and tool serialized again."""
+    tools = [t.to_dict() for t in TOOLS_FOR_NODE[node.node_type]]
+    tools[-1] = {**tools[-1], "cache_control": llm.CACHE_CONTROL}
+    messages = [{"role": m.role, "content": m.content} for m in node.conversation.messages]
+    return {"messages": llm._with_message_breakpoints(messages), "tools": tools}
+
+
+def cached_request(node: Node) -> dict:
+    return llm._request_kwargs(node.conversation.messages, "", "model", TOOLS_FOR_NODE[node.node_type])
+
+
+def allocated(build, nodes: list[Node]) -> tuple[int, float]:
+    """Bytes allocated and seconds taken building one request per node (all kept alive)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    requests = [build(node) for node in nodes]
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del requests
+    return current, elapsed
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+def test_slotted_representations(tree: DecompositionTree):
+    node = tree.nodes["node-1"]
+    for obj in (node, node.conversation, node.conversation.messages[0], node.tool_calls[0], node.metrics):
+        assert not hasattr(obj, "__dict__"), type(obj).__name__
+    print("✅ Node, Conversation, Message, ToolCall and NodeMetrics carry no per-instance __dict__")
+
+
+def test_resident_memory():
+    tracemalloc.start()
+    tree = build_tree()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    messages = sum(len(n.conversation.messages) for n in tree.nodes.values())
+    print(f"   {NODES} nodes, {messages} messages: {current / 1e6:.1f} MB "
+          f"({current / NODES / 1e3:.1f} KB per node, {current / messages:.0f} B per message)")
+    return tree
+
+
+def test_requests_reuse_serialized_history(tree: DecompositionTree):
+    nodes = list(tree.nodes.values())
+    for node in nodes:
+        cached_request(node)  # the first request serializes the history once
+
+    fresh_bytes, fresh_time = allocated(fresh_request, nodes)
+    cached_bytes, cached_time = allocated(cached_request, nodes)
+    print(f"   request building: {fresh_bytes / 1e6:.1f} MB, {fresh_time * 1000:.0f} ms fresh "
+          f"→ {cached_bytes / 1e6:.1f} MB, {cached_time * 1000:.0f} ms cached")
+    assert cached_bytes < fresh_bytes / 2
+
+    node = nodes[1]
+    first, second = cached_request(node), cached_request(node)
+    assert first["tools"] is second["tools"]
+    # Only the two cache breakpoint messages are rebuilt per request.
+    assert sum(a is b for a, b in zip(first["messages"], second["messages"])) == len(first["messages"]) - 2
+    print("✅ already-sent messages and each NodeType's tool schema are serialized once")
+
+
+def main():
+    tree = test_resident_memory()
+    test_slotted_representations(tree)
+    test_requests_reuse_serialized_history(tree)
+    print("\n✅ All memory tests passed!\n")
+
+
+if __name__ == "__main__":
+    main()
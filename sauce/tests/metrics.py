@@ -0,0 +1,106 @@
+"""
+Tests for per-node usage metrics.
+
+Checks that each response is priced by its own model, cache reads and
+writes included; that totals per model and per subtree add up across a
+mixed-model tree; and that dump_state carries the subtree rollups and
+survives a reload.
+
+Run with: python -m sauce.tests.metrics
+"""
+
+import math
+
+from sauce.metrics import NodeMetrics, by_model, call_cost, subtree_metrics
+from sauce.models import AgentResponse, Conversation, UserMessage
+from sauce.node import Node, NodeType
+from sauce.tree import DecompositionTree
+
+
+SONNET, HAIKU = "claude-sonnet-4-6", "claude-haiku-4-5"
+
+
+def usage(input_tokens: int, output_tokens: int, cache_read: int = 0, cache_write: int = 0) -> AgentResponse:
+    return AgentResponse("", [], "end_turn", input_tokens, output_tokens, cache_read, cache_write)
+
+
+def node(node_id: str, node_type: NodeType, parent_id: str | None = None) -> Node:
+    return Node(node_id, node_type, Conversation("", [UserMessage(node_id)]), parent_id=parent_id)
+
+
+def build_tree() -> DecompositionTree:
+    """root (sonnet) → a (haiku) → a1 (haiku), and root → b (sonnet)."""
+    tree = DecompositionTree()
+    root = node("root", NodeType.THINKING)
+    tree.set_root(root)
+    a, b = node("a", NodeType.CODE, "root"), node("b", NodeType.THINKING, "root")
+    tree.add_children(root, [a, b])
+    tree.add_children(a, [node("a1", NodeType.CODE, "a")])
+
+    tree.nodes["root"].metrics.record_response(SONNET, usage(1_000, 100, cache_read=9_000))
+    tree.nodes["a"].metrics.record_response(HAIKU, usage(2_000, 200, cache_write=4_000))
+    tree.nodes["a"].metrics.record_response(HAIKU, usage(500, 300, cache_read=6_000))
+    tree.nodes["a1"].metrics.record_response(HAIKU, usage(100, 50))
+    tree.nodes["a1"].metrics.tool_calls = 3
+    tree.nodes["b"].metrics.record_response(SONNET, usage(3_000, 400, cache_write=1_000))
+    return tree
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+def test_response_cost():
+    m = NodeMetrics()
+    m.record_response(SONNET, usage(1_000, 500, cache_read=20_000, cache_write=2_000))
+    # 1k × $3 + 500 × $15 + 2k × $3.75 + 20k × $0.30, per million tokens.
+    assert math.isclose(m.cost, (3_000 + 7_500 + 7_500 + 6_000) / 1e6)
+    assert (m.cache_read_input_tokens, m.cache_creation_input_tokens) == (20_000, 2_000)
+
+    m.record_response(HAIKU, usage(1_000, 500, cache_read=20_000))
+    assert math.isclose(m.cost, 0.024 + (1_000 + 2_500 + 2_000) / 1e6)
+    assert m.model == HAIKU and m.llm_calls == 2 and m.cache_read_input_tokens == 40_000
+    assert call_cost("unknown-model", usage(1_000_000, 0)) == 3.00  # priced as Sonnet
+    print("✅ each call is priced at its own model's rates, cache reads and writes included")
+
+
+def test_rollups():
+    tree = build_tree()
+    models = by_model(tree)
+    assert set(models) == {SONNET, HAIKU}
+    assert models[HAIKU].llm_calls == 3 and models[HAIKU].cache_read_input_tokens == 6_000
+    assert models[HAIKU].cache_creation_input_tokens == 4_000 and models[SONNET].input_tokens == 4_000
+
+    subtrees = subtree_metrics(tree)
+    nodes = tree.nodes
+    assert subtrees["a1"].to_dict() == {**nodes["a1"].metrics.to_dict(), "model": ""}  # totals carry no model
+    assert subtrees["a"].llm_calls == 3 and subtrees["a"].tool_calls == 3
+    assert math.isclose(subtrees["a"].cost, nodes["a"].metrics.cost + nodes["a1"].metrics.cost)
+    assert math.isclose(subtrees["root"].cost, sum(m.cost for m in models.values()))
+    assert subtrees["root"].cache_read_input_tokens == 15_000 and subtrees["root"].llm_calls == 5
+    print("✅ per-model and per-subtree totals add up across a mixed-model tree")
+
+
+def test_dump_state():
+    tree = build_tree()
+    state = tree.dump_state()
+    subtrees = subtree_metrics(tree)
+    assert state["root"]["subtree_metrics"] == subtrees["root"].to_dict()
+    for node_id in ("a", "a1", "b"):
+        assert state["nodes"][node_id]["subtree_metrics"] == subtrees[node_id].to_dict()
+        assert state["nodes"][node_id]["metrics"] == tree.nodes[node_id].metrics.to_dict()
+    assert state["metrics"][HAIKU]["llm_calls"] == 3
+
+    reloaded = DecompositionTree.load_state(state)
+    assert all(reloaded.nodes[i].metrics == tree.nodes[i].metrics for i in tree.nodes)
+    assert subtree_metrics(reloaded) == subtrees
+    print("✅ dump_state records each node's metrics and subtree totals, and they survive a reload")
+
+
+def main():
+    test_response_cost()
+    test_rollups()
+    test_dump_state()
+    print("\n✅ All metrics tests passed!\n")
+
+
+if __name__ == "__main__":
+    main()
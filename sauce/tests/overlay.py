@@ -0,0 +1,336 @@
+"""
+Tests for copy-on-write agent overlays and three-way merge.
+
+Checks merge3 merges non-overlapping edits and reports only overlapping ones,
+that an overlay isolates a node's writes (dependency directories shared, not
+copied), merges them back on completion with line-level three-way merge, keeps
+the shared version on a true conflict, and reattaches after a restart; that a
+node's overlays are resolved once and reused for every path; that ignored and
+oversized parts of a tree are symlinked and a tree over the size cap is refused, with the cost of creating an overlay printed; and that a
+failed agent's overlay is discarded and a merge error is reported instead of
+stopping the run. Then runs sibling code agents that all rewrite one shared file: without overlays
+most of them get CONFLICT and need another turn; with overlays none do.
+
+Run with: python -m sauce.tests.overlay
+"""
+
+import os
+import time
+import asyncio
+import tempfile
+import dataclasses
+from unittest.mock import patch
+
+import sauce.workspace as workspace
+from sauce.merge import merge3
+from sauce.models import AgentResponse, Conversation, ToolCall, UserMessage
+from sauce.neo import Neo
+from sauce.node import Node, NodeType, NODE_CONFIG
+from sauce.overlay import Overlay, OverlayStore, OverlayTooLarge
+from sauce.tree import DecompositionTree
+from sauce.workspace import BaseStore
+
+
+AGENTS = 8
+BASE = "".join(f"line {i}\n" for i in range(20))
+SHARED = "".join(f"section {i}: todo\n  detail a\n  detail b\n" for i in range(AGENTS))
+
+
+def write(path: str, content: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def read(path: str) -> str:
+    with open(path) as f:
+        return f.read()
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+def test_merge3():
+    ours, theirs = BASE.replace("line 3\n", "three\n"), BASE.replace("line 15\n", "fifteen\n")
+    assert merge3(BASE, ours, theirs).text == BASE.replace("line 3\n", "three\n").replace("line 15\n", "fifteen\n")
+    # Touching edits and insertions at a hunk's edge have an unambiguous order.
+    touching = merge3(BASE, BASE.replace("line 3\n", "x\n"), BASE.replace("line 4\n", "y\n").replace("line 5\n", "line 5\nz\n"))
+    assert touching.text == BASE.replace("line 3\n", "x\n").replace("line 4\n", "y\n").replace("line 5\n", "line 5\nz\n")
+    assert merge3(BASE, ours, ours).text == ours
+    # Different changes to the same lines, or insertions at the same point, conflict.
+    assert merge3(BASE, ours, BASE.replace("line 3\n", "THREE\n")).conflicts == [(4, 4)]
+    assert not merge3(BASE, BASE + "a\n", BASE + "b\n").clean
+    print("✅ merge3 merges non-overlapping edits and reports only overlapping ones")
+
+
+def test_overlay_isolates_and_merges(env: str):
+    base = os.path.join(env, "project")
+    write(os.path.join(base, "src", "app.py"), BASE)
+    write(os.path.join(base, "README.md"), "readme\n")
+    write(os.path.join(base, "old.txt"), "obsolete\n")
+    write(os.path.join(base, "node_modules", "dep", "index.js"), "module.exports = 1;\n")
+
+    store = OverlayStore(env)
+    a, b = store.create("a", base), store.create("b", base)
+    assert os.path.islink(os.path.join(a.root, "node_modules"))
+
+    write(os.path.join(a.root, "src", "app.py"), BASE.replace("line 3\n", "three\n"))
+    write(os.path.join(a.root, "NEW.md"), "from a\n")
+    os.unlink(os.path.join(a.root, "old.txt"))
+    write(os.path.join(b.root, "src", "app.py"), BASE.replace("line 15\n", "fifteen\n"))
+    assert read(os.path.join(base, "src", "app.py")) == BASE
+    assert not os.path.exists(os.path.join(b.root, "NEW.md"))
+
+    first = a.merge()
+    assert first.clean and sorted(first.copied) == ["NEW.md", os.path.join("src", "app.py")] and first.deleted == ["old.txt"]
+    second = b.merge()
+    assert second.clean and second.merged == [os.path.join("src", "app.py")], second
+    assert read(os.path.join(base, "src", "app.py")) == BASE.replace("line 3\n", "three\n").replace("line 15\n", "fifteen\n")
+    assert not os.path.exists(a.root) and not os.path.exists(store.objects_dir)
+    print("✅ overlays keep each node's writes private and merge them back by line on completion")
+
+
+def test_conflicts_keep_the_shared_version(env: str):
+    base = os.path.join(env, "project")
+    store = OverlayStore(env)
+    a, b = store.create("a", base), store.create("b", base)
+    write(os.path.join(a.root, "README.md"), "readme by a\n")
+    write(os.path.join(b.root, "README.md"), "readme by b\n")
+    assert a.merge().clean
+    report = b.merge()
+    assert list(report.conflicts) == ["README.md"] and "CONFLICT" in report.summary(b.root)
+    assert read(os.path.join(base, "README.md")) == "readme by a\n"
+    assert read(os.path.join(b.root, "README.md")) == "readme by b\n"
+    store.discard(b)
+    print("✅ overlapping edits keep the shared version and leave the agent's copy in its overlay")
+
+
+def test_overlay_reattaches_after_restart(env: str):
+    base = os.path.join(env, "project")
+    overlay = OverlayStore(env).create("c", base)
+    write(os.path.join(overlay.root, "README.md"), "after restart\n")
+
+    reattached = OverlayStore(env).get("c")
+    assert reattached.root == overlay.root and reattached.files == overlay.files
+    assert reattached.merge().copied == ["README.md"]
+    assert read(os.path.join(base, "README.md")) == "after restart\n"
+    print("✅ a new OverlayStore reattaches to overlays an interrupted run left on disk")
+
+
+def test_directory_resolved_once_per_node(env: str):
+    write(os.path.join(env, "resolved", "lib", "a.py"), "a = 1\n")
+    tree = DecompositionTree()
+    neo = Neo(tree, env_directory=env)
+    nodes = [Node(node_id, node_type, Conversation("", [UserMessage(node_id)]), parent_id=parent, working_directory="resolved")
+             for node_id, node_type, parent in [("root", NodeType.THINKING, None), ("code", NodeType.CODE, "root"),
+                                                ("test", NodeType.TEST, "code")]]
+    root, code, test = nodes
+    tree.set_root(root)
+    tree.add_children(root, [code])
+    tree.add_children(code, [test])
+
+    assert neo.directory(code) == os.path.join(env, "resolved")
+    asyncio.run(neo.open_workspace(code))
+    view = neo.overlays.get("code")
+    with patch.object(neo.overlays, "get", wraps=neo.overlays.get) as get:
+        for _ in range(3):
+            assert neo.directory(test) == neo.directory(code) == view.root
+            assert neo.directory(test, "resolved/lib") == os.path.join(view.root, "lib")
+        assert get.call_count == 2  # once each for code (its overlay just opened) and test
+
+    asyncio.run(neo.close_workspace(test))
+    asyncio.run(neo.close_workspace(code))
+    assert set(neo.views) == {"root"}
+    assert neo.directory(code) == os.path.join(env, "resolved")
+    print("✅ a node's overlays are resolved once, then reused for every path until it closes")
+
+
+def test_create_bounds_large_and_ignored_trees(env: str):
+    base = os.path.join(env, "bounded")
+    write(os.path.join(base, ".gitignore"), "# build output\nbuild/\n*.egg-info\n/anchored\n")
+    write(os.path.join(base, "build", "out.o"), "x" * 5000)
+    write(os.path.join(base, "pkg.egg-info", "PKG-INFO"), "name: pkg\n")
+    write(os.path.join(base, "data.bin"), "y" * 5000)
+    write(os.path.join(base, "src", "app.py"), BASE)
+
+    store = OverlayStore(env, max_file_bytes=4096)
+    view = store.create("bounded", base)
+    assert all(os.path.islink(os.path.join(view.root, name)) for name in ("build", "pkg.egg-info", "data.bin"))
+    assert sorted(view.files) == [".gitignore", os.path.join("src", "app.py")] and view.shared == {"data.bin"}
+    # Rewriting a shared file replaces the link in the overlay; merging copies it back.
+    os.unlink(os.path.join(view.root, "data.bin"))
+    write(os.path.join(view.root, "data.bin"), "z\n")
+    assert OverlayStore(env).get("bounded").merge().copied == ["data.bin"]
+    assert read(os.path.join(base, "data.bin")) == "z\n"
+
+    small = OverlayStore(env, max_total_bytes=100)
+    try:
+        small.create("huge", base)
+        raise AssertionError("expected OverlayTooLarge")
+    except OverlayTooLarge:
+        pass
+    assert small.too_large == {"huge"} and not os.path.exists(os.path.join(small.overlays_dir, "huge"))
+    assert not os.path.exists(small.objects_dir)
+    print("✅ ignored directories and large files are shared, and an oversized tree is refused")
+
+
+def test_create_cost(env: str):
+    base = os.path.join(env, "many")
+    for i in range(2000):
+        write(os.path.join(base, f"pkg{i % 20}", f"mod{i}.py"), BASE)
+    store = OverlayStore(env)
+    start = time.perf_counter()
+    view = store.create("many", base)
+    elapsed = time.perf_counter() - start
+    stored = sum(os.path.getsize(os.path.join(d, f)) for d, _, names in os.walk(store.objects_dir) for f in names)
+    print(f"   create: 2000 files ({2000 * len(BASE) // 1024} KB) in {elapsed * 1e3:.0f} ms "
+          f"→ {elapsed / 2000 * 1e6:.0f} µs/file, {stored} bytes of base objects")
+    # Identical files share one base object; each distinct file is stored once more.
+    assert len(view.files) == 2000 and stored == len(BASE)
+    store.discard(view)
+    print("✅ overlay creation clones every file but stores each distinct base once")
+
+
+async def scripted_llm(messages: list, system: str = "", model: str = "", tools: list | None = None, **kwargs) -> AgentResponse:
+    """The root spawns code agents; each reads shared.txt, rewrites its own section, then has it checked."""
+    task = messages[0].content.rsplit("\n", 1)[-1]
+    turn = sum(m.role == "assistant" for m in messages)
+    await asyncio.sleep(0.001)
+
+    def respond(text: str = "", *calls: tuple[str, dict]) -> AgentResponse:
+        tool_calls = [ToolCall(id=f"call_{turn}_{i}", name=name, input=inp) for i, (name, inp) in enumerate(calls)]
+        return AgentResponse(text, tool_calls, "tool_use" if tool_calls else "end_turn", 0, 0)
+
+    kind, _, i = task.partition(" ")
+    if kind == "root" and turn == 0:
+        return respond("", *[("spawn_subagent", {"task": f"section {i}", "agent_type": "code"}) for i in range(AGENTS)])
+    if kind == "section" and turn == 0:
+        return respond("", ("read_file", {"path": "shared.txt"}))
+    if kind == "section" and turn == 1:
+        await asyncio.sleep(0.05)  # every sibling has read the file by now
+        content = messages[-1].content[0]["content"].replace(f"section {i}: todo", f"section {i}: done")
+        return respond("", ("write_file", {"path": "shared.txt", "content": content}),
+                       ("write_file", {"path": f"notes_{i}.txt", "content": f"notes from {i}\n"}))
+    if kind == "section" and turn == 2:
+        return respond("", ("spawn_subagent", {"task": f"check {i}", "agent_type": "test"}))
+    if kind == "check" and turn == 0:
+        return respond("", ("run_shell", {"command": f"cat notes_{i}.txt"}))
+    if kind == "check":
+        return respond(f"<MESSAGE>{messages[-1].content[0]['content']}</MESSAGE>")
+    return respond("<MESSAGE>done</MESSAGE>")
+
+
+async def run_siblings(env: str) -> DecompositionTree:
+    write(os.path.join(env, "shared.txt"), SHARED)
+    tree = DecompositionTree()
+    neo = Neo(tree, env_directory=env)
+    with patch("sauce.llm.call_llm_async", new=scripted_llm):
+        neo.prompt("root")
+        await neo.run()
+    return tree
+
+
+def write_results(tree: DecompositionTree) -> list[str]:
+    return [
+        block["content"]
+        for node in tree.nodes.values() if node.node_type == NodeType.CODE
+        for message in node.conversation.messages if message.role == "user" and isinstance(message.content, list)
+        for block in message.content if block.get("type") == "tool_result" and "shared.txt" in block["content"]
+    ]
+
+
+def test_siblings_stop_conflicting():
+    code = NODE_CONFIG[NodeType.CODE]
+    # The baseline also turns off write_file's own merging, to measure overlays alone.
+    with tempfile.TemporaryDirectory() as env, \
+            patch.dict(NODE_CONFIG, {NodeType.CODE: dataclasses.replace(code, overlay=False)}), \
+            patch.object(workspace, "default_bases", BaseStore(max_bytes=0)):
+        tree = asyncio.run(run_siblings(env))
+        shared_conflicts = sum(r.startswith("CONFLICT") for r in write_results(tree))
+
+    with tempfile.TemporaryDirectory() as env:
+        tree = asyncio.run(run_siblings(env))
+        results = write_results(tree)
+        assert len(results) == AGENTS and all(r.startswith("Wrote") for r in results), results
+        assert read(os.path.join(env, "shared.txt")) == SHARED.replace(": todo", ": done")
+        assert all(os.path.exists(os.path.join(env, f"notes_{i}.txt")) for i in range(AGENTS))
+        checks = [n for n in tree.nodes.values() if n.node_type == NodeType.TEST]
+        # Test agents ran in their parent's overlay, before it was merged.
+        assert sorted(n.conversation.messages[-2].content[0]["content"] for n in checks) == \
+            sorted(f"notes from {i}\n" for i in range(AGENTS))
+        assert os.listdir(os.path.join(env, ".neo", "overlays")) == []
+
+    print(f"   {AGENTS} siblings rewriting one file: {shared_conflicts} CONFLICT retries shared → 0 with overlays")
+    assert shared_conflicts >= AGENTS // 2
+    print("✅ sibling code agents no longer stall on each other's writes")
+
+
+async def failing_llm(messages: list, system: str = "", model: str = "", tools: list | None = None, **kwargs) -> AgentResponse:
+    """The root spawns one code agent, which writes a file and then fails."""
+    task = messages[0].content.rsplit("\n", 1)[-1]
+    turn = sum(m.role == "assistant" for m in messages)
+    if task == "root" and turn == 0:
+        return AgentResponse("", [ToolCall("call_0", "spawn_subagent", {"task": "half", "agent_type": "code"})], "tool_use", 0, 0)
+    if task == "half" and turn == 0:
+        return AgentResponse("", [ToolCall("call_1", "write_file", {"path": "half.txt", "content": "half\n"})], "tool_use", 0, 0)
+    if task == "half":
+        raise ConnectionError("API unavailable")
+    return AgentResponse("<MESSAGE>done</MESSAGE>", [], "end_turn", 0, 0)
+
+
+async def run_failing(env: str) -> DecompositionTree:
+    tree = DecompositionTree()
+    neo = Neo(tree, env_directory=env)
+    with patch("sauce.llm.call_llm_async", new=failing_llm):
+        neo.prompt("root")
+        await neo.run()
+    return tree
+
+
+def test_failed_agent_is_not_merged():
+    with tempfile.TemporaryDirectory() as env:
+        tree = asyncio.run(run_failing(env))
+        assert not os.path.exists(os.path.join(env, "half.txt"))
+        assert os.listdir(os.path.join(env, ".neo", "overlays")) == []
+        assert tree.root.conversation.messages[2].content[0]["content"] == "Error: code agent failed: API unavailable"
+    print("✅ a failed agent's overlay is discarded, not merged")
+
+
+def test_merge_error_is_reported():
+    def broken(self):
+        raise OSError(28, "No space left on device")
+
+    async def run(env: str) -> DecompositionTree:
+        tree = DecompositionTree()
+        neo = Neo(tree, env_directory=env)
+        with patch("sauce.llm.call_llm_async", new=scripted_llm), patch.object(Overlay, "merge", broken), \
+                patch("sauce.tests.overlay.AGENTS", 1):
+            neo.prompt("root")
+            await neo.run()
+        return tree
+
+    with tempfile.TemporaryDirectory() as env:
+        write(os.path.join(env, "shared.txt"), SHARED)
+        tree = asyncio.run(run(env))
+        result = tree.root.conversation.messages[2].content[0]["content"]
+        assert "could not merge this agent's changes back" in result and "No space left" in result, result
+        assert tree.is_done()
+    print("✅ a merge that fails with OSError is reported to the parent instead of stopping the run")
+
+
+def main():
+    test_merge3()
+    with tempfile.TemporaryDirectory() as env:
+        test_overlay_isolates_and_merges(env)
+        test_conflicts_keep_the_shared_version(env)
+        test_overlay_reattaches_after_restart(env)
+        test_directory_resolved_once_per_node(env)
+        test_create_bounds_large_and_ignored_trees(env)
+        test_create_cost(env)
+    test_failed_agent_is_not_merged()
+    test_merge_error_is_reported()
+    test_siblings_stop_conflicting()
+    print("\n✅ All overlay tests passed!\n")
+
+
+if __name__ == "__main__":
+    main()
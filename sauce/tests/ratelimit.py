@@ -0,0 +1,168 @@
+"""
+Tests for per-model rate limits.
+
+Checks that limits can be overridden from JSON, a JSON file or
+NEO_RATE_LIMITS, that input and output tokens draw on separate budgets, and
+that each response's usage settles the up-front charge: cache reads are
+refunded, cache writes are charged and output is charged as produced. The
+input estimate counts the tool schemas sent with every request. Against the
+local fake Messages API, checks that a 429 halves concurrency and pauses the
+model for its retry-after, that concurrency then recovers additively, and
+that one model's throttling leaves another model's requests alone.
+
+Run with: python -m sauce.tests.ratelimit
+"""
+
+import os
+import json
+import time
+import asyncio
+import tempfile
+from unittest.mock import patch
+
+import sauce.llm as llm
+import sauce.ratelimit as ratelimit
+from sauce.backend import AnthropicBackend
+from sauce.fake_anthropic import FakeAnthropicServer, FakeConfig
+from sauce.llm import _request_kwargs
+from sauce.models import AgentResponse, UserMessage
+from sauce.node import NodeType, TOOLS_FOR_NODE
+from sauce.ratelimit import LimiterPool, ModelLimiter, ModelLimits
+
+
+MODEL = "claude-sonnet-4-6"
+OTHER = "claude-haiku-4-5"
+RETRY_AFTER = 0.5
+# Budgets high enough that only concurrency and throttling shape the fake-server tests.
+OPEN = ModelLimits(8, 100_000, 10**9, 10**9)
+
+
+def usage(input_tokens: int, output_tokens: int, cache_read: int = 0, cache_write: int = 0) -> AgentResponse:
+    return AgentResponse("", [], "end_turn", input_tokens, output_tokens, cache_read, cache_write)
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+def test_limits_are_configurable():
+    limits = ratelimit.load_limits('{"claude-sonnet-4-6": {"input_tokens_per_minute": 400000}, "other": {"requests_per_minute": 5}}')
+    assert limits[MODEL].input_tokens_per_minute == 400_000
+    assert limits[MODEL].output_tokens_per_minute == ratelimit.MODEL_LIMITS[MODEL].output_tokens_per_minute
+    assert limits["other"].requests_per_minute == 5 and limits["other"].max_concurrency == ratelimit.DEFAULT_LIMITS.max_concurrency
+    assert ratelimit.MODEL_LIMITS[MODEL].input_tokens_per_minute != 400_000
+
+    with tempfile.NamedTemporaryFile("w", suffix=".json") as f:
+        json.dump({MODEL: {"output_tokens_per_minute": 90_000}}, f)
+        f.flush()
+        assert ratelimit.load_limits(f.name)[MODEL].output_tokens_per_minute == 90_000
+        with patch.dict(os.environ, {"NEO_RATE_LIMITS": f.name}):
+            assert LimiterPool(max_concurrency=3).get(MODEL).limits == \
+                ModelLimits(3, 50, ratelimit.MODEL_LIMITS[MODEL].input_tokens_per_minute, 90_000)
+    print("✅ limits can be set per model from JSON, a file or NEO_RATE_LIMITS")
+
+
+async def test_usage_settles_the_charge():
+    limiter = ModelLimiter(MODEL, ModelLimits(10, 1000, input_tokens_per_minute=60_000, output_tokens_per_minute=6_000))
+    async with limiter.slot(20_000):
+        pass
+    assert 39_990 < limiter.input_tokens.tokens < 40_100
+    assert 5_490 < limiter.output_tokens.tokens < 5_600  # the expected output was charged
+
+    # 18k of the prompt was a cache read, 1k a cache write: only 2k + 1k count against input.
+    limiter.on_success(20_000, usage(2_000, 3_000, cache_read=18_000, cache_write=1_000))
+    assert 56_990 < limiter.input_tokens.tokens < 57_100, limiter.input_tokens.tokens
+    assert 2_990 < limiter.output_tokens.tokens < 3_100, limiter.output_tokens.tokens
+    assert limiter.expected_output == 500 + 0.2 * (3_000 - 500)
+    print("✅ input and output budgets are separate and settled against usage, cache reads refunded")
+
+
+async def test_output_budget_throttles_on_its_own():
+    limiter = ModelLimiter(MODEL, ModelLimits(10, 1000, input_tokens_per_minute=1_000_000, output_tokens_per_minute=600))
+    limiter.expected_output = 600
+    async with limiter.slot(10):
+        pass
+    limiter.on_success(10, usage(10, 600))
+    try:
+        async with asyncio.timeout(0.2):
+            async with limiter.slot(10):
+                raise AssertionError("admitted with no output budget left")
+    except TimeoutError:
+        pass
+    print("✅ an exhausted output budget holds requests even when input budget is plentiful")
+
+
+def test_estimate_counts_tool_schemas():
+    bare = _request_kwargs([UserMessage("task")], "system", MODEL, None)
+    with_tools = _request_kwargs([UserMessage("task")], "system", MODEL, TOOLS_FOR_NODE[NodeType.CODE])
+    schemas = sum(len(str(t)) for t in with_tools["tools"]) // 4
+    assert ratelimit.estimate_tokens(with_tools) - ratelimit.estimate_tokens(bare) >= schemas - 1 > 100
+    print(f"✅ the input estimate includes the tool schemas (~{schemas} tokens for a code agent)")
+
+
+async def call(limiter: ModelLimiter) -> float:
+    """One request through the limiter; returns how long it took."""
+    start = time.perf_counter()
+    await llm.call_llm_async([UserMessage("hi")], model=limiter.model, limiter=limiter)
+    return time.perf_counter() - start
+
+
+async def test_throttle_backs_off_and_recovers(server: FakeAnthropicServer):
+    limiter = ModelLimiter(MODEL, OPEN)
+    server.stats.requests = 0
+    server.enqueue(429)
+    elapsed = await call(limiter)
+    assert server.stats.requests == 2 and elapsed >= RETRY_AFTER, (server.stats.requests, elapsed)
+    # Paused for the server's retry-after, not the 1s default backoff of a first retry.
+    assert abs(limiter.paused_until - limiter.last_decrease - RETRY_AFTER) < 1e-6
+    assert limiter.limit == 4 + 1 / 4  # halved, then one success
+
+    limits = [limiter.limit]
+    for _ in range(40):
+        await call(limiter)
+        limits.append(limiter.limit)
+    steps = [b - a for a, b in zip(limits, limits[1:]) if b > a]
+    assert all(step <= 1 / 4 for step in steps) and limits[4] < 5.5  # additive, not multiplicative
+    assert limits[-1] == OPEN.max_concurrency
+    print(f"✅ a 429 halves concurrency 8 → 4 and waits out retry-after ({elapsed:.2f}s); "
+          f"it grows back to 8 over {sum(limit < 8 for limit in limits)} successful calls")
+
+
+def test_burst_of_throttles_halves_once():
+    limiter = ModelLimiter(MODEL, OPEN)
+    for attempt in range(4):
+        limiter.on_throttle(RETRY_AFTER, attempt)
+    assert limiter.limit == 4
+    assert limiter.paused_until - time.monotonic() > RETRY_AFTER - 0.1
+    print("✅ in-flight requests throttled together halve concurrency once")
+
+
+async def test_throttled_model_does_not_block_another(server: FakeAnthropicServer):
+    pool = LimiterPool(limits={MODEL: OPEN, OTHER: OPEN})
+    server.enqueue(429)
+    throttled = asyncio.create_task(call(pool.get(MODEL)))
+    while pool.get(MODEL).paused_until == 0:  # until the 429 has come back
+        await asyncio.sleep(0.01)
+    other = await call(pool.get(OTHER))
+    assert other < RETRY_AFTER / 2 and pool.get(OTHER).limit == OPEN.max_concurrency, other
+    assert await throttled >= RETRY_AFTER
+    print(f"✅ while one model waits out a 429, another model's request goes straight through ({other * 1e3:.0f} ms)")
+
+
+async def throttling_tests():
+    with FakeAnthropicServer(FakeConfig(retry_after=RETRY_AFTER)) as server, \
+            patch.object(llm, "backend", AnthropicBackend(base_url=server.url, api_key="test")):
+        await test_throttle_backs_off_and_recovers(server)
+        await test_throttled_model_does_not_block_another(server)
+
+
+def main():
+    test_limits_are_configurable()
+    test_estimate_counts_tool_schemas()
+    asyncio.run(test_usage_settles_the_charge())
+    asyncio.run(test_output_budget_throttles_on_its_own())
+    test_burst_of_throttles_halves_once()
+    asyncio.run(throttling_tests())
+    print("\n✅ All rate limit tests passed!\n")
+
+
+if __name__ == "__main__":
+    main()
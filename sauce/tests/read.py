@@ -0,0 +1,127 @@
+"""
+Tests for ranged, size-capped read_file.
+
+Checks small files still come back whole, large ones as a header plus a
+window that pages through the file with offset/limit, that a huge minified
+bundle is read through mmap without loading it, and that partial reads
+still record the file's version for conflict checks.
+
+Run with: python -m sauce.tests.read
+"""
+
+import os
+import re
+import hashlib
+import tempfile
+import tracemalloc
+from unittest.mock import patch
+
+import sauce.tools as tools
+import sauce.workspace as workspace
+from sauce.models import Conversation
+from sauce.node import Node, NodeType
+from sauce.tree import DecompositionTree
+from sauce.workspace import FileCache
+
+
+SOURCE = "".join(f"line {i}: const value{i} = compute({i}); // ünïcode\n" for i in range(1, 5001))
+BUNDLE = "!function(){" + "var a=1;" * 400_000 + "}();"
+
+
+def agents() -> DecompositionTree:
+    tree = DecompositionTree()
+    tree.set_root(Node("root", NodeType.THINKING, Conversation()))
+    tree.add_node(Node("reader", NodeType.CODE, Conversation(), parent_id="root"))
+    tree.add_node(Node("writer", NodeType.CODE, Conversation(), parent_id="root"))
+    return tree
+
+
+def header_and_body(result: str) -> tuple[str, str]:
+    header, _, body = result.partition("\n")
+    assert header.startswith("[") and header.endswith("]"), header
+    return header, body
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+def test_small_files_come_back_whole(directory: str):
+    with open(os.path.join(directory, "small.py"), "w") as f:
+        f.write("print('hi')\n")
+    assert tools._read_file("small.py", working_directory=directory) == "print('hi')\n"
+    print("✅ files under max_bytes are returned whole, with no header")
+
+
+def test_paging_reconstructs_the_file(directory: str):
+    with open(os.path.join(directory, "source.js"), "w") as f:
+        f.write(SOURCE)
+
+    header, body = header_and_body(tools._read_file("source.js", working_directory=directory, offset=10, limit=3))
+    assert body == "".join(SOURCE.splitlines(keepends=True)[9:12])
+    assert "lines 10-12" in header and "offset=13" in header, header
+
+    pages, offset = [], 1
+    while offset:
+        header, body = header_and_body(tools._read_file("source.js", working_directory=directory, offset=offset, max_bytes=7_000))
+        assert len(body.encode()) <= 7_000
+        pages.append(body if "cut at" not in header else body[:body.rfind("\n") + 1])
+        match = re.search(r"offset=(\d+)", header)
+        offset = int(match.group(1)) if match else None
+    assert "".join(pages) == SOURCE
+    assert "past the last line" in tools._read_file("source.js", working_directory=directory, offset=6000)
+    assert tools._read_file("source.js", working_directory=directory, limit=0).startswith("Error:")
+    print(f"✅ {len(pages)} pages of offset/limit windows reassemble a {len(SOURCE.encode()) / 1e3:.0f} KB file exactly")
+
+
+def test_cut_never_splits_a_character(directory: str):
+    path = os.path.join(directory, "wide.txt")
+    with open(path, "w") as f:
+        f.write("é" * 10_000)
+    for max_bytes in (999, 1000, 1001):
+        _, body = header_and_body(tools._read_file("wide.txt", working_directory=directory, max_bytes=max_bytes))
+        assert set(body) == {"é"} and len(body.encode()) <= max_bytes
+    print("✅ a byte cap inside a multi-byte character backs off to the last whole character")
+
+
+def test_bundle_is_read_through_mmap(directory: str):
+    with open(os.path.join(directory, "bundle.min.js"), "w") as f:
+        f.write(BUNDLE)
+    tracemalloc.start()
+    result = tools._read_file("bundle.min.js", working_directory=directory)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    header, body = header_and_body(result)
+    assert body == BUNDLE[:tools.READ_MAX_BYTES]
+    assert f"{len(BUNDLE)} bytes" in header and "raise max_bytes" in header, header
+    print(f"   {len(BUNDLE) / 1e6:.1f} MB one-line bundle: {len(result) / 1e3:.0f} KB returned, {peak / 1e6:.2f} MB peak allocation")
+    assert peak < len(BUNDLE) / 10
+    print("✅ a minified bundle comes back as a header and a capped window without being loaded")
+
+
+def test_partial_reads_track_versions(directory: str):
+    tree = agents()
+    path = os.path.join(directory, "source.js")
+    tools._read_file("source.js", tree, "reader", directory, offset=100, limit=5)
+    with open(path, "rb") as f:
+        assert tree.nodes["reader"].file_versions[path] == hashlib.sha256(f.read()).hexdigest()
+
+    target = "line 102: const value102 = compute(102);"
+    assert tools._edit_file("source.js", [{"old_string": target, "new_string": target + " // ok"}], tree, "reader", directory).startswith("Applied")
+    tools._read_file("source.js", tree, "writer", directory, offset=1, limit=1)
+    assert tools._edit_file("source.js", [{"old_string": "line 1: ", "new_string": "line one: "}], tree, "writer", directory).startswith("Applied")
+    assert tools._write_file("source.js", "clobbered", tree, "reader", directory).startswith("CONFLICT")
+    print("✅ partial reads record the whole file's version, so stale writes still conflict")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory, patch.object(workspace, "default_cache", FileCache()):
+        test_small_files_come_back_whole(directory)
+        test_paging_reconstructs_the_file(directory)
+        test_cut_never_splits_a_character(directory)
+        test_bundle_is_read_through_mmap(directory)
+        test_partial_reads_track_versions(directory)
+    print("\n✅ All read tests passed!\n")
+
+
+if __name__ == "__main__":
+    main()
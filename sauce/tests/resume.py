@@ -0,0 +1,145 @@
+"""
+Tests for resuming an interrupted run.
+
+Runs a scripted tree against the local fake Messages API with a journal,
+copies the journal mid-run (as a kill -9 would leave it), rebuilds the tree
+from the copy and resumes it with a fresh Neo. Also checks that starting a
+new run over a journal that holds a tree keeps that tree resumable.
+
+Run with: python -m sauce.tests.resume
+"""
+
+import os
+import shutil
+import asyncio
+import tempfile
+from unittest.mock import patch
+
+import sauce.llm as llm
+import sauce.journal as journal
+from sauce.backend import AnthropicBackend
+from sauce.fake_anthropic import FakeAnthropicServer, FakeConfig, TreeScript, uniform
+from sauce.models import Message, UserMessage, Conversation
+from sauce.neo import Neo
+from sauce.node import Node, NodeState, NodeType
+from sauce.tree import DecompositionTree
+
+
+CRASH_AFTER_COMPLETED = 3
+
+
+def tool_use(tool_id: str, name: str = "run_shell") -> dict:
+    return {"type": "tool_use", "id": tool_id, "name": name, "input": {}}
+
+
+def tool_result(tool_id: str) -> Message:
+    return Message(role="user", content=[{"type": "tool_result", "tool_use_id": tool_id, "content": "ok"}])
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+def test_recover_drops_dangling_tool_uses():
+    tree = DecompositionTree()
+    parent = Node("p", NodeType.THINKING, Conversation("", [
+        UserMessage("task"),
+        Message(role="assistant", content=[tool_use("a"), tool_use("spawn", "spawn_subagent"), tool_use("b")]),
+        tool_result("a"),
+    ]), state=NodeState.RUNNING, for_vis=["c"], children_ids=["c"])
+    child = Node("c", NodeType.CODE, Conversation("", [
+        UserMessage("subtask"),
+        Message(role="assistant", content=[{"type": "text", "text": "checking"}, tool_use("x")]),
+    ]), tool_id="spawn", parent_id="p", state=NodeState.RUNNING)
+    tree.set_root(parent)
+    tree.add_node(child)
+
+    reset = tree.recover()
+
+    # The parent keeps waiting on its child; only the unanswered, childless tool_use goes.
+    assert parent.state == NodeState.RUNNING and parent.active_children == {"c"}
+    assert [b["id"] for b in parent.conversation.messages[1].content] == ["a", "spawn"]
+    # The child's half-finished turn is dropped and it runs again.
+    assert child.state == NodeState.READY and reset == [child]
+    assert [m.role for m in child.conversation.messages] == ["user"]
+    print("✅ recover() keeps pending spawns, drops dangling tool calls and re-readies cut-off turns")
+
+
+async def test_resume_finishes_only_unfinished_work(server: FakeAnthropicServer):
+    backend = AnthropicBackend(base_url=server.url, api_key="test")
+    with tempfile.TemporaryDirectory() as env_dir, tempfile.TemporaryDirectory() as directory, \
+            tempfile.TemporaryDirectory() as crashed, patch.object(llm, "backend", backend):
+        # First run: stop dead partway through, keeping the journal exactly as it was.
+        tree = DecompositionTree()
+        recorder = journal.Journal(directory)
+        recorder.attach(tree)
+        neo = Neo(tree, env_directory=env_dir)
+        neo.prompt("resume test")
+        run = asyncio.create_task(neo.run())
+        while tree.state_counts[NodeState.COMPLETED] < CRASH_AFTER_COMPLETED:
+            await asyncio.sleep(0.01)
+        shutil.copytree(directory, crashed, dirs_exist_ok=True)
+        for task in [run, *neo.pending]:
+            task.cancel()
+        await asyncio.gather(run, *neo.pending, return_exceptions=True)
+        recorder.close()
+
+        restored = DecompositionTree.load_state(journal.load(crashed))
+        done_before = {
+            node_id: node.conversation.to_list()
+            for node_id, node in restored.nodes.items() if node.state == NodeState.COMPLETED
+        }
+        assert restored.root.state != NodeState.COMPLETED and done_before
+
+        before = server.stats.requests
+        resumed = Neo(restored, env_directory=env_dir)
+        resumed.resume(restored)
+        await asyncio.wait_for(resumed.run(), timeout=30)
+        extra = server.stats.requests - before
+
+    assert restored.root.state == NodeState.COMPLETED
+    assert all(n.state == NodeState.COMPLETED for n in restored.nodes.values())
+    for node_id, messages in done_before.items():
+        assert restored.nodes[node_id].conversation.to_list() == messages
+    print(f"✅ resumed run finished with {extra} more requests, {len(done_before)} completed nodes untouched")
+    return extra
+
+
+def test_fresh_start_keeps_resumable_journal():
+    with tempfile.TemporaryDirectory() as parent:
+        directory = os.path.join(parent, "journal")
+        # A run that was killed: its journal holds a tree.
+        crashed = DecompositionTree()
+        recorder = journal.Journal(directory)
+        recorder.attach(crashed)
+        root = Node("r", NodeType.THINKING, Conversation("", [UserMessage("first task")]))
+        crashed.set_root(root)
+        crashed.append_message(root, Message(role="assistant", content="working on it"))
+        recorder.close()
+        expected = journal.load(directory)
+
+        # A new run starts over the same directory, as main.py does without --resume.
+        kept = journal.set_aside(directory)
+        fresh = DecompositionTree()
+        journal.Journal(directory).attach(fresh)
+        fresh.set_root(Node("s", NodeType.THINKING, Conversation("", [UserMessage("second task")])))
+
+        assert kept is not None and journal.load(kept) == expected
+        assert journal.load(directory)["root"]["node_id"] == "s"
+        # A journal with no tree in it (a launch that never got a task) is simply reused.
+        empty = os.path.join(parent, "empty")
+        journal.Journal(empty).attach(DecompositionTree())
+        assert journal.set_aside(empty) is None and os.path.isdir(empty)
+        assert sorted(os.listdir(parent)) == sorted(["empty", "journal", os.path.basename(kept)])
+    print("✅ a fresh start moves an earlier run's journal aside instead of overwriting it")
+
+
+async def main():
+    test_recover_drops_dangling_tool_uses()
+    test_fresh_start_keeps_resumable_journal()
+    config = FakeConfig(latency=uniform(0.01, 0.15), script=TreeScript(depth=2, fanout=3, tool_calls=2), seed=3)
+    with FakeAnthropicServer(config) as server:
+        await test_resume_finishes_only_unfinished_work(server)
+    print("\n✅ All resume tests passed!\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
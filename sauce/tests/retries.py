@@ -0,0 +1,194 @@
+"""
+Tests for LLM call retries, deadlines, stream idle timeouts and hedging.
+
+Runs the local fake Messages API (sauce.fake_anthropic) with queued latencies
+and error responses, and points the LLM backend at it.
+
+Run with: python -m sauce.tests.retries
+"""
+
+import time
+import asyncio
+import tempfile
+from unittest.mock import patch
+
+import anthropic
+
+import sauce.llm as llm
+from sauce.backend import AnthropicBackend
+from sauce.fake_anthropic import FakeAnthropicServer, FakeConfig
+from sauce.models import UserMessage
+from sauce.neo import Neo
+from sauce.node import NodeState
+from sauce.ratelimit import LimiterPool, ModelLimiter, ModelLimits
+from sauce.retry import RetryPolicy
+from sauce.tree import DecompositionTree
+
+
+MODEL = "claude-haiku-4-5"
+
+
+def fake_backend(server: FakeAnthropicServer) -> AnthropicBackend:
+    return AnthropicBackend(base_url=server.url, api_key="test")
+
+
+async def call(server: FakeAnthropicServer, policy: RetryPolicy):
+    llm.latency_trackers.clear()
+    with patch.object(llm, "backend", fake_backend(server)):
+        return await llm.call_llm_async(
+            [UserMessage("hi")], model=MODEL, limiter=LimiterPool().get(MODEL), policy=policy
+        )
+
+
+async def stream(server: FakeAnthropicServer, policy: RetryPolicy, system: str = ""):
+    llm.latency_trackers.clear()
+    with patch.object(llm, "backend", fake_backend(server)):
+        return await llm.call_llm_async(
+            [UserMessage("hi")], system=system, model=MODEL, limiter=LimiterPool().get(MODEL), policy=policy,
+            on_tool_use=lambda tool_call: None,
+        )
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+async def test_retries_transient_errors(server: FakeAnthropicServer):
+    server.stats.requests = 0
+    for status in (500, 529, 503, 200):
+        server.enqueue(status)
+    result = await call(server, RetryPolicy(base_delay=0.01))
+    assert result.stop_reason == "end_turn"
+    assert server.stats.requests == 4, server.stats.requests
+    print("✅ transient 5xx/529 errors are retried")
+
+
+async def test_stuck_request_times_out(server: FakeAnthropicServer):
+    server.stats.requests = 0
+    server.enqueue(200, 3.0)
+    server.enqueue(200)
+    start = time.perf_counter()
+    await call(server, RetryPolicy(timeout=0.3, base_delay=0.01))
+    elapsed = time.perf_counter() - start
+    assert elapsed < 1.5, elapsed
+    assert server.stats.requests == 2, server.stats.requests
+    print(f"✅ stuck request abandoned after its deadline ({elapsed:.2f}s)")
+
+
+async def test_deadline_bounds_all_retries(server: FakeAnthropicServer):
+    server.stats.requests = 0
+    for _ in range(10):
+        server.enqueue(200, 3.0)
+    start = time.perf_counter()
+    try:
+        await call(server, RetryPolicy(timeout=0.2, deadline=0.7, base_delay=0.01))
+        raise AssertionError("expected a timeout")
+    except asyncio.TimeoutError:
+        pass
+    elapsed = time.perf_counter() - start
+    assert elapsed < 1.5, elapsed
+    server.queued.clear()
+    print(f"✅ overall deadline stops retrying ({elapsed:.2f}s)")
+
+
+async def test_long_stream_is_not_cut_off(server: FakeAnthropicServer):
+    server.stats.requests = 0
+    server.enqueue(200, 1.2)  # four content blocks, 0.3s apart
+    start = time.perf_counter()
+    result = await stream(server, RetryPolicy(timeout=0.5, stream_idle_timeout=0.5, base_delay=0.01),
+                          system="You are a thinking agent.")
+    elapsed = time.perf_counter() - start
+    assert len(result.tool_calls) == 3 and server.stats.requests == 1, server.stats.requests
+    assert elapsed >= 1.2, elapsed
+    print(f"✅ a stream that keeps producing events runs past the idle timeout ({elapsed:.2f}s)")
+
+
+async def test_stalled_stream_times_out(server: FakeAnthropicServer):
+    server.stats.requests = 0
+    server.enqueue(200, 3.0)
+    server.enqueue(200)
+    start = time.perf_counter()
+    result = await stream(server, RetryPolicy(stream_idle_timeout=0.3, base_delay=0.01))
+    elapsed = time.perf_counter() - start
+    assert result.stop_reason == "end_turn" and server.stats.requests == 2, server.stats.requests
+    assert elapsed < 1.5, elapsed
+    print(f"✅ a stream that goes quiet is abandoned and retried ({elapsed:.2f}s)")
+
+
+async def test_hedging_cuts_tail_latency(server: FakeAnthropicServer):
+    server.stats.requests = 0
+    server.enqueue(200, 3.0)
+    server.enqueue(200, 0.05)
+    policy = RetryPolicy(hedge_percentile=0.95, hedge_min_samples=20)
+    llm.latency_trackers.clear()
+    tracker = llm.latency_trackers.setdefault(MODEL, llm.retry.LatencyTracker())
+    for _ in range(20):
+        tracker.record(0.1)
+
+    # Six requests a minute: the bucket barely refills during the test, so each charge shows.
+    limiter = ModelLimiter(MODEL, ModelLimits(10, 6, 10**6, 10**6))
+    start = time.perf_counter()
+    with patch.object(llm, "backend", fake_backend(server)):
+        await llm.call_llm_async([UserMessage("hi")], model=MODEL, limiter=limiter, policy=policy)
+    elapsed = time.perf_counter() - start
+    assert elapsed < 1.0, elapsed
+    assert server.stats.requests == 2, server.stats.requests
+    await asyncio.sleep(0.05)  # the cancelled request's slot is freed by its done callback
+    assert limiter.in_flight == 0
+    assert limiter.requests.capacity - limiter.requests.tokens > 1.9  # both requests were charged
+    print(f"✅ slow request hedged after p95, answered in {elapsed:.2f}s, the duplicate charged to the limiter")
+
+
+async def test_hedge_needs_a_free_slot(server: FakeAnthropicServer):
+    server.stats.requests = 0
+    server.enqueue(200, 0.6)
+    policy = RetryPolicy(hedge_percentile=0.95, hedge_min_samples=20)
+    llm.latency_trackers.clear()
+    tracker = llm.latency_trackers.setdefault(MODEL, llm.retry.LatencyTracker())
+    for _ in range(20):
+        tracker.record(0.1)
+
+    limiter = LimiterPool(max_concurrency=1).get(MODEL)
+    with patch.object(llm, "backend", fake_backend(server)):
+        await llm.call_llm_async([UserMessage("hi")], model=MODEL, limiter=limiter, policy=policy)
+    assert server.stats.requests == 1, server.stats.requests
+    print("✅ no duplicate is sent when the limiter has no slot free for it")
+
+
+async def test_non_retryable_error_raises(server: FakeAnthropicServer):
+    server.stats.requests = 0
+    server.enqueue(400)
+    try:
+        await call(server, RetryPolicy(base_delay=0.01))
+        raise AssertionError("expected BadRequestError")
+    except anthropic.BadRequestError:
+        pass
+    assert server.stats.requests == 1, server.stats.requests
+    print("✅ 400 errors are not retried")
+
+
+async def test_failed_node_does_not_kill_run(server: FakeAnthropicServer):
+    server.enqueue(400)
+    with tempfile.TemporaryDirectory() as env_dir, patch.object(llm, "backend", fake_backend(server)):
+        tree = DecompositionTree()
+        neo = Neo(tree, env_directory=env_dir)
+        root = neo.prompt("do something")
+        await asyncio.wait_for(neo.run(), timeout=5)
+    assert root.state == NodeState.FAILED
+    print("✅ exhausted LLM call fails the node, not the run")
+
+
+async def main():
+    with FakeAnthropicServer(FakeConfig(retry_after=0.0)) as server:
+        await test_retries_transient_errors(server)
+        await test_stuck_request_times_out(server)
+        await test_deadline_bounds_all_retries(server)
+        await test_long_stream_is_not_cut_off(server)
+        await test_stalled_stream_times_out(server)
+        await test_hedging_cuts_tail_latency(server)
+        await test_hedge_needs_a_free_slot(server)
+        await test_non_retryable_error_raises(server)
+        await test_failed_node_does_not_kill_run(server)
+    print("\n✅ All retry tests passed!\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
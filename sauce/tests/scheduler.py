@@ -0,0 +1,99 @@
+"""
+Benchmark for Neo's scheduler overhead.
+
+Builds a ~10k node tree (root → 100 thinking → 99 code each) with an LLM mock
+that answers after a tiny jittered delay, so the measured time is dominated by
+scheduling: ready-queue handling, state transitions and child→parent handoffs.
+
+Run with: python -m sauce.tests.scheduler
+"""
+
+import asyncio
+import random
+import tempfile
+import time
+from unittest.mock import patch
+
+from sauce.neo import Neo
+from sauce.node import NodeState
+from sauce.tree import DecompositionTree
+from sauce.models import AgentResponse, ToolCall
+
+
+FANOUT = 100
+LEAVES = 99
+LATENCY = 0.002  # seconds; spreads completions out so the run loop wakes once per node
+
+# Stands in for the per-model limiter, which the mock bypasses.
+_api_slots = asyncio.Semaphore(10)
+
+
+def _response(text: str, tool_calls: list[ToolCall] | None = None) -> AgentResponse:
+    return AgentResponse(
+        text=text,
+        tool_calls=tool_calls or [],
+        stop_reason="tool_use" if tool_calls else "end_turn",
+        input_tokens=0,
+        output_tokens=0,
+    )
+
+
+async def instant_call_llm_async(messages: list, system: str = "", model: str = "", tools: list | None = None, **kwargs) -> AgentResponse:
+    """Thinking nodes spawn once and then finish; code nodes finish after a short jittered delay."""
+    async with _api_slots:
+        await asyncio.sleep(random.uniform(0, LATENCY))
+    task = messages[0].content
+    if len(messages) > 1 or task.endswith("leaf"):
+        return _response("<MESSAGE>done</MESSAGE>")
+
+    is_root = task.endswith("root")
+    count, agent_type = (FANOUT, "thinking") if is_root else (LEAVES, "code")
+    task = "branch" if is_root else "leaf"
+    return _response("", [
+        ToolCall(id=f"call_{i}", name="spawn_subagent", input={"task": task, "agent_type": agent_type})
+        for i in range(count)
+    ])
+
+
+class PollingNeo(Neo):
+    """The previous scheduler: sleep-polling plus full-tree scans every iteration."""
+
+    async def run(self):
+        self.schedule_ready()
+        while not all(n.state == NodeState.COMPLETED for n in self.tree.nodes.values()):
+            if not self.pending:
+                await asyncio.sleep(0.1)
+                continue
+            done, self.pending = await asyncio.wait(self.pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                self.on_node_complete(task.result())
+            self.schedule_ready()
+        return self.tree.root
+
+    def schedule_ready(self) -> None:
+        for node in self.tree.get_ready_nodes():
+            self.tree.set_state(node, NodeState.RUNNING)
+            self.pending.add(asyncio.create_task(self.execute_node(node)))
+
+
+async def bench(neo_cls: type[Neo]) -> tuple[int, float]:
+    with tempfile.TemporaryDirectory() as env_dir:
+        tree = DecompositionTree()
+        neo = neo_cls(tree, max_concurrent_tasks=10, env_directory=env_dir)
+        start = time.perf_counter()
+        neo.prompt("root")
+        await neo.run()
+        elapsed = time.perf_counter() - start
+        assert tree.is_done()
+        return len(tree.nodes), elapsed
+
+
+async def main():
+    with patch("sauce.llm.call_llm_async", new=instant_call_llm_async):
+        for label, neo_cls in (("event-driven", Neo), ("polling", PollingNeo)):
+            count, elapsed = await bench(neo_cls)
+            print(f"{label:>13}: {count} nodes in {elapsed:.2f}s → {elapsed / count * 1e6:.1f} µs/node")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
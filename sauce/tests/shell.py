@@ -0,0 +1,210 @@
+"""
+Tests for run_shell: bounded, streaming capture and persistent sessions.
+
+Checks short output is returned as before, a noisy command's output is kept
+as a head and tail with the full log spilled to a file the agent can page
+through with read_file, memory stays capped however much a command prints,
+and timeouts are configurable per node type and keep the partial output.
+Sessions keep shell state between a node's commands, frame each command's
+output with sentinels, recover from timeouts and `exit`, and are closed
+(with anything they spawned) when the node finishes.
+
+Run with: python -m sauce.tests.shell
+"""
+
+import os
+import re
+import time
+import asyncio
+import tempfile
+import tracemalloc
+from unittest.mock import patch
+
+import sauce.shell as shell
+import sauce.tools as tools
+from sauce.models import ToolCall
+from sauce.node import NodeType, NODE_CONFIG
+from sauce.shell import SessionPool, ShellConfig
+
+
+NOISY = "python3 -c \"import sys\nfor i in range(2_000_000): sys.stdout.write(f'progress {i:08d}\\n')\""
+
+
+def run(command: str, config: ShellConfig, directory: str = ".") -> str:
+    return asyncio.run(tools._run_shell(command, None, "shell-test", directory, config))
+
+
+def log_path(result: str) -> str:
+    match = re.search(r"full stdout in ([^\s;]+)", result)
+    assert match, result[:500]
+    return match.group(1)
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+def test_short_output_is_unchanged(log_dir: str):
+    config = ShellConfig(log_dir=log_dir)
+    assert run("echo hello", config) == "hello\n"
+    assert run("echo oops >&2; exit 3", config) == "\nstderr:\noops\n\nreturn code: 3"
+    assert run("true", config) == "(no output)"
+    assert not os.listdir(log_dir)
+    print("✅ output under head + tail is returned whole, with no log file")
+
+
+def test_noisy_command_is_capped_and_spilled(log_dir: str):
+    config = ShellConfig(log_dir=log_dir)
+    tracemalloc.start()
+    result = run(NOISY, config)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total = 2_000_000 * len("progress 00000000\n")
+    assert result.startswith("progress 00000000\n") and result.endswith("progress 01999999\n")
+    assert f"of {total}" in result
+    assert len(result) < config.head_bytes + config.tail_bytes + 500
+    path = log_path(result)
+    assert os.path.getsize(path) == total
+    print(f"   {total / 1e6:.0f} MB of output: {len(result) / 1e3:.0f} KB returned, {peak / 1e6:.2f} MB peak allocation")
+    assert peak < 2 * 1024 * 1024
+
+    page = tools._read_file(path, offset=1_000_001, limit=2)
+    assert page.endswith("progress 01000000\nprogress 01000001\n"), page
+    print("✅ a noisy command returns head and tail only, and the full log pages through read_file")
+
+
+def test_log_is_capped(log_dir: str):
+    config = ShellConfig(log_dir=log_dir, max_log_bytes=100_000)
+    result = run(NOISY, config)
+    assert "(first 100000 bytes)" in result and result.endswith("progress 01999999\n")
+    assert os.path.getsize(log_path(result)) == 100_000
+    print("✅ the spilled log stops at max_log_bytes while the tail keeps following the output")
+
+
+def test_timeout_keeps_partial_output(log_dir: str):
+    config = ShellConfig(timeout=0.5, log_dir=log_dir)
+    start = time.perf_counter()
+    result = run("echo started; sleep 30", config)
+    assert time.perf_counter() - start < 5
+    assert result == "Error: command timed out after 0.5 seconds\nstarted\n", result
+    assert NODE_CONFIG[NodeType.TEST].shell.timeout > NODE_CONFIG[NodeType.CODE].shell.timeout
+    print("✅ a timed out command is killed and returns what it printed, and test agents get a longer timeout")
+
+
+def test_tool_batch_uses_node_config(log_dir: str):
+    async def main():
+        batch = tools.ToolBatch(shell_config=ShellConfig(timeout=0.2, log_dir=log_dir))
+        batch.submit(ToolCall(id="t1", name="run_shell", input={"command": "sleep 5"}))
+        return await batch.results()
+
+    results = asyncio.run(main())
+    assert list(results.values())[0].startswith("Error: command timed out after 0.2 seconds")
+    print("✅ ToolBatch passes its node type's shell config to run_shell")
+
+
+def test_session_keeps_state(log_dir: str):
+    config = ShellConfig(log_dir=log_dir, persistent=True)
+
+    async def main():
+        results = [await tools._run_shell(command, None, "node-a", log_dir, config) for command in (
+            "mkdir -p pkg && cd pkg && export GREETING=hi",
+            "greet() { echo \"$GREETING from $(basename $PWD)\"; }",
+            "greet",
+            "printf no-newline",
+            "echo to-stderr >&2; false",
+            "read line; echo \"read: '$line'\"",
+            "echo 'unbalanced",
+            "echo still alive",
+        )]
+        session = shell.default_sessions.get("node-a", log_dir, config)
+        await shell.default_sessions.close_all()
+        return results, session.starts
+
+    results, starts = asyncio.run(main())
+    assert results[:5] == ["(no output)", "(no output)", "hi from pkg\n", "no-newline",
+                           "\nstderr:\nto-stderr\n\nreturn code: 1"], results
+    assert results[5] == "read: ''\n", results[5]
+    assert "unexpected EOF" in results[6] or "Unterminated" in results[6], results[6]
+    assert results[7] == "still alive\n" and starts == 1
+    print("✅ cd, export and shell functions carry over between a node's commands in one shell")
+
+
+def test_session_recovers_from_timeout_and_exit(log_dir: str):
+    config = ShellConfig(timeout=0.5, log_dir=log_dir, persistent=True)
+
+    async def main():
+        run = lambda command: tools._run_shell(command, None, "node-b", log_dir, config)
+        results = [await run("export MARK=1; echo before; sleep 30"), await run("echo \"mark=$MARK\"")]
+        results += [await run("echo bye; exit 4"), await run("echo back")]
+        session = shell.default_sessions.get("node-b", log_dir, config)
+        await shell.default_sessions.close_all()
+        return results, session.starts
+
+    results, starts = asyncio.run(main())
+    assert results[0].startswith("Error: command timed out after 0.5 seconds; the shell session was restarted")
+    assert results[0].endswith("before\n") and results[1] == "mark=\n", results
+    assert results[2] == "bye\n\nreturn code: 4\n(shell session exited; the next command starts a new one)", results[2]
+    assert results[3] == "back\n" and starts == 3
+    print("✅ a timeout or `exit` restarts the session instead of wedging it")
+
+
+def test_session_closes_with_node(log_dir: str):
+    config = ShellConfig(log_dir=log_dir, persistent=True)
+
+    async def main():
+        await tools._run_shell("sleep 60 & echo $! > sleeper.pid", None, "node-c", log_dir, config)
+        assert "node-c" in shell.default_sessions
+        await shell.default_sessions.close("node-c")
+        assert "node-c" not in shell.default_sessions
+
+    asyncio.run(main())
+    with open(os.path.join(log_dir, "sleeper.pid")) as f:
+        pid = int(f.read())
+    time.sleep(0.1)
+    try:
+        os.kill(pid, 0)
+        with open(f"/proc/{pid}/stat") as f:
+            assert f.read().split()[2] == "Z", "background job survived its session"
+    except (ProcessLookupError, FileNotFoundError):
+        pass
+    print("✅ closing a node's session also kills what it left running in the background")
+
+
+def test_session_skips_spawn_and_setup(log_dir: str):
+    setup = "export PATH=\"$PWD/bin:$PATH\" PYTHONDONTWRITEBYTECODE=1; cd ."
+    persistent, one_shot = ShellConfig(log_dir=log_dir, persistent=True), ShellConfig(log_dir=log_dir)
+
+    async def loop(config: ShellConfig) -> float:
+        start = time.perf_counter()
+        if config.persistent:
+            await tools._run_shell(setup, None, "node-d", log_dir, config)
+            for i in range(100):
+                assert await tools._run_shell(f"echo {i}", None, "node-d", log_dir, config) == f"{i}\n"
+        else:
+            for i in range(100):
+                assert await tools._run_shell(f"{setup}; echo {i}", None, "node-d", log_dir, config) == f"{i}\n"
+        await shell.default_sessions.close_all()
+        return time.perf_counter() - start
+
+    fresh, session = asyncio.run(loop(one_shot)), asyncio.run(loop(persistent))
+    print(f"   100 commands: {fresh * 1000:.0f}ms with a new shell each → {session * 1000:.0f}ms in one session")
+    assert session < fresh
+    print("✅ a session runs a command loop without re-spawning the shell or repeating setup")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as log_dir:
+        test_short_output_is_unchanged(log_dir)
+        test_noisy_command_is_capped_and_spilled(log_dir)
+        test_log_is_capped(log_dir)
+        test_timeout_keeps_partial_output(log_dir)
+        test_tool_batch_uses_node_config(log_dir)
+        with patch.object(shell, "default_sessions", SessionPool()):
+            test_session_keeps_state(log_dir)
+            test_session_recovers_from_timeout_and_exit(log_dir)
+            test_session_closes_with_node(log_dir)
+            test_session_skips_spawn_and_setup(log_dir)
+    print("\n✅ All shell tests passed!\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Tests and benchmark for binary snapshots with lazy conversation loading.
+
+Scales the dashboard's saved tree up (COPIES copies under one root), then
+compares size, load time and memory of the JSON state file against a
+snapshot, and checks the snapshot round-trips exactly with either codec.
+
+Run with: python -m sauce.tests.snapshot
+"""
+
+import os
+import json
+import time
+import tempfile
+import tracemalloc
+from unittest.mock import patch
+
+import sauce.snapshot as snapshot
+from sauce.tree import DecompositionTree
+
+
+SAVED_TREE = os.path.join(os.path.dirname(__file__), "..", "..", "dashboard", "backend", "state", "tree.json")
+COPIES = 20
+
+
+def scaled_state(copies: int) -> dict:
+    """`copies` renamed copies of the saved tree hung under one new root."""
+    with open(SAVED_TREE) as f:
+        original = json.load(f)
+    text = json.dumps([original["root"], *original["nodes"].values()])
+
+    root = {**original["root"], "node_id": "scaled-root", "children_ids": [], "for_vis": [], "active_children": []}
+    nodes = {}
+    for i in range(copies):
+        rename = lambda node_id: f"copy{i}-{node_id}"
+        for node in json.loads(text):
+            node["node_id"] = rename(node["node_id"])
+            node["parent_id"] = rename(node["parent_id"]) if node.get("parent_id") else root["node_id"]
+            node["children_ids"] = [rename(c) for c in node.get("children_ids", [])]
+            node["for_vis"] = [rename(c) for c in node.get("for_vis", [])]
+            node["active_children"] = []
+            if node["parent_id"] == root["node_id"]:
+                root["children_ids"].append(node["node_id"])
+            nodes[node["node_id"]] = node
+    return {"root": root, "nodes": nodes}
+
+
+def measure(load) -> tuple[object, float, int]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = load()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+def test_round_trip(directory: str, state: dict):
+    json_path = os.path.join(directory, "tree.json")
+    snap_path = os.path.join(directory, "tree" + snapshot.SUFFIX)
+    with open(json_path, "w") as f:
+        json.dump(state, f, indent=2)
+    tree = DecompositionTree.load_state(state)
+    snapshot.save(tree, snap_path)
+
+    loaded = snapshot.load(snap_path)
+    assert all(not n.conversation.loaded for n in loaded.nodes.values())
+    assert loaded.dump_state() == tree.dump_state()
+    print(f"✅ snapshot round-trips {len(tree.nodes)} nodes exactly")
+    return json_path, snap_path
+
+
+def test_lazy_load_is_fast_and_small(json_path: str, snap_path: str):
+    _, json_time, json_peak = measure(lambda: DecompositionTree.load_state(json_path))
+    tree, snap_time, snap_peak = measure(lambda: snapshot.load(snap_path))
+
+    json_size, snap_size = os.path.getsize(json_path), os.path.getsize(snap_path)
+    print(f"   size:   {json_size / 1e6:7.1f} MB json  → {snap_size / 1e6:5.1f} MB snapshot")
+    print(f"   load:   {json_time * 1000:7.1f} ms json  → {snap_time * 1000:5.1f} ms snapshot")
+    print(f"   memory: {json_peak / 1e6:7.1f} MB json  → {snap_peak / 1e6:5.1f} MB snapshot")
+    assert snap_size < json_size / 5
+    assert snap_time < json_time / 5
+    assert snap_peak < json_peak / 5
+
+    node = next(n for n in tree.nodes.values() if n.parent_id is not None)
+    assert node.conversation.messages and node.conversation.loaded
+    assert sum(n.conversation.loaded for n in tree.nodes.values()) == 1
+    print("✅ metadata loads eagerly, each conversation only when first read")
+
+
+def test_json_fallback_codec(directory: str, state: dict):
+    path = os.path.join(directory, "fallback" + snapshot.SUFFIX)
+    tree = DecompositionTree.load_state(state)
+    with patch.object(snapshot, "msgpack", None):
+        snapshot.save(tree, path)
+        assert snapshot.load(path).dump_state() == tree.dump_state()
+    print("✅ without msgpack/zstandard, snapshots fall back to JSON + zlib frames")
+
+
+def main():
+    state = scaled_state(COPIES)
+    with tempfile.TemporaryDirectory() as directory:
+        json_path, snap_path = test_round_trip(directory, state)
+        test_lazy_load_is_fast_and_small(json_path, snap_path)
+        test_json_fallback_codec(directory, state)
+    print("\n✅ All snapshot tests passed!\n")
+
+
+if __name__ == "__main__":
+    main()
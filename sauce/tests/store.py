@@ -0,0 +1,138 @@
+"""
+Tests for the SQLite tree store.
+
+Imports the dashboard's saved tree and compares indexed lookups with parsing the
+JSON file, checks that loading a whole tree takes a fixed number of queries
+and sees one snapshot while another connection writes, then records a live
+run against the local fake Messages API and checks the store matches the
+in-memory tree.
+
+Run with: python -m sauce.tests.store
+"""
+
+import os
+import json
+import time
+import asyncio
+import tempfile
+from unittest.mock import patch
+
+import sauce.llm as llm
+from sauce.backend import AnthropicBackend
+from sauce.fake_anthropic import FakeAnthropicServer, FakeConfig, TreeScript
+from sauce.neo import Neo
+from sauce.store import TreeStore
+from sauce.tree import DecompositionTree
+
+
+SAVED_TREE = os.path.join(os.path.dirname(__file__), "..", "..", "dashboard", "backend", "state", "tree.json")
+
+
+def normalized(state: dict) -> dict:
+    """Round-trips through Node so absent optional fields compare equal to their defaults.
+
+    The per-model rollup is dropped: its float sums depend on node order.
+    """
+    state = DecompositionTree.load_state(state).dump_state()
+    del state["metrics"]
+    return state
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+def test_import_round_trips(store: TreeStore):
+    with open(SAVED_TREE) as f:
+        state = json.load(f)
+    store.save_tree("saved", state)
+    assert normalized(store.load_tree("saved")) == normalized(state)
+    print(f"✅ imported tree.json ({1 + len(state['nodes'])} nodes) loads back identically")
+
+
+def test_indexed_lookups_beat_parsing(store: TreeStore):
+    with open(SAVED_TREE) as f:
+        state = json.load(f)
+    node_id = next(iter(state["nodes"]))
+    root_id = state["root"]["node_id"]
+
+    start = time.perf_counter()
+    with open(SAVED_TREE) as f:
+        parsed = json.load(f)["nodes"][node_id]
+    parse_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    stored = store.get_node("saved", node_id)
+    lookup_time = time.perf_counter() - start
+    assert normalized({"root": stored, "nodes": {}}) == normalized({"root": parsed, "nodes": {}})
+
+    children = store.find_nodes("saved", parent_id=root_id)
+    assert {n["node_id"] for n in children} == set(state["root"]["children_ids"])
+    completed = store.find_nodes("saved", state="completed", node_type="code")
+    expected = [n for n in state["nodes"].values() if n["state"] == "completed" and n["node_type"] == "code"]
+    assert len(completed) == len(expected)
+    print(f"✅ node lookup {lookup_time * 1000:.2f}ms vs {parse_time * 1000:.1f}ms parsing the JSON file")
+
+
+def test_load_tree_is_one_snapshot(store: TreeStore):
+    expected = store.load_tree("saved")
+    writer = TreeStore(store.path)
+    statements = []
+
+    def trace(sql: str) -> None:
+        statements.append(sql)
+        if sql.startswith("SELECT node_id, role"):
+            # Another process rewrites the tree between the node and message queries.
+            writer.save_tree("saved", {**expected, "nodes": {}})
+
+    store.db.set_trace_callback(trace)
+    try:
+        loaded = store.load_tree("saved")
+    finally:
+        store.db.set_trace_callback(None)
+    assert normalized(loaded) == normalized(expected)
+    assert len(statements) == 7, len(statements)  # BEGIN, five SELECTs, ROLLBACK: none per node
+    assert store.load_tree("saved")["nodes"] == {}
+
+    store.save_tree("saved", expected)
+    writer.close()
+    print(f"✅ load_tree reads {1 + len(expected['nodes'])} nodes in {len(statements) - 2} queries "
+          f"from one snapshot, unaffected by a concurrent write")
+
+
+async def test_recorder_tracks_live_run(store: TreeStore, server: FakeAnthropicServer):
+    with tempfile.TemporaryDirectory() as env_dir, \
+            patch.object(llm, "backend", AnthropicBackend(base_url=server.url, api_key="test")):
+        tree = DecompositionTree()
+        recorder = store.recorder("live")
+        recorder.attach(tree)
+        assert store.root_id("live") is None and store.load_tree("live") is None
+        neo = Neo(tree, env_directory=env_dir)
+        neo.prompt("store test")
+        await asyncio.wait_for(neo.run(), timeout=30)
+        recorder.close()
+
+    assert normalized(store.load_tree("live")) == normalized(tree.dump_state())
+    assert store.count_by_state("live") == {"completed": len(tree.nodes)}
+    assert store.root_id("live") == tree.root.node_id
+    # A tree row whose root has not been recorded yet is found but has no root.
+    with store.lock, store.db:
+        store._touch_tree("starting", None)
+    assert store.has_tree("starting") and store.root_id("starting") is None and store.load_tree("starting") is None
+    assert {t["tree_id"] for t in store.list_trees()} == {"saved", "live", "starting"}
+    print(f"✅ recorder keeps the store in step with a live run ({len(tree.nodes)} nodes), alongside other trees")
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as directory:
+        store = TreeStore(os.path.join(directory, "trees.db"))
+        test_import_round_trips(store)
+        test_indexed_lookups_beat_parsing(store)
+        test_load_tree_is_one_snapshot(store)
+        config = FakeConfig(script=TreeScript(depth=2, fanout=3, tool_calls=2), seed=2)
+        with FakeAnthropicServer(config) as server:
+            await test_recorder_tracks_live_run(store, server)
+        store.close()
+    print("\n✅ All store tests passed!\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
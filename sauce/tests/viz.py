@@ -19,6 +19,7 @@ async def mock_call_llm_async(
     system: str = "",
     model: str = "",
     tools: list | None = None,
+    **kwargs,
 ) -> AgentResponse:
     """Mock LLM that returns scripted responses based on conversation state."""
 
@@ -0,0 +1,151 @@
+"""
+Tests for the stat-validated workspace file cache.
+
+Checks that repeated reads and version checks are served from memory while a
+file's stat is unchanged, that any change (including a same-size rewrite
+inside the racy window) is seen, that optimistic concurrency still catches
+conflicting writes, and that the cache stays under its byte cap.
+
+Run with: python -m sauce.tests.workspace
+"""
+
+import os
+import time
+import tempfile
+from unittest.mock import patch
+
+import sauce.tools as tools
+import sauce.workspace as workspace
+from sauce.models import Conversation
+from sauce.node import Node, NodeType
+from sauce.tree import DecompositionTree
+from sauce.workspace import FileCache
+
+
+SIBLINGS = 50
+CONTRACTS = "".join(f"def endpoint_{i}(request: Request) -> Response: ...\n" for i in range(20_000))
+
+
+def write(path: str, content: str, age: float = 1.0) -> None:
+    """Writes `content` and backdates the mtime so the entry is outside the racy window."""
+    with open(path, "w") as f:
+        f.write(content)
+    past = time.time() - age
+    os.utime(path, (past, past))
+
+
+def sibling_tree() -> DecompositionTree:
+    tree = DecompositionTree()
+    tree.set_root(Node("root", NodeType.THINKING, Conversation()))
+    for i in range(SIBLINGS):
+        tree.add_node(Node(f"child-{i}", NodeType.CODE, Conversation(), parent_id="root"))
+    return tree
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+def test_repeated_reads_hit_memory(directory: str):
+    cache = FileCache()
+    path = os.path.join(directory, "contracts.md")
+    write(path, CONTRACTS)
+
+    first, digest = cache.read(path)
+    second, again = cache.read(path)
+    assert second is first and again == digest == workspace.content_hash(CONTRACTS)
+    assert cache.version(path) == digest and (cache.hits, cache.misses) == (2, 1)
+
+    write(path, CONTRACTS + "extra\n")
+    assert cache.read(path)[0].endswith("extra\n") and cache.misses == 2
+    os.remove(path)
+    assert cache.version(path) is None
+    print("✅ repeated reads and version checks come from memory until the file's stat changes")
+
+
+def test_racy_same_size_rewrite_is_seen(directory: str):
+    cache = FileCache()
+    path = os.path.join(directory, "racy.txt")
+    with open(path, "w") as f:
+        f.write("aaaa")
+    cache.read(path)
+    with open(path, "w") as f:
+        f.write("bbbb")  # same size, and likely the same coarse mtime
+    assert cache.read(path)[0] == "bbbb"
+    print("✅ a same-size rewrite inside the racy window is re-read, not served stale")
+
+
+def test_conflicts_still_detected(directory: str):
+    tree = sibling_tree()
+    path = os.path.join(directory, "api.py")
+    write(path, "v1\n")
+    with patch.object(workspace, "default_cache", FileCache()):
+        assert tools._read_file("api.py", tree, "child-0", directory) == "v1\n"
+        assert tools._read_file("api.py", tree, "child-1", directory) == "v1\n"
+        assert tools._write_file("api.py", "v2 from child-1\n", tree, "child-1", directory).startswith("Wrote")
+        assert tools._write_file("api.py", "v2 from child-0\n", tree, "child-0", directory).startswith("CONFLICT")
+
+        assert tools._read_file("api.py", tree, "child-0", directory) == "v2 from child-1\n"
+        assert tools._write_file("api.py", "v3\n", tree, "child-0", directory).startswith("Wrote")
+        with open(path) as f:
+            assert f.read() == "v3\n"
+    print("✅ stale writes are still rejected as conflicts, and succeed after a re-read")
+
+
+def test_lru_byte_cap(directory: str):
+    cache = FileCache(max_bytes=3000)
+    paths = []
+    for i in range(5):
+        paths.append(os.path.join(directory, f"chunk{i}.txt"))
+        write(paths[-1], str(i) * 1000)
+    for path in paths[:3]:
+        cache.read(path)
+    cache.read(paths[0])                      # paths[1] is now least recently used
+    cache.read(paths[3])
+    assert cache.total_bytes <= 3000
+    misses = cache.misses
+    cache.read(paths[0])
+    cache.read(paths[2])
+    assert cache.misses == misses
+    cache.read(paths[1])
+    assert cache.misses == misses + 1
+
+    write(paths[4], "x" * 5000)
+    cache.read(paths[4])                      # larger than the cap: read through, never cached
+    assert cache.total_bytes <= 3000
+    print("✅ least recently used files are evicted to stay under the byte cap")
+
+
+def test_sibling_reads_benchmark(directory: str):
+    tree = sibling_tree()
+    path = os.path.join(directory, "contracts.md")
+    write(path, CONTRACTS)
+
+    def read_all() -> float:
+        start = time.perf_counter()
+        for i in range(SIBLINGS):
+            tools._read_file("contracts.md", tree, f"child-{i}", directory, max_bytes=len(CONTRACTS))
+            tools._write_file(f"out-{i}.txt", "ok", tree, f"child-{i}", directory)
+        return time.perf_counter() - start
+
+    with patch.object(workspace, "default_cache", FileCache(max_bytes=0)):
+        uncached = read_all()
+    with patch.object(workspace, "default_cache", FileCache()):
+        read_all()  # the first read of contracts.md fills the cache
+        cached = read_all()
+    print(f"   {SIBLINGS} siblings reading a {len(CONTRACTS) / 1e6:.1f} MB file: "
+          f"{uncached * 1000:.1f}ms uncached → {cached * 1000:.1f}ms cached")
+    assert cached < uncached / 2
+    print("✅ sibling reads of a shared file skip the disk and the sha256")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        test_repeated_reads_hit_memory(directory)
+        test_racy_same_size_rewrite_is_seen(directory)
+        test_conflicts_still_detected(directory)
+        test_lru_byte_cap(directory)
+        test_sibling_reads_benchmark(directory)
+    print("\n✅ All workspace cache tests passed!\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Tests for three-way merging in write_file.
+
+Checks that a whole-file write based on a stale read is merged with the
+other agent's changes when they touch different lines, still returns
+CONFLICT (naming the lines) when they overlap or when the base version is
+no longer kept, and counts the CONFLICT retries avoided when many code
+agents each rewrite their own section of a shared contracts.md.
+
+Run with: python -m sauce.tests.write
+"""
+
+import os
+import random
+import tempfile
+from unittest.mock import patch
+
+import sauce.tools as tools
+import sauce.workspace as workspace
+from sauce.models import Conversation
+from sauce.node import Node, NodeType
+from sauce.tree import DecompositionTree
+from sauce.workspace import BaseStore, FileCache
+
+
+AGENTS = 20
+CONTRACTS = "".join(
+    f"## Endpoint {i}\n\nstatus: draft\nowner: unassigned\n\n" for i in range(AGENTS)
+)
+
+
+def agents(count: int) -> DecompositionTree:
+    tree = DecompositionTree()
+    tree.set_root(Node("root", NodeType.THINKING, Conversation()))
+    for i in range(count):
+        tree.add_node(Node(f"agent-{i}", NodeType.CODE, Conversation(), parent_id="root"))
+    return tree
+
+
+def read(path: str) -> str:
+    with open(path) as f:
+        return f.read()
+
+
+def claim(content: str, i: int) -> str:
+    """Agent i's rewrite of the whole file: only its own section changes."""
+    return content.replace(f"## Endpoint {i}\n\nstatus: draft\nowner: unassigned",
+                           f"## Endpoint {i}\n\nstatus: done\nowner: agent-{i}")
+
+
+# ── Tests ─────────────────────────────────────────────────────────────────────
+
+def test_disjoint_rewrites_merge(directory: str):
+    tree = agents(2)
+    path = os.path.join(directory, "contracts.md")
+    with open(path, "w") as f:
+        f.write(CONTRACTS)
+    seen = [tools._read_file("contracts.md", tree, f"agent-{i}", directory) for i in range(2)]
+
+    assert tools._write_file("contracts.md", claim(seen[1], 1), tree, "agent-1", directory).startswith("Wrote")
+    merged = tools._write_file("contracts.md", claim(seen[0], 0), tree, "agent-0", directory)
+    assert merged.startswith("Wrote") and "merged with the other agent's" in merged, merged
+    assert read(path) == claim(claim(CONTRACTS, 0), 1)
+
+    # The merged write is now agent-0's version, so its next write needs no merge.
+    assert tools._write_file("contracts.md", claim(read(path), 5), tree, "agent-0", directory) == \
+        f"Wrote {len(claim(claim(claim(CONTRACTS, 0), 1), 5))} bytes to contracts.md"
+    print("✅ a stale whole-file write is merged with changes to other lines")
+
+
+def test_overlapping_rewrites_conflict(directory: str):
+    tree = agents(2)
+    path = os.path.join(directory, "contracts.md")
+    with open(path, "w") as f:
+        f.write(CONTRACTS)
+    seen = [tools._read_file("contracts.md", tree, f"agent-{i}", directory) for i in range(2)]
+
+    tools._write_file("contracts.md", seen[1].replace("## Endpoint 3\n", "## Endpoint 3 (v2)\n"), tree, "agent-1", directory)
+    result = tools._write_file("contracts.md", seen[0].replace("## Endpoint 3\n", "## Endpoint three\n"), tree, "agent-0", directory)
+    assert result.startswith("CONFLICT") and "lines 16-16" in result, result
+    assert "Endpoint 3 (v2)" in read(path)
+    print("✅ edits to the same lines still conflict, naming the overlapping lines")
+
+
+def test_missing_base_conflicts(directory: str):
+    tree = agents(2)
+    path = os.path.join(directory, "contracts.md")
+    with open(path, "w") as f:
+        f.write(CONTRACTS)
+    with patch.object(workspace, "default_bases", BaseStore(max_bytes=0)):
+        seen = [tools._read_file("contracts.md", tree, f"agent-{i}", directory) for i in range(2)]
+        tools._write_file("contracts.md", claim(seen[1], 1), tree, "agent-1", directory)
+        result = tools._write_file("contracts.md", claim(seen[0], 0), tree, "agent-0", directory)
+    assert result.startswith("CONFLICT") and "overlap" not in result
+    print("✅ without the base version a stale write falls back to CONFLICT")
+
+
+def test_shared_contracts_retries(directory: str):
+    def run() -> int:
+        """Every agent reads, then all write in random order; a CONFLICT costs a re-read and a retry."""
+        tree = agents(AGENTS)
+        with open(os.path.join(directory, "contracts.md"), "w") as f:
+            f.write(CONTRACTS)
+        seen = {i: tools._read_file("contracts.md", tree, f"agent-{i}", directory) for i in range(AGENTS)}
+        order, retries = random.Random(7).sample(range(AGENTS), AGENTS), 0
+        while order:
+            i = order.pop(0)
+            if tools._write_file("contracts.md", claim(seen[i], i), tree, f"agent-{i}", directory).startswith("CONFLICT"):
+                retries += 1
+                seen[i] = tools._read_file("contracts.md", tree, f"agent-{i}", directory)
+                order.append(i)
+        assert read(os.path.join(directory, "contracts.md")) == \
+            "".join(claim(f"## Endpoint {i}\n\nstatus: draft\nowner: unassigned\n\n", i) for i in range(AGENTS))
+        return retries
+
+    with patch.object(workspace, "default_bases", BaseStore(max_bytes=0)):
+        rejected = run()
+    merged = run()
+    print(f"   {AGENTS} agents rewriting contracts.md: {rejected} CONFLICT retries → {merged} with merging")
+    assert rejected >= AGENTS - 1 and merged == 0
+    print("✅ merging removes the conflict retries on a shared contracts file")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory, \
+            patch.object(workspace, "default_cache", FileCache()), \
+            patch.object(workspace, "default_bases", BaseStore()):
+        test_disjoint_rewrites_merge(directory)
+        test_overlapping_rewrites_conflict(directory)
+        test_missing_base_conflicts(directory)
+        test_shared_contracts_retries(directory)
+    print("\n✅ All write merge tests passed!\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,17 @@
 import os
-import subprocess
-import hashlib
-from sauce.models import InputSchema, Tool, ToolProperty
+import time
+import asyncio
+import mmap
+import codecs
+import stat
+import tempfile
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import sauce.shell as shell
+import sauce.workspace as workspace
+from sauce.merge import merge3
+from sauce.shell import ShellConfig
+from sauce.models import InputSchema, Tool, ToolCall, ToolProperty
 
 
 # ── Schemas ───────────────────────────────────────────────────────────────────
@@ -28,10 +38,16 @@ ALLOWED_SPAWN: dict[str, list[str]] = {
 
 read_file = Tool(
     name="read_file",
-    description="Read the contents of a file.",
+    description=(
+        "Read the contents of a file. Files over max_bytes come back as a header with the total size "
+        "and a window of lines; use offset and limit to page through them."
+    ),
     input_schema=InputSchema(
         properties={
             "path": ToolProperty(type="string", description="Path to the file to read."),
+            "offset": ToolProperty(type="integer", description="Optional: 1-based line to start reading from."),
+            "limit": ToolProperty(type="integer", description="Optional: maximum number of lines to return."),
+            "max_bytes": ToolProperty(type="integer", description="Optional: maximum bytes to return (default 50000)."),
         },
         required=["path"],
     ),
@@ -49,6 +65,33 @@ write_file = Tool(
     ),
 )
 
+edit_file = Tool(
+    name="edit_file",
+    description=(
+        "Edit an existing file by replacing exact text. Each edit replaces old_string, which must appear "
+        "exactly once in the file, with new_string. Edits apply in order, all or none. Prefer this to "
+        "write_file when changing part of a file."
+    ),
+    input_schema=InputSchema(
+        properties={
+            "path": ToolProperty(type="string", description="Path to the file to edit."),
+            "edits": ToolProperty(
+                type="array",
+                description="Replacements to make. Include enough surrounding lines in old_string to make it unique.",
+                items={
+                    "type": "object",
+                    "properties": {
+                        "old_string": {"type": "string", "description": "Exact text to replace, including whitespace."},
+                        "new_string": {"type": "string", "description": "Text to put in its place."},
+                    },
+                    "required": ["old_string", "new_string"],
+                },
+            ),
+        },
+        required=["path", "edits"],
+    ),
+)
+
 list_directory = Tool(
     name="list_directory",
     description="List the files and directories at a given path.",
@@ -62,7 +105,7 @@ list_directory = Tool(
 
 run_shell = Tool(
     name="run_shell",
-    description="Run a shell command and return its output.",
+    description="Run a shell command and return its output. Long output keeps its start and end; the full log is saved to a file you can page through with read_file.",
     input_schema=InputSchema(
         properties={
             "command": ToolProperty(type="string", description="Shell command to run."),
@@ -74,25 +117,92 @@ run_shell = Tool(
 
 # ── Implementations ───────────────────────────────────────────────────────────
 
-def _read_file(path: str, tree=None, node_id: str = None, working_directory: str = ".") -> str:
+# Largest read returned whole; anything bigger comes back as a window.
+READ_MAX_BYTES = 50_000
+
+
+def _read_file(
+    path: str,
+    tree=None,
+    node_id: str = None,
+    working_directory: str = ".",
+    offset: int | None = None,
+    limit: int | None = None,
+    max_bytes: int | None = None,
+) -> str:
     try:
+        display_path = path
+
         # Resolve path relative to working directory if it's not absolute
         if not os.path.isabs(path):
             path = os.path.join(working_directory, path)
 
-        with open(path) as f:
-            content = f.read()
+        if (offset is not None and offset < 1) or (limit is not None and limit < 1) or (max_bytes is not None and max_bytes < 1):
+            return "Error: offset, limit and max_bytes must be at least 1"
+        max_bytes = max_bytes or READ_MAX_BYTES
+        whole = offset is None and limit is None and os.path.getsize(path) <= max_bytes
+        if whole:
+            # Served from the shared workspace cache while the file's stat is unchanged
+            content, content_hash = workspace.default_cache.read(path)
+        else:
+            # The version is still the whole file's, so later writes are checked as usual
+            content = _read_window(path, display_path, offset or 1, limit, max_bytes)
+            content_hash = workspace.default_cache.version(path)
 
         # Track file version for optimistic concurrency control
         if tree and node_id:
-            content_hash = hashlib.sha256(content.encode()).hexdigest()
             tree.nodes[node_id].file_versions[path] = content_hash
+            if whole:
+                # Kept as the base for merging this node's later writes
+                workspace.default_bases.put(content_hash, content)
 
         return content
     except Exception as e:
         return f"Error: {e}"
 
 
+def _read_window(path: str, display_path: str, offset: int, limit: int | None, max_bytes: int) -> str:
+    """Lines offset.. of the file, at most `limit` lines and `max_bytes`, behind a header.
+
+    The file is memory-mapped, so only the pages up to the window are touched.
+    """
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return f"[{display_path}: 0 bytes]\n"
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            start = 0
+            for _ in range(offset - 1):
+                newline = mapped.find(b"\n", start)
+                if newline < 0:
+                    return f"[{display_path}: {size} bytes; offset {offset} is past the last line]\n"
+                start = newline + 1
+            if start >= size:
+                return f"[{display_path}: {size} bytes; offset {offset} is past the last line]\n"
+
+            end, lines = start, 0
+            while end < size and end - start < max_bytes and (limit is None or lines < limit):
+                newline = mapped.find(b"\n", end)
+                end = size if newline < 0 else newline + 1
+                lines += 1
+            cut = end - start > max_bytes
+            end = min(end, start + max_bytes)
+            # An incremental decoder holds back a multi-byte character split by the cut.
+            text = codecs.getincrementaldecoder("utf-8")(errors="replace").decode(mapped[start:end])
+
+    last = offset + lines - 1
+    shown = f"line {offset}" if lines == 1 else f"lines {offset}-{last}"
+    if cut:
+        shown += f" (line {last} cut at max_bytes={max_bytes})"
+    if cut and lines == 1:
+        more = "; raise max_bytes to see more of this line"
+    elif cut or end < size:
+        more = f"; continue with offset={last if cut else last + 1}"
+    else:
+        more = ""
+    return f"[{display_path}: {size} bytes; showing {shown}{more}]\n" + text.replace("\r\n", "\n")
+
+
 def _write_file(path: str, content: str, tree=None, node_id: str = None, working_directory: str = ".") -> str:
     try:
         # Keep original path for display
@@ -102,79 +212,263 @@ def _write_file(path: str, content: str, tree=None, node_id: str = None, working
         if not os.path.isabs(path):
             path = os.path.join(working_directory, path)
 
-        # Check for file conflicts (optimistic concurrency control)
-        if tree and node_id and path in tree.nodes[node_id].file_versions:
-            # File was previously read by this agent - check if it changed
-            if os.path.exists(path):
-                with open(path) as f:
-                    current_content = f.read()
-                current_hash = hashlib.sha256(current_content.encode()).hexdigest()
-                expected_hash = tree.nodes[node_id].file_versions[path]
+        merged = False
+        with workspace.default_cache.lock(path):
+            # Check for file conflicts (optimistic concurrency control)
+            if tree and node_id and path in tree.nodes[node_id].file_versions:
+                # File was previously read by this agent - check if it changed (a stat while unchanged)
+                current_hash = workspace.default_cache.version(path)
+                if current_hash is not None:
+                    expected_hash = tree.nodes[node_id].file_versions[path]
 
-                if current_hash != expected_hash:
-                    return (
-                        f"CONFLICT: File '{display_path}' was modified by another agent since you read it. "
-                        f"Please re-read the file to see the latest changes and try again."
-                    )
+                    if current_hash != expected_hash:
+                        # Merge with the other agent's changes unless they touch the same lines
+                        base = workspace.default_bases.get(expected_hash)
+                        result = merge3(base, content, workspace.default_cache.read(path)[0]) if base is not None else None
+                        if result is None or not result.clean:
+                            overlap = ""
+                            if result is not None:
+                                lines = ", ".join(f"{a}-{b}" for a, b in result.conflicts)
+                                overlap = f" Your changes overlap theirs at lines {lines} of the version you read."
+                            return (
+                                f"CONFLICT: File '{display_path}' was modified by another agent since you read it.{overlap} "
+                                f"Please re-read the file to see the latest changes and try again."
+                            )
+                        content, merged = result.text, True
 
-        # No conflict - proceed with write
-        parent = os.path.dirname(path)
-        if parent:
-            os.makedirs(parent, exist_ok=True)
-        with open(path, "w") as f:
-            f.write(content)
+            # No conflict - proceed with write
+            parent = os.path.dirname(path)
+            if parent:
+                os.makedirs(parent, exist_ok=True)
+            with open(path, "w") as f:
+                f.write(content)
+            new_hash = workspace.default_cache.wrote(path, content)
 
         # Update the file version after successful write
         if tree and node_id:
-            new_hash = hashlib.sha256(content.encode()).hexdigest()
             tree.nodes[node_id].file_versions[path] = new_hash
+            workspace.default_bases.put(new_hash, content)
 
+        if merged:
+            return (
+                f"Wrote {len(content)} bytes to {display_path} (it had changed since you read it; your changes "
+                f"were merged with the other agent's, so re-read it before relying on its exact contents)"
+            )
         return f"Wrote {len(content)} bytes to {display_path}"
     except Exception as e:
         return f"Error: {e}"
 
 
-def _list_directory(path: str = ".", tree=None, node_id: str = None, working_directory: str = ".") -> str:
+def _edit_file(path: str, edits: list[dict], tree=None, node_id: str = None, working_directory: str = ".") -> str:
     try:
-        # Resolve path relative to working directory if it's not absolute
+        display_path = path
         if not os.path.isabs(path):
             path = os.path.join(working_directory, path)
+        if not edits:
+            return "Error: no edits given"
 
-        return "\n".join(sorted(os.listdir(path)))
+        with workspace.default_cache.lock(path):
+            # Read without newline translation so the file's line endings are written back as they were.
+            with open(path, newline="") as f:
+                content = f.read()
+            current_hash = workspace.content_hash(content)
+            # Optimistic concurrency per hunk: if another agent changed the file since this one
+            # read it, the edits still apply as long as the text each one replaces is untouched.
+            versions = tree.nodes[node_id].file_versions if tree and node_id else {}
+            changed = versions.get(path, current_hash) != current_hash
+
+            for i, edit in enumerate(edits, 1):
+                old, new = edit.get("old_string", ""), edit.get("new_string", "")
+                if not old:
+                    return f"Error: edit {i} has an empty old_string"
+                if "\r\n" in content:
+                    # The agent read the file with \n line endings; match and write in the file's own.
+                    crlf = old.replace("\r\n", "\n").replace("\n", "\r\n")
+                    if crlf in content:
+                        old, new = crlf, new.replace("\r\n", "\n").replace("\n", "\r\n")
+                count = content.count(old)
+                if count == 0 and changed:
+                    return (
+                        f"CONFLICT: Edit {i} no longer matches '{display_path}', which was modified by another "
+                        f"agent since you read it. Please re-read the file and try again. No edits were applied."
+                    )
+                if count == 0:
+                    return f"Error: edit {i}: old_string not found in {display_path}. No edits were applied."
+                if count > 1:
+                    return (
+                        f"Error: edit {i}: old_string appears {count} times in {display_path}; include more "
+                        f"surrounding lines to make it unique. No edits were applied."
+                    )
+                content = content.replace(old, new, 1)
+
+            _replace_atomically(path, content)
+            new_hash = workspace.default_cache.wrote(path, content)
+
+        if tree and node_id:
+            versions[path] = new_hash
+            # Bases are compared with what reads return, which is newline-translated.
+            workspace.default_bases.put(new_hash, content.replace("\r\n", "\n").replace("\r", "\n"))
+
+        note = " (it had changed since you read it; your edits were applied to the latest version)" if changed else ""
+        return f"Applied {len(edits)} edit(s) to {display_path}{note}"
     except Exception as e:
         return f"Error: {e}"
 
 
-def _run_shell(command: str, tree=None, node_id: str = None, working_directory: str = ".") -> str:
+def _replace_atomically(path: str, content: str) -> None:
+    """Writes `content` to a temp file beside `path` and renames it over, keeping the mode."""
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=f".{os.path.basename(path)}.", suffix=".tmp")
     try:
-        env = os.environ.copy()
-        env["CI"] = "true"
-        env["DEBIAN_FRONTEND"] = "noninteractive"
-        result = subprocess.run(
-            command,
-            shell=True,
-            capture_output=True,
-            stdin=subprocess.DEVNULL,
-            text=True,
-            timeout=30,
-            cwd=working_directory,
-            env=env,
-        )
-        output = result.stdout
-        if result.stderr:
-            output += f"\nstderr:\n{result.stderr}"
-        if result.returncode != 0:
-            output += f"\nreturn code: {result.returncode}"
-        return output or "(no output)"
-    except subprocess.TimeoutExpired:
-        return "Error: command timed out after 30 seconds"
+        with os.fdopen(fd, "w", newline="") as f:
+            f.write(content)
+        os.chmod(tmp, stat.S_IMODE(os.stat(path).st_mode))
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def _list_directory(path: str = ".", tree=None, node_id: str = None, working_directory: str = ".") -> str:
+    try:
+        # Resolve path relative to working directory if it's not absolute
+        if not os.path.isabs(path):
+            path = os.path.join(working_directory, path)
+
+        return "\n".join(sorted(os.listdir(path)))
     except Exception as e:
         return f"Error: {e}"
 
 
+async def _run_shell(
+    command: str,
+    tree=None,
+    node_id: str = None,
+    working_directory: str = ".",
+    config: ShellConfig | None = None,
+) -> str:
+    config = config or ShellConfig()
+    if config.persistent and node_id is not None:
+        session = shell.default_sessions.get(node_id, working_directory, config)
+        return await session.run(command)
+    return await shell.run_command(command, working_directory, config, node_id)
+
+
 TOOL_REGISTRY: dict[str, callable] = {
-    "read_file":      lambda inp, tree=None, node_id=None, working_directory=".": _read_file(inp["path"], tree, node_id, working_directory),
+    "read_file":      lambda inp, tree=None, node_id=None, working_directory=".": _read_file(inp["path"], tree, node_id, working_directory, inp.get("offset"), inp.get("limit"), inp.get("max_bytes")),
     "write_file":     lambda inp, tree=None, node_id=None, working_directory=".": _write_file(inp["path"], inp["content"], tree, node_id, working_directory),
+    "edit_file":      lambda inp, tree=None, node_id=None, working_directory=".": _edit_file(inp["path"], inp["edits"], tree, node_id, working_directory),
     "list_directory": lambda inp, tree=None, node_id=None, working_directory=".": _list_directory(inp.get("path", "."), tree, node_id, working_directory),
-    "run_shell":      lambda inp, tree=None, node_id=None, working_directory=".": _run_shell(inp["command"], tree, node_id, working_directory),
+    "run_shell":      lambda inp, tree=None, node_id=None, working_directory=".", shell_config=None: _run_shell(inp["command"], tree, node_id, working_directory, shell_config),
 }
+
+# run_shell is natively async; everything else is blocking file I/O and runs on
+# a small bounded pool so it never stalls the event loop.
+ASYNC_TOOLS = {"run_shell"}
+_FILE_IO_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="neo-file-io")
+
+
+async def run_tool(
+    name: str,
+    inp: dict,
+    tree=None,
+    node_id: str = None,
+    working_directory: str = ".",
+    shell_config: ShellConfig | None = None,
+) -> str:
+    tool = TOOL_REGISTRY[name]
+    if name in ASYNC_TOOLS:
+        return await tool(inp, tree, node_id, working_directory, shell_config)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _FILE_IO_POOL, functools.partial(tool, inp, tree, node_id, working_directory)
+    )
+
+
+# ── Dispatch ──────────────────────────────────────────────────────────────────
+
+# How each tool touches the workspace. File tools name the one path they touch,
+# so calls on different paths run concurrently. A shell command can read or write
+# anything under the node's working directory, which holds every path in the
+# batch, so it is ordered against every other call: nothing after it in the turn
+# starts until it is done (`make gen` then read_file("gen.out") sees the output),
+# and it does not start until the calls before it are done.
+TOOL_ACCESS: dict[str, str] = {
+    "read_file":      "read",
+    "list_directory": "read",
+    "write_file":     "write",
+    "edit_file":      "write",
+    "run_shell":      "shell",
+}
+
+
+def _target_path(tool_call: ToolCall, working_directory: str) -> str:
+    path = tool_call.input.get("path", ".")
+    return os.path.normpath(os.path.join(working_directory, path))
+
+
+def _paths_overlap(a: str, b: str) -> bool:
+    return a == b or a.startswith(b + os.sep) or b.startswith(a + os.sep)
+
+
+def _conflicts(earlier: ToolCall, later: ToolCall, working_directory: str) -> bool:
+    """True if `later` must wait for `earlier` to finish."""
+    kinds = {TOOL_ACCESS.get(earlier.name, "shell"), TOOL_ACCESS.get(later.name, "shell")}
+    if kinds == {"read"}:
+        return False
+    if "shell" in kinds:
+        return True
+    return _paths_overlap(_target_path(earlier, working_directory), _target_path(later, working_directory))
+
+
+class ToolBatch:
+    """Dispatches one turn's tool calls as they arrive, ordering only those that touch the same paths."""
+
+    def __init__(self, tree=None, node_id: str = None, working_directory: str = ".", shell_config: ShellConfig | None = None):
+        self.tree = tree
+        self.node_id = node_id
+        self.working_directory = working_directory
+        self.shell_config = shell_config
+        self.calls: list[ToolCall] = []
+        self.tasks: list[asyncio.Task] = []
+        self.elapsed: dict[str, float] = {}  # tool_use id → run time, not counting waits on deps
+
+    def submit(self, tool_call: ToolCall) -> asyncio.Task:
+        deps = [
+            task for earlier, task in zip(self.calls, self.tasks)
+            if _conflicts(earlier, tool_call, self.working_directory)
+        ]
+        task = asyncio.create_task(self._run_after(deps, tool_call))
+        self.calls.append(tool_call)
+        self.tasks.append(task)
+        return task
+
+    async def _run_after(self, deps: list[asyncio.Task], tool_call: ToolCall) -> str:
+        if deps:
+            await asyncio.wait(deps)
+        started = time.perf_counter()
+        try:
+            return await run_tool(tool_call.name, tool_call.input, self.tree, self.node_id, self.working_directory, self.shell_config)
+        except KeyError as e:
+            # An unknown tool name or a missing required input: tell the model, don't sink the batch.
+            if tool_call.name not in TOOL_REGISTRY:
+                return f"Error: unknown tool '{tool_call.name}'"
+            return f"Error: {tool_call.name} is missing required input {e}"
+        except Exception as e:
+            return f"Error: {e}"
+        finally:
+            self.elapsed[tool_call.id] = time.perf_counter() - started
+
+    async def results(self) -> dict[str, str]:
+        """Waits for every submitted call; maps tool_use id to output. A failed call's output is its error."""
+        outputs = await asyncio.gather(*self.tasks)
+        return {tc.id: output for tc, output in zip(self.calls, outputs)}
+
+
+async def run_tools(tool_calls: list[ToolCall], tree=None, node_id: str = None, working_directory: str = ".") -> list[str]:
+    """Runs one turn's tool calls concurrently; results are returned in `tool_calls` order."""
+    batch = ToolBatch(tree, node_id, working_directory)
+    for tc in tool_calls:
+        batch.submit(tc)
+    results = await batch.results()
+    return [results[tc.id] for tc in tool_calls]
@@ -1,6 +1,11 @@
 import json
 import os
+from collections import defaultdict, deque
+from typing import Callable
 
+import sauce.blobs as blobs
+import sauce.metrics as metrics
+from sauce.models import Message, ToolCall, ToolResultMessage
 from sauce.node import Node, NodeType, NodeState
 
 
@@ -9,55 +14,300 @@ class DecompositionTree:
         self.root: Node | None = None
         self.nodes: dict[str, Node] = {}
 
+        # Event-driven scheduling: nodes are pushed here when they become READY.
+        self.ready: deque[str] = deque()
+        self.on_ready: Callable[[], None] | None = None
+
+        # Secondary indexes (node ids, in insertion order) kept by add_node() and
+        # set_state(), so state counts are O(1) and find_nodes() never scans the tree.
+        self.by_state: dict[NodeState, dict[str, None]] = {state: {} for state in NodeState}
+        self.by_type: dict[NodeType, dict[str, None]] = {node_type: {} for node_type in NodeType}
+        self.by_parent: dict[str | None, dict[str, None]] = defaultdict(dict)
+        self.by_directory: dict[str, dict[str, None]] = defaultdict(dict)
+
+        # Nodes whose turn is still executing; finishing children must not wake them.
+        self.held: set[str] = set()
+
+        # Every mutation below is logged to each recorder: sauce.journal.Journal,
+        # sauce.store's StoreRecorder. Neo calls their checkpoint() between mutations.
+        self.recorders: list = []
+
+        # Payloads this tree holds stay in the shared blob store while it exists.
+        blobs.default_store.track(self)
+
+    def _log(self, record: dict) -> None:
+        for recorder in self.recorders:
+            recorder.append(record)
+
     def set_root(self, node: Node) -> None:
         self.root = node
         self.add_node(node)
 
 
     def add_node(self, node: Node) -> None:
+        if node.node_id in self.nodes:
+            self._unindex(self.nodes[node.node_id])
         self.nodes[node.node_id] = node
+        self._index(node)
+        if self.recorders:  # to_dict() would decode lazily loaded conversations
+            self._log({"op": "node", "node": node.to_dict()})
+        if node.state == NodeState.READY:
+            self._push_ready(node)
+
+    def set_state(self, node: Node, state: NodeState) -> None:
+        """Single entry point for state transitions; keeps the ready queue and counters in sync."""
+        if node.state == state:
+            return
+        del self.by_state[node.state][node.node_id]
+        self.by_state[state][node.node_id] = None
+        node.state = state
+        self._log({"op": "set", "id": node.node_id, "fields": {"state": state.value}})
+        if state == NodeState.READY:
+            self._push_ready(node)
+
+    def _index(self, node: Node) -> None:
+        self.by_state[node.state][node.node_id] = None
+        self.by_type[node.node_type][node.node_id] = None
+        self.by_parent[node.parent_id][node.node_id] = None
+        self.by_directory[os.path.normpath(node.working_directory)][node.node_id] = None
+
+    def _unindex(self, node: Node) -> None:
+        self.by_state[node.state].pop(node.node_id, None)
+        self.by_type[node.node_type].pop(node.node_id, None)
+        self.by_parent[node.parent_id].pop(node.node_id, None)
+        self.by_directory[os.path.normpath(node.working_directory)].pop(node.node_id, None)
+
+    def _push_ready(self, node: Node) -> None:
+        self.ready.append(node.node_id)
+        if self.on_ready is not None:
+            self.on_ready()
 
     def add_children(self, parent: Node, children: list[Node]) -> None:
+        """Starts a new batch of children for `parent`."""
+        parent.active_children = set()
+        parent.for_vis.clear()
+        self._log({"op": "set", "id": parent.node_id, "fields": {"active_children": [], "for_vis": []}})
+        self.extend_children(parent, children)
+
+    def extend_children(self, parent: Node, children: list[Node]) -> None:
+        """Adds children to the current batch, e.g. spawns dispatched mid-stream."""
         child_ids = [child.node_id for child in children]
-        parent.active_children = set(child_ids)
+        parent.active_children.update(child_ids)
         parent.children_ids.extend(child_ids)
-        parent.for_vis.clear()
         parent.for_vis.extend(child_ids)
-        parent.state = NodeState.RUNNING
+        self._log({
+            "op": "extend", "id": parent.node_id,
+            "fields": {"active_children": child_ids, "children_ids": child_ids, "for_vis": child_ids},
+        })
+        self.set_state(parent, NodeState.RUNNING)
         for child in children:
             self.add_node(child)
 
+    def hold(self, node: Node) -> None:
+        self.held.add(node.node_id)
+
+    def release(self, node: Node) -> None:
+        """Ends a held turn; the node becomes READY unless it is still waiting on children."""
+        self.held.discard(node.node_id)
+        # Tools update file_versions from worker threads, so they are logged once per turn here.
+        self._log({
+            "op": "set", "id": node.node_id,
+            "fields": {"metrics": node.metrics.to_dict(), "file_versions": dict(node.file_versions)},
+        })
+        self._wake_if_idle(node)
+
+    def _wake_if_idle(self, node: Node) -> None:
+        if node.state != NodeState.RUNNING or node.active_children or node.node_id in self.held:
+            return
+        node.for_vis.clear()
+        self._log({"op": "set", "id": node.node_id, "fields": {"for_vis": []}})
+        self.set_state(node, NodeState.READY)
+
+    def pop_ready(self) -> list[Node]:
+        """Drains the ready queue, skipping entries whose node has since left READY."""
+        nodes = []
+        while self.ready:
+            node = self.nodes[self.ready.popleft()]
+            if node.state == NodeState.READY:
+                nodes.append(node)
+        return nodes
+
     def get_ready_nodes(self) -> list[Node]:
-        return [n for n in self.nodes.values() if n.state == NodeState.READY]
+        return [self.nodes[node_id] for node_id in self.by_state[NodeState.READY]]
 
     def message_parent(self, node: Node, message: str) -> None:
         if node.parent_id is None:
             return
         parent = self.nodes[node.parent_id]
-        parent.conversation.add_tool_result(node.tool_id, message)
+        self.append_message(parent, ToolResultMessage(node.tool_id, message))
+
+    # ── Conversation mutations ───────────────────────────────────────────────
+    # Conversations are changed through these so recorders see every edit, and
+    # large payloads are interned in the blob store on the way in.
+
+    def append_message(self, node: Node, message: Message) -> int:
+        """Appends to the node's conversation and returns the message's index."""
+        message.content = blobs.default_store.intern(message.content)
+        node.conversation.add_message(message)
+        self._log({"op": "message", "id": node.node_id, "message": message.to_dict()})
+        blobs.default_store.maybe_collect()
+        return len(node.conversation.messages) - 1
+
+    def update_message(self, node: Node, index: int) -> None:
+        """Records an in-place edit of an existing message, e.g. a streamed turn being closed."""
+        message = node.conversation.messages[index]
+        message.content = blobs.default_store.intern(message.content)
+        self._log({"op": "message", "id": node.node_id, "index": index, "message": message.to_dict()})
+
+    def append_block(self, node: Node, index: int, block: dict) -> None:
+        """Appends one content block to an existing message, e.g. a tool_use streamed into an open turn.
+
+        Only the block is logged, so a turn built up block by block costs O(blocks) to record.
+        """
+        block = blobs.default_store.intern(block)
+        node.conversation.messages[index].content.append(block)
+        self._log({"op": "block", "id": node.node_id, "index": index, "block": block})
+        blobs.default_store.maybe_collect()
+
+    def replace_messages(self, node: Node, messages: list[Message]) -> None:
+        for message in messages:
+            message.content = blobs.default_store.intern(message.content)
+        node.conversation.messages = messages
+        self._log({"op": "messages", "id": node.node_id, "messages": [m.to_dict() for m in messages]})
+        # Payloads only the old messages held (e.g. compacted tool output) can go.
+        blobs.default_store.collect()
+
+    def add_tool_call(self, node: Node, tool_call: ToolCall) -> None:
+        blobs.default_store.intern(tool_call.input)
+        node.tool_calls.append(tool_call)
+        self._log({
+            "op": "extend", "id": node.node_id,
+            "fields": {"tool_calls": [{"id": tool_call.id, "name": tool_call.name, "input": tool_call.input}]},
+        })
+        blobs.default_store.maybe_collect()
 
     def sync_with_parent(self, node: Node) -> None:
         if node.parent_id is None:
             return
         parent = self.nodes[node.parent_id]
         parent.active_children.discard(node.node_id)
-        if len(parent.active_children) == 0:
-            parent.for_vis.clear()
-            parent.state = NodeState.READY
+        self._log({"op": "discard", "id": parent.node_id, "child": node.node_id})
+        self._wake_if_idle(parent)
+
+    # ── Queries ──────────────────────────────────────────────────────────────
+
+    @property
+    def state_counts(self) -> dict[NodeState, int]:
+        return {state: len(ids) for state, ids in self.by_state.items()}
+
+    def count(self, state: NodeState) -> int:
+        return len(self.by_state[state])
+
+    def find_nodes(
+        self,
+        state: NodeState | None = None,
+        node_type: NodeType | None = None,
+        parent_id: str | None = None,
+        working_directory: str | None = None,
+    ) -> list[Node]:
+        """Nodes matching every given filter, e.g. all RUNNING code nodes.
+
+        `working_directory` matches nodes working in that directory or below it.
+        Walks the smallest matching index and checks the others by lookup.
+        """
+        indexes = []
+        if state is not None:
+            indexes.append([self.by_state[state]])
+        if node_type is not None:
+            indexes.append([self.by_type[node_type]])
+        if parent_id is not None:
+            indexes.append([self.by_parent.get(parent_id, {})])
+        if working_directory is not None:
+            indexes.append(self._directory_groups(working_directory))
+        if not indexes:
+            return list(self.nodes.values())
+        # Each filter is a union of index groups (a directory and its subdirectories).
+        indexes.sort(key=lambda groups: sum(map(len, groups)))
+        matches = [node_id for group in indexes[0] for node_id in group]
+        for groups in indexes[1:]:
+            if len(groups) == 1:
+                matches = [node_id for node_id in matches if node_id in groups[0]]
+            else:
+                matches = [node_id for node_id in matches if any(node_id in ids for ids in groups)]
+        return [self.nodes[node_id] for node_id in matches]
+
+    def _directory_groups(self, directory: str) -> list[dict[str, None]]:
+        directory = os.path.normpath(directory)
+        if directory == ".":
+            return list(self.by_directory.values())
+        prefix = directory + os.sep
+        return [ids for path, ids in self.by_directory.items() if path == directory or path.startswith(prefix)]
+
+    # ── Recovery ─────────────────────────────────────────────────────────────
+
+    def recover(self) -> list[Node]:
+        """Makes a tree loaded from an interrupted run runnable again; returns the nodes it reset.
+
+        Finished nodes are left alone. A RUNNING node waits on the unfinished
+        children of its current batch (for_vis) if it has any; otherwise its turn
+        was cut short and it goes back to READY, as do READY nodes. Tool calls with
+        no recorded result and no live child are dropped from the conversation,
+        so the model re-issues them rather than the API rejecting the history.
+        """
+        finished = (NodeState.COMPLETED, NodeState.FAILED)
+        reset = []
+        for node in [*self.find_nodes(state=NodeState.RUNNING), *self.find_nodes(state=NodeState.READY)]:
+            node.active_tool_calls.clear()
+            waiting_on = {c for c in node.for_vis if c in self.nodes and self.nodes[c].state not in finished}
+            if waiting_on != node.active_children:
+                node.active_children = waiting_on
+                self._log({"op": "set", "id": node.node_id, "fields": {"active_children": sorted(waiting_on)}})
+
+            live_children = {self.nodes[c].tool_id for c in waiting_on}
+            messages = _drop_dangling_tool_uses(node.conversation.messages, live_children)
+            if messages is not node.conversation.messages:
+                self.replace_messages(node, messages)
+
+            if node.state == NodeState.RUNNING and waiting_on:
+                continue
+            if node.state == NodeState.RUNNING:
+                node.for_vis.clear()
+                self._log({"op": "set", "id": node.node_id, "fields": {"for_vis": []}})
+                self.set_state(node, NodeState.READY)
+            reset.append(node)
+        return reset
 
     def is_done(self) -> bool:
         if self.root is None:
             return False
-        return all(n.state == NodeState.COMPLETED for n in self.nodes.values())
+        return self.count(NodeState.COMPLETED) + self.count(NodeState.FAILED) == len(self.nodes)
+
+    def blob_values(self):
+        """Node state that may hold shared payloads, for BlobStore.collect().
+
+        Conversations still waiting to be decoded from a snapshot hold none yet and are not loaded.
+        """
+        for node in self.nodes.values():
+            if getattr(node.conversation, "loaded", True):
+                for message in node.conversation.messages:
+                    yield message.content
+            if getattr(node.tool_calls, "loaded", True):
+                for tool_call in node.tool_calls:
+                    yield tool_call.input
+            for tool_call in node.active_tool_calls:
+                yield tool_call.input
 
     def dump_state(self, path: str | None = None) -> dict:
         """Serialize the full tree to a dict. Optionally writes to a JSON file at `path`."""
-        self.root.state = NodeState.COMPLETED
         root_id = self.root.node_id
         state = {
             "root": self.root.to_dict(),
             "nodes": {node_id: node.to_dict() for node_id, node in self.nodes.items() if node_id != root_id},
+            "metrics": {model: m.to_dict() for model, m in metrics.by_model(self).items()},
         }
+        for node_id, total in metrics.subtree_metrics(self).items():
+            node_data = state["root"] if node_id == root_id else state["nodes"][node_id]
+            node_data["subtree_metrics"] = total.to_dict()
         if path:
             os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
             with open(path, "w") as f:
@@ -70,8 +320,37 @@ class DecompositionTree:
         if isinstance(source, str):
             with open(source) as f:
                 source = json.load(f)
-        tree = cls.__new__(cls)
-        tree.root = Node.from_dict(source["root"])
-        tree.nodes = {node_id: Node.from_dict(node_data) for node_id, node_data in source["nodes"].items()}
-        tree.nodes[tree.root.node_id] = tree.root
+        tree = cls()
+        tree.set_root(Node.from_dict(source["root"]))
+        for node_data in source["nodes"].values():
+            tree.add_node(Node.from_dict(node_data))
         return tree
+
+
+def _drop_dangling_tool_uses(messages: list[Message], pending: set[str]) -> list[Message]:
+    """Removes tool_use blocks that have no tool_result and are not awaiting a child, and
+    any assistant turn left empty or trailing. Returns `messages` itself if nothing changed."""
+    answered = {
+        block["tool_use_id"]
+        for m in messages if isinstance(m.content, list)
+        for block in m.content if block.get("type") == "tool_result"
+    }
+    result = []
+    for m in messages:
+        if m.role == "assistant" and isinstance(m.content, list):
+            blocks = [
+                b for b in m.content
+                if b.get("type") != "tool_use" or b["id"] in answered or b["id"] in pending
+            ]
+            if len(blocks) != len(m.content):
+                m = Message(role=m.role, content=blocks)
+            if not blocks:
+                continue
+        result.append(m)
+    while result and result[-1].role == "assistant" and not any(
+        b.get("type") == "tool_use" for b in (result[-1].content if isinstance(result[-1].content, list) else [])
+    ):
+        result.pop()
+    if len(result) == len(messages) and all(a is b for a, b in zip(result, messages)):
+        return messages
+    return result
@@ -107,7 +107,7 @@ def render_tree_with_title(tree: DecompositionTree, title: str) -> Tree:
 
 async def run_with_live_visualization(
     neo: Neo,
-    task: str,
+    task: str | None,
     title: str = "Neo Decomposition Tree",
     refresh_rate: int = 4
 ) -> None:
@@ -116,14 +116,15 @@ async def run_with_live_visualization(
 
     Args:
         neo: Neo instance with initialized tree (env_directory set at initialization)
-        task: Task to prompt Neo with
+        task: Task to prompt Neo with, or None to continue a run set up with neo.resume()
         title: Title for the visualization
         refresh_rate: Refresh rate in Hz (default 4)
     """
     console = Console()
 
     # Create the initial task
-    neo.prompt(task)
+    if task is not None:
+        neo.prompt(task)
 
     with Live(console=console, refresh_per_second=refresh_rate) as live:
         # Start the visualization update loop
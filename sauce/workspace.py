@@ -0,0 +1,198 @@
+"""
+Process-wide cache of workspace files, validated by stat.
+
+Sibling agents often read the same files, and every write re-checks the
+version its node last read. Entries are keyed by absolute path and trusted
+while (mtime_ns, size, inode) are unchanged, so repeated reads come from
+memory and version checks cost one stat instead of a read and a sha256.
+
+Digests are the sha256 of the file's bytes. A version check that misses
+hashes the file through mmap and keeps only the digest, so it never loads
+the file (e.g. after a partial read of a large one).
+
+BaseStore keeps the contents each node last read or wrote, by digest, so a
+write that finds the file changed underneath it can be three-way merged
+against the version the node started from.
+
+Linux stamps mtimes from a coarse clock, so a file changed within
+RACY_WINDOW_NS of being cached could keep its mtime; such entries are
+re-read once before being trusted (as git does for "racily clean" files).
+"""
+
+import io
+import os
+import mmap
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+RACY_WINDOW_NS = 20_000_000
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+@dataclass(slots=True)
+class _Entry:
+    stat_key: tuple[int, int, int, int]  # mtime_ns, size, inode, device
+    content: str | None                  # None for files over the cap: digest only
+    digest: str
+    cached_at: int
+
+
+class FileCache:
+    """LRU cache of file contents and sha256 digests under a byte cap (counted in characters)."""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+        self._path_locks: dict[str, threading.Lock] = {}
+
+    def read(self, path: str) -> tuple[str, str]:
+        """The file's contents and digest; raises OSError like open()."""
+        key = os.path.abspath(path)
+        stat_key = _stat_key(os.stat(key))
+        with self._lock:
+            entry = self._lookup(key, stat_key)
+            if entry is not None and entry.content is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry.content, entry.digest
+            self.misses += 1
+        return self._load(key)
+
+    def version(self, path: str) -> str | None:
+        """The digest of the file's current contents, or None if it does not exist."""
+        key = os.path.abspath(path)
+        try:
+            stat_key = _stat_key(os.stat(key))
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            entry = self._lookup(key, stat_key)
+            if entry is not None:
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return entry.digest
+            self.misses += 1
+        return self._hash(key)
+
+    def wrote(self, path: str, content: str) -> str:
+        """Records contents just written to `path` and returns their digest."""
+        key = os.path.abspath(path)
+        digest = content_hash(content)
+        if "\r" in content:
+            # Reading back in text mode translates newlines, so the next read must hit disk.
+            with self._lock:
+                self._forget(key)
+            return digest
+        self._store(key, _Entry(_stat_key(os.stat(key)), content, digest, time.time_ns()))
+        return digest
+
+    def lock(self, path: str) -> threading.Lock:
+        """Held across a version check and the write that depends on it."""
+        key = os.path.abspath(path)
+        with self._lock:
+            return self._path_locks.setdefault(key, threading.Lock())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    def _lookup(self, key: str, stat_key: tuple) -> _Entry | None:
+        entry = self._entries.get(key)
+        if entry is None or entry.stat_key != stat_key or entry.cached_at - stat_key[0] < RACY_WINDOW_NS:
+            return None
+        return entry
+
+    def _load(self, key: str) -> tuple[str, str]:
+        cached_at = time.time_ns()
+        with open(key, "rb") as f:
+            stat_key = _stat_key(os.fstat(f.fileno()))
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        content = io.TextIOWrapper(io.BytesIO(data)).read()  # decoded as open(key).read() would
+        self._store(key, _Entry(stat_key, content, digest, cached_at))
+        return content, digest
+
+    def _hash(self, key: str) -> str:
+        cached_at = time.time_ns()
+        with open(key, "rb") as f:
+            stat_key = _stat_key(os.fstat(f.fileno()))
+            if stat_key[1] == 0:
+                digest = hashlib.sha256().hexdigest()
+            else:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    digest = hashlib.sha256(mapped).hexdigest()
+        self._store(key, _Entry(stat_key, None, digest, cached_at))
+        return digest
+
+    def _store(self, key: str, entry: _Entry) -> None:
+        with self._lock:
+            self._forget(key)
+            if entry.content is not None and len(entry.content) > self.max_bytes:
+                entry.content = None
+            self._entries[key] = entry
+            self.total_bytes += _size(entry)
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= _size(evicted)
+
+    def _forget(self, key: str) -> None:
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.total_bytes -= _size(old)
+
+
+class BaseStore:
+    """File contents by digest, kept as merge bases; LRU under a byte cap (counted in characters)."""
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._contents: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, digest: str, content: str) -> None:
+        if len(content) > self.max_bytes:
+            return
+        with self._lock:
+            if digest in self._contents:
+                self._contents.move_to_end(digest)
+                return
+            self._contents[digest] = content
+            self.total_bytes += len(content)
+            while self.total_bytes > self.max_bytes:
+                _, evicted = self._contents.popitem(last=False)
+                self.total_bytes -= len(evicted)
+
+    def get(self, digest: str) -> str | None:
+        with self._lock:
+            content = self._contents.get(digest)
+            if content is not None:
+                self._contents.move_to_end(digest)
+            return content
+
+    def __len__(self) -> int:
+        return len(self._contents)
+
+
+def _size(entry: _Entry) -> int:
+    return len(entry.content) if entry.content is not None else 0
+
+
+def _stat_key(stat: os.stat_result) -> tuple[int, int, int, int]:
+    return stat.st_mtime_ns, stat.st_size, stat.st_ino, stat.st_dev
+
+
+# Shared by every node's tools in the process.
+default_cache = FileCache()
+default_bases = BaseStore()